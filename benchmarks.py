@@ -0,0 +1,1028 @@
+#!/usr/bin/env python
+# builtin modules
+import bisect
+import calendar
+from collections import Counter
+from contextlib import contextmanager, redirect_stdout
+from copy import deepcopy
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import parse_qs, urlsplit
+
+# third-party modules
+import fire
+
+MODULE_UNDER_BENCHMARK = "click_up_timesheeting"
+click_up_timesheeting = __import__(MODULE_UNDER_BENCHMARK)
+
+# Run with: python benchmarks.py <benchmark name> [--option=value...]
+# requests_mock serializes all mocked requests behind a lock, so a local HTTP server stands in for the Click-Up API here.
+
+DEFAULT_TASK_COUNT = 200
+DEFAULT_TASKS_PER_LIST = 100
+DEFAULT_LATENCY = 0.05  # seconds, injected into each mocked API response
+DEFAULT_CLICKUP_TOKEN = "anytoken"
+DEFAULT_TEAM_ID = "1234"
+ARCHIVED_TASK_EVERY = 25  # One task out of that many is missing from task listings
+
+
+def fake_task(task_number, tasks_per_list=DEFAULT_TASKS_PER_LIST):
+    list_number = task_number // tasks_per_list
+    return {
+        "id": "task{}".format(task_number),
+        "name": "Task {}".format(task_number),
+        "list": {"id": str(list_number), "name": "List {}".format(list_number)},
+        "project": {"id": "1", "name": "Project"},
+        "folder": {"id": "1", "name": "Project"},
+    }
+
+
+class MockClickUpHandler(BaseHTTPRequestHandler):
+    """Answers Click-Up v2 team, time entries, task and team task listing requests with fake data, after sleeping the server's latency.
+    Beyond the server's rate_limit requests per minute, if any, requests are answered with HTTP 429 until the minute is over.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        rate_limit_headers = self.rate_limit_headers()
+        if rate_limit_headers.get("Retry-After"):
+            with self.server.lock:
+                self.server.requests["rate_limited"] += 1
+            self.send_json({"err": "Rate limit reached"}, 429, rate_limit_headers)
+            return
+        if url.path.endswith("/team"):
+            endpoint = "team"
+            body = {"teams": [{"id": DEFAULT_TEAM_ID, "name": "Team"}]}
+        elif url.path.endswith("/task"):
+            endpoint = "team_tasks"
+            body = self.team_tasks(query)
+        elif url.path.endswith("/time_entries"):
+            endpoint = "time_entries"
+            body = self.time_entries(query)
+        else:
+            endpoint = "task"
+            task_number = int(url.path.rsplit("/task", 1)[-1])
+            body = fake_task(task_number, self.server.tasks_per_list)
+        with self.server.lock:
+            self.server.requests[endpoint] += 1
+        self.send_json(body, 200, rate_limit_headers)
+
+    def rate_limit_headers(self):
+        """Counts this request into the current minute, returning Click-Up's X-RateLimit-* headers, and Retry-After if over the server's rate limit."""
+        if not self.server.rate_limit:
+            return {}
+        with self.server.lock:
+            now = time.time()
+            if now >= self.server.rate_limit_reset:
+                self.server.rate_limit_reset = now + 60
+                self.server.rate_limit_remaining = self.server.rate_limit
+            self.server.rate_limit_remaining -= 1
+            headers = {
+                "X-RateLimit-Limit": str(self.server.rate_limit),
+                "X-RateLimit-Remaining": str(max(self.server.rate_limit_remaining, 0)),
+                "X-RateLimit-Reset": str(self.server.rate_limit_reset),
+            }
+            if self.server.rate_limit_remaining < 0:
+                headers["Retry-After"] = str(self.server.rate_limit_reset - now)
+        return headers
+
+    def team_tasks(self, query):
+        """Returns a page of non-archived tasks, filtered by list ids."""
+        list_ids = set(query.get("list_ids[]", []))
+        task_numbers = [
+            task_number
+            for task_number in range(self.server.task_count)
+            if task_number % ARCHIVED_TASK_EVERY
+            and (
+                not list_ids
+                or str(task_number // self.server.tasks_per_list) in list_ids
+            )
+        ]
+        page = int(query.get("page", ["0"])[0])
+        page_size = click_up_timesheeting.CLICKUP_TASKS_PAGE_SIZE
+        page_task_numbers = task_numbers[page * page_size : (page + 1) * page_size]
+        return {
+            "tasks": [
+                fake_task(task_number, self.server.tasks_per_list)
+                for task_number in page_task_numbers
+            ],
+            "last_page": (page + 1) * page_size >= len(task_numbers),
+        }
+
+    def time_entries(self, query):
+        """Returns the fake time entries starting between the start_date and end_date milliseconds timestamps."""
+        from_ts = int(query["start_date"][0])
+        to_ts = int(query["end_date"][0])
+        if self.server.time_entry_starts is None:
+            return {
+                "data": [
+                    entry
+                    for entry in self.server.time_entries
+                    if from_ts <= int(entry["start"]) <= to_ts
+                ]
+            }
+        return {
+            "data": self.server.time_entries[
+                bisect.bisect_left(
+                    self.server.time_entry_starts, from_ts
+                ) : bisect.bisect_right(self.server.time_entry_starts, to_ts)
+            ]
+        }
+
+    def send_json(self, body, status=200, headers=None):
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def mock_click_up_api(
+    latency=DEFAULT_LATENCY,
+    task_count=DEFAULT_TASK_COUNT,
+    tasks_per_list=DEFAULT_TASKS_PER_LIST,
+    rate_limit=0,
+):
+    """Runs a local mocked Click-Up API, allowing rate_limit requests per minute if not 0, and points the module under benchmark to it.
+    Time entries are filtered by scanning server.time_entries, or by bisecting them if server.time_entry_starts lists their sorted starts.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockClickUpHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.task_count = task_count
+    server.tasks_per_list = tasks_per_list
+    server.rate_limit = rate_limit
+    server.rate_limit_remaining = rate_limit
+    server.rate_limit_reset = 0
+    server.connections = 0
+    server.requests = Counter()
+    server.time_entries = []
+    server.time_entry_starts = None
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    original_api_url = click_up_timesheeting.CLICKUP_API_URL
+    click_up_timesheeting.CLICKUP_API_URL = "http://127.0.0.1:{}/api/v2".format(
+        server.server_address[1]
+    )
+    try:
+        yield server
+    finally:
+        click_up_timesheeting.CLICKUP_API_URL = original_api_url
+        server.shutdown()
+        server.server_close()
+
+
+def time_task_fetching(task_ids, max_concurrency):
+    """Returns the seconds elapsed and tasks fetched by fetch_tasks_general_data(), starting from an empty cache."""
+    click_up_timesheeting.TASKS.clear()
+    started = time.perf_counter()
+    tasks = click_up_timesheeting.fetch_tasks_general_data(
+        task_ids, DEFAULT_CLICKUP_TOKEN, max_concurrency=max_concurrency
+    )
+    return time.perf_counter() - started, deepcopy(tasks)
+
+
+def task_fetching(
+    task_count=DEFAULT_TASK_COUNT,
+    latency=DEFAULT_LATENCY,
+    max_concurrency=click_up_timesheeting.DEFAULT_MAX_CONCURRENCY,
+):
+    """Compares sequential and concurrent task fetching against a mocked API with injected latency."""
+    task_ids = ["task{}".format(i) for i in range(task_count)]
+    with mock_click_up_api(latency=latency, task_count=task_count) as server:
+
+        click_up_timesheeting.get_click_up_client(
+            DEFAULT_CLICKUP_TOKEN, pool_size=max_concurrency, rate_limit=0
+        )
+        sequential_seconds, sequential_tasks = time_task_fetching(task_ids, 1)
+        concurrent_seconds, concurrent_tasks = time_task_fetching(
+            task_ids, max_concurrency
+        )
+        connections = server.connections
+    click_up_timesheeting.TASKS.clear()
+
+    assert sequential_tasks == concurrent_tasks, "Concurrent results differ"
+    print(
+        "{} tasks, {:.3f}s latency: sequential {:.2f}s, concurrent ({} workers) {:.2f}s, speedup x{:.1f}, {} connections for {} requests".format(
+            task_count,
+            latency,
+            sequential_seconds,
+            max_concurrency,
+            concurrent_seconds,
+            sequential_seconds / concurrent_seconds,
+            connections,
+            task_count * 2,
+        )
+    )
+
+
+def task_resolution(
+    task_count=1000,
+    tasks_per_list=DEFAULT_TASKS_PER_LIST,
+    latency=DEFAULT_LATENCY,
+    max_concurrency=click_up_timesheeting.DEFAULT_MAX_CONCURRENCY,
+):
+    """Compares request counts and durations of the task resolution strategies, for time entries referring to task_count tasks."""
+    entries = [
+        {
+            "task": {"id": task["id"], "name": task["name"]},
+            "task_location": {
+                "list_id": task["list"]["id"],
+                "list_name": task["list"]["name"],
+                "folder_id": task["folder"]["id"],
+                "folder_name": task["folder"]["name"],
+            },
+        }
+        for task in (fake_task(i, tasks_per_list) for i in range(task_count))
+    ]
+    results = {}
+    with mock_click_up_api(latency, task_count, tasks_per_list) as server:
+
+        click_up_timesheeting.get_click_up_client(
+            DEFAULT_CLICKUP_TOKEN, pool_size=max_concurrency, rate_limit=0
+        )
+        for strategy in click_up_timesheeting.TASK_RESOLUTIONS:
+            click_up_timesheeting.TASKS.clear()
+            server.requests.clear()
+            started = time.perf_counter()
+            tasks = click_up_timesheeting.resolve_tasks(
+                entries,
+                DEFAULT_CLICKUP_TOKEN,
+                DEFAULT_TEAM_ID,
+                task_resolution=strategy,
+                max_concurrency=max_concurrency,
+            )
+            seconds = time.perf_counter() - started
+            # Compares the fields reports use, as lean tasks only have those
+            results[strategy] = {
+                task_id: (
+                    task["name"],
+                    task["list"]["name"],
+                    task["project"]["name"],
+                    task["folder"]["name"],
+                )
+                for task_id, task in tasks.items()
+            }
+            print(
+                "{}: {} tasks resolved in {:.2f}s with {} requests ({})".format(
+                    strategy,
+                    len(tasks),
+                    seconds,
+                    sum(server.requests.values()),
+                    ", ".join(
+                        "{} {}".format(count, endpoint)
+                        for endpoint, count in sorted(server.requests.items())
+                    ),
+                )
+            )
+    click_up_timesheeting.TASKS.clear()
+    assert all(
+        tasks == results[click_up_timesheeting.DEFAULT_TASK_RESOLUTION]
+        for tasks in results.values()
+    ), "Task resolution strategies results differ"
+
+
+def fake_time_entries(from_ts, to_ts, entry_count, task_count):
+    """Returns entry_count one hour long time entries spread from from_ts to to_ts, over task_count tasks."""
+    step = (to_ts - from_ts) // entry_count
+    return [
+        {
+            "id": str(n),
+            "task": {"id": "task{}".format(n % task_count)},
+            "start": str(from_ts + n * step),
+            "end": str(from_ts + n * step + 3600000),
+            "duration": "3600000",
+        }
+        for n in range(entry_count)
+    ]
+
+
+def engines(
+    entry_count=2000,
+    task_count=DEFAULT_TASK_COUNT,
+    latency=DEFAULT_LATENCY,
+    max_concurrency=click_up_timesheeting.DEFAULT_MAX_CONCURRENCY,
+    from_date="2022-01-01",
+    to_date="2022-12-31",
+):
+    """Compares the threads and async engines end to end, from time entries fetched by monthly chunks to task lookups."""
+    _, _, from_ts, to_ts = click_up_timesheeting.time_entries_date_range(
+        from_date, to_date, None
+    )
+    views = {}
+    with mock_click_up_api(latency=latency, task_count=task_count) as server:
+        server.time_entries = fake_time_entries(from_ts, to_ts, entry_count, task_count)
+        for engine in click_up_timesheeting.ENGINES:
+            click_up_timesheeting.TASKS.clear()
+            click_up_timesheeting.DAYS.clear()
+            server.requests.clear()
+            started = time.perf_counter()
+            click_up_timesheeting.grab_time_entries(
+                from_date=from_date,
+                to_date=to_date,
+                click_up_token=DEFAULT_CLICKUP_TOKEN,
+                click_up_team_id=DEFAULT_TEAM_ID,
+                max_concurrency=max_concurrency,
+                rate_limit=0,  # The mocked API has no rate limit
+                engine=engine,
+            )
+            seconds = time.perf_counter() - started
+            views[engine] = (
+                deepcopy(click_up_timesheeting.TASKS),
+                deepcopy(click_up_timesheeting.DAYS),
+            )
+            print(
+                "{} engine: {} time entries and {} tasks in {:.2f}s with {} requests".format(
+                    engine,
+                    entry_count,
+                    len(click_up_timesheeting.TASKS),
+                    seconds,
+                    sum(server.requests.values()),
+                )
+            )
+    click_up_timesheeting.TASKS.clear()
+    click_up_timesheeting.DAYS.clear()
+    assert all(
+        view == views[click_up_timesheeting.DEFAULT_ENGINE] for view in views.values()
+    ), "Engines results differ"
+
+
+def streaming(
+    entry_count=100000,
+    task_count=DEFAULT_TASK_COUNT,
+    from_date="2022-01-01",
+    to_date="2022-12-31",
+):
+    """Compares peak memory and duration of grab_time_entries() with and without streamed time entries."""
+    _, _, from_ts, to_ts = click_up_timesheeting.time_entries_date_range(
+        from_date, to_date, None
+    )
+    views = {}
+    with mock_click_up_api(latency=0, task_count=task_count) as server:
+        server.time_entries = fake_time_entries(from_ts, to_ts, entry_count, task_count)
+        for stream in (False, True):
+            click_up_timesheeting.TASKS.clear()
+            click_up_timesheeting.DAYS.clear()
+            tracemalloc.start()
+            started = time.perf_counter()
+            click_up_timesheeting.grab_time_entries(
+                from_date=from_date,
+                to_date=to_date,
+                click_up_token=DEFAULT_CLICKUP_TOKEN,
+                click_up_team_id=DEFAULT_TEAM_ID,
+                rate_limit=0,  # The mocked API has no rate limit
+                stream=stream,
+            )
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            views[stream] = (
+                deepcopy(click_up_timesheeting.TASKS),
+                deepcopy(click_up_timesheeting.DAYS),
+            )
+            print(
+                "stream={}: {} time entries in {:.2f}s, {:.1f} MiB peak memory".format(
+                    stream, entry_count, seconds, peak / 2**20
+                )
+            )
+    click_up_timesheeting.TASKS.clear()
+    click_up_timesheeting.DAYS.clear()
+    assert views[True] == views[False], "Streamed results differ"
+
+
+def per_entry_aggregation(entries):
+    """The former grab_time_entries() aggregation loop, one datetime and human duration computation per time entry, without progress output."""
+    tasks, days = {}, {}
+    for d in entries:
+        duration_seconds = int(d["duration"]) / 1000
+        task_id = d["task"]["id"]
+        tasks.setdefault(task_id, {"total_duration": 0})
+        tasks[task_id]["total_duration"] += duration_seconds
+        task_start_ts = datetime.fromtimestamp(int(d["start"]) / 1000)
+        task_date = task_start_ts.strftime("%Y-%m-%d")
+        days.setdefault(task_date, {"total_duration": 0})
+        days[task_date]["total_duration"] += duration_seconds
+        tasks[task_id][
+            "total_duration_human"
+        ] = click_up_timesheeting.tupled_total_duration_human(
+            tasks[task_id]["total_duration"]
+        )
+        days[task_date][
+            "total_duration_human"
+        ] = click_up_timesheeting.tupled_total_duration_human(
+            days[task_date]["total_duration"]
+        )
+    return tasks, days
+
+
+def columnar_aggregation(entries):
+    """Aggregates time entries like grab_time_entries() does, through TimeEntryColumns, without progress output."""
+    with redirect_stdout(io.StringIO()):
+        columns = click_up_timesheeting.TimeEntryColumns(entries)
+    task_durations, days = click_up_timesheeting.aggregate_time_entries(columns)
+    return task_durations, days
+
+
+def aggregation(
+    entry_count=500000,
+    task_count=DEFAULT_TASK_COUNT,
+    from_date="2022-01-01",
+    to_date="2022-12-31",
+):
+    """Compares the former per time entry aggregation loop and the columnar aggregation, with and without NumPy."""
+    _, _, from_ts, to_ts = click_up_timesheeting.time_entries_date_range(
+        from_date, to_date, None
+    )
+    entries = fake_time_entries(from_ts, to_ts, entry_count, task_count)
+    numpy = click_up_timesheeting.optional_numpy()
+    runs = [("per entry loop", per_entry_aggregation)]
+    if numpy is not None:
+        runs.append(("columnar, NumPy", columnar_aggregation))
+    runs.append(("columnar, pure Python", columnar_aggregation))
+    results = {}
+    for name, aggregate in runs:
+        click_up_timesheeting.numpy = numpy if name == "columnar, NumPy" else None
+        started = time.perf_counter()
+        results[name] = aggregate(entries)
+        print(
+            "{}: {} time entries aggregated in {:.2f}s".format(
+                name, entry_count, time.perf_counter() - started
+            )
+        )
+    click_up_timesheeting.numpy = numpy
+
+    tasks, days = results.pop("per entry loop")
+    for task_durations, columnar_days in results.values():
+        assert sorted(task_durations) == sorted(
+            round(task["total_duration"] * 1000) for task in tasks.values()
+        ), "Task durations differ"
+        assert {date: duration for date, (_, duration) in columnar_days.items()} == {
+            date: round(day["total_duration"] * 1000) for date, day in days.items()
+        }, "Day durations differ"
+
+
+def snapshots(
+    entry_count=1000000,
+    task_count=DEFAULT_TASK_COUNT,
+    from_date="2022-01-01",
+    to_date="2022-12-31",
+):
+    """Compares saving time entries with their tasks as a JSON file and as a snapshot file, then loading and aggregating them again."""
+    _, _, from_ts, to_ts = click_up_timesheeting.time_entries_date_range(
+        from_date, to_date, None
+    )
+    entries = fake_time_entries(from_ts, to_ts, entry_count, task_count)
+    tasks = {"task{}".format(n): fake_task(n) for n in range(task_count)}
+    with redirect_stdout(io.StringIO()):
+        columns = click_up_timesheeting.TimeEntryColumns(entries)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {
+            "JSON": os.path.join(directory, "entries.json"),
+            "snapshot": os.path.join(directory, "entries.snapshot"),
+        }
+
+        def write_json(path):
+            with open(path, "w") as fp:
+                json.dump({"data": entries, "tasks": tasks}, fp)
+
+        def load_json(path):
+            with open(path, "r") as fp:
+                return columnar_aggregation(json.load(fp)["data"])
+
+        def load_snapshot(path):
+            snapshot = click_up_timesheeting.Snapshot(path)
+            return click_up_timesheeting.aggregate_time_entries(snapshot.columns)
+
+        runs = {
+            "JSON": (write_json, load_json),
+            "snapshot": (
+                lambda path: click_up_timesheeting.write_snapshot(path, columns, tasks),
+                load_snapshot,
+            ),
+        }
+        results = {}
+        for name, (write, load) in runs.items():
+            started = time.perf_counter()
+            write(paths[name])
+            written = time.perf_counter() - started
+            started = time.perf_counter()
+            results[name] = load(paths[name])
+            print(
+                "{}: {} time entries written in {:.2f}s, loaded and aggregated in {:.2f}s, {:.1f} MiB".format(
+                    name,
+                    entry_count,
+                    written,
+                    time.perf_counter() - started,
+                    os.path.getsize(paths[name]) / 2**20,
+                )
+            )
+
+    assert results["JSON"] == results["snapshot"], "Aggregated durations differ"
+
+
+def sub_ranges(
+    entry_count=200000,
+    task_count=DEFAULT_TASK_COUNT,
+    year=2022,
+):
+    """Compares making the 12 monthly reports of a year of time entries already kept locally: from the time entry store, and from a snapshot scanned or bisected."""
+    _, _, from_ts, to_ts = click_up_timesheeting.time_entries_date_range(
+        "{}-01-01".format(year), "{}-12-31".format(year), None
+    )
+    entries = fake_time_entries(from_ts, to_ts, entry_count, task_count)
+    months = [
+        click_up_timesheeting.time_entries_date_range(
+            "{}-{:02d}-01".format(year, month),
+            "{}-{:02d}-{:02d}".format(year, month, calendar.monthrange(year, month)[1]),
+            None,
+        )[2:]
+        for month in range(1, 13)
+    ]
+    with redirect_stdout(io.StringIO()):
+        columns = click_up_timesheeting.TimeEntryColumns(entries)
+    with tempfile.TemporaryDirectory() as directory:
+        store = click_up_timesheeting.TimeEntryStore(
+            os.path.join(directory, "entries.sqlite3")
+        )
+        store.store(DEFAULT_TEAM_ID, from_ts, to_ts, entries)
+        snapshot_path = os.path.join(directory, "entries.snapshot")
+        click_up_timesheeting.write_snapshot(
+            snapshot_path,
+            columns,
+            {"task{}".format(n): fake_task(n) for n in range(task_count)},
+        )
+        snapshot = click_up_timesheeting.Snapshot(snapshot_path)
+        scanned = click_up_timesheeting.TimeEntryColumns.from_columns(
+            snapshot.columns.starts,
+            snapshot.columns.durations,
+            snapshot.columns.task_indexes,
+            list(snapshot.tasks),
+        )
+        runs = {
+            "store range scans": lambda from_ts, to_ts: columnar_aggregation(
+                store.entries(DEFAULT_TEAM_ID, from_ts, to_ts)
+            ),
+            "snapshot, scanned": lambda from_ts, to_ts: click_up_timesheeting.aggregate_time_entries(
+                scanned.between(from_ts, to_ts)
+            ),
+            "snapshot, bisected": lambda from_ts, to_ts: click_up_timesheeting.aggregate_time_entries(
+                snapshot.columns.between(from_ts, to_ts)
+            ),
+        }
+        results = {}
+        for name, aggregate in runs.items():
+            started = time.perf_counter()
+            results[name] = [aggregate(*month) for month in months]
+            seconds = time.perf_counter() - started
+            print(
+                "{}: 12 monthly reports out of {} time entries in {:.3f}s".format(
+                    name, entry_count, seconds
+                )
+            )
+        store.close()
+
+    # Task indexes follow each month's first time entries in every run
+    first_results = results.pop("store range scans")
+    for name, result in results.items():
+        assert result == first_results, name + " results differ"
+
+
+def html_rendering(document_count=200, json_path="examples/example1.json"):
+    """Compares rendering document_count HTML reports with a new Jinja environment each, as formerly, and with a shared HtmlRenderer, cold and warm."""
+    with open(json_path, "r") as fp:
+        time_entries = json.load(fp)
+    with tempfile.TemporaryDirectory() as directory:
+        runs = {
+            "new environment each": lambda: click_up_timesheeting.HtmlRenderer(),
+            "shared renderer": lambda renderer=click_up_timesheeting.HtmlRenderer(): renderer,
+        }
+        for name, renderer in runs.items():
+            started = time.perf_counter()
+            for _ in range(document_count):
+                renderer().render(time_entries, language="fr_FR")
+            print(
+                "{}: {} HTML reports rendered in {:.3f}s".format(
+                    name, document_count, time.perf_counter() - started
+                )
+            )
+        # First render of a run, as with a new process
+        for name in ("cold start, empty template cache", "cold start, template cache"):
+            started = time.perf_counter()
+            click_up_timesheeting.HtmlRenderer(
+                template_cache_directory=directory
+            ).render(time_entries, language="fr_FR")
+            print("{}: {:.4f}s".format(name, time.perf_counter() - started))
+
+
+def date_formatting(years=3, renders=10, languages=("en_US", "fr_FR")):
+    """Compares formatting every day of several years, once per report render, with dateutil and Babel on every call as formerly, and memoized."""
+    from babel.dates import format_date
+    import dateutil.parser
+
+    first_day = datetime(2020, 1, 1, 8)
+    iso_dates = [
+        (first_day + timedelta(days=n)).isoformat() + "+01:00"
+        for n in range(365 * years)
+    ]
+    runs = {
+        "dateutil and Babel": lambda a_date, language: format_date(
+            dateutil.parser.parse(a_date), format="full", locale=language
+        ),
+        "memoized": lambda a_date, language: click_up_timesheeting.format_iso_date(
+            a_date, "full", language
+        ),
+    }
+    results = {}
+    for name, str_to_date in runs.items():
+        started = time.perf_counter()
+        for _ in range(renders):
+            results[name] = [
+                str_to_date(a_date, language)
+                for language in languages
+                for a_date in iso_dates
+            ]
+        print(
+            "{}: {} dates formatted in {:.3f}s".format(
+                name,
+                renders * len(languages) * len(iso_dates),
+                time.perf_counter() - started,
+            )
+        )
+    assert (
+        results["memoized"] == results["dateutil and Babel"]
+    ), "Formatted dates differ"
+
+
+def pdf_rendering(
+    document_count=16, processes=None, html_path="examples/example1.html"
+):
+    """Compares rendering document_count PDFs from the same HTML document in this process and with a pool of processes, defaulting to one per CPU."""
+    with open(html_path, "r") as fp:
+        html_content = fp.read()
+    with tempfile.TemporaryDirectory() as directory:
+        payloads = [
+            (html_content, os.path.join(directory, "{}.pdf".format(n)))
+            for n in range(document_count)
+        ]
+        durations = {}
+        processes = processes or os.cpu_count()
+        for pool_processes in (1, processes):
+            started = time.perf_counter()
+            click_up_timesheeting.render_pdfs(payloads, processes=pool_processes)
+            durations[pool_processes] = time.perf_counter() - started
+            print(
+                "{} process(es): {} PDFs rendered in {:.2f}s".format(
+                    pool_processes, document_count, durations[pool_processes]
+                )
+            )
+    print("Speedup x{:.1f}".format(durations[1] / durations[processes]))
+
+
+STARTUP_BUDGET_MS = 50  # to import the module under benchmark
+# Modules only the code paths using them import
+STARTUP_LAZY_MODULES = [
+    "asyncio",
+    "dateutil",
+    "jinja2",
+    "numpy",
+    "requests",
+    "weasyprint",
+]
+
+
+def import_time(code, runs):
+    """Returns the best of runs microseconds spent importing modules in a new Python process running code, along with its modules' [self, cumulative, name] import times."""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # "import time: self [us] | cumulative | imported package" lines
+        modules = [
+            [part.strip() for part in line.split(":", 1)[1].split("|")]
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:") and "self [us]" not in line
+        ]
+        total = sum(int(self_us) for self_us, _, _ in modules)
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+def startup(runs=5, top=8, budget_ms=STARTUP_BUDGET_MS):
+    """Measures the module's import time (python -X importtime), and that of a console only report from JSON, checking the first against a budget unless budget_ms is None.
+    Importing the module must not import any of STARTUP_LAZY_MODULES, whatever the machine's speed.
+    """
+    codes = {
+        "import": "import {}".format(MODULE_UNDER_BENCHMARK),
+        "console report from JSON": "import {0}\n{0}.main(from_json=True, json_input_path='examples/example1.json')".format(
+            MODULE_UNDER_BENCHMARK
+        ),
+    }
+    # Imports of the interpreter's own startup are left out
+    baseline_total, baseline_modules = import_time("pass", runs)
+    baseline_modules = {module.strip() for _, _, module in baseline_modules}
+    totals = {}
+    for name, code in codes.items():
+        total, modules = import_time(code, runs)
+        totals[name] = total - baseline_total
+        modules = [
+            module for module in modules if module[2].strip() not in baseline_modules
+        ]
+        print("{}: {:.1f}ms of imports".format(name, totals[name] / 1000))
+        if name == "import":
+            imported = modules
+        for self_us, cumulative_us, module in sorted(
+            modules, key=lambda module: -int(module[0])
+        )[:top]:
+            print("  {:>8.1f}ms {}".format(int(self_us) / 1000, module.strip()))
+    eager_modules = sorted(
+        {module.strip().split(".")[0] for _, _, module in imported}
+        & set(STARTUP_LAZY_MODULES)
+    )
+    assert not eager_modules, "Importing {} imports {}".format(
+        MODULE_UNDER_BENCHMARK, ", ".join(eager_modules)
+    )
+    assert (
+        budget_ms is None or totals["import"] / 1000 <= budget_ms
+    ), "Importing {} takes more than {}ms".format(MODULE_UNDER_BENCHMARK, budget_ms)
+
+
+# Time entries count of each suite() dataset, spread over a year and SUITE_TASK_COUNT tasks
+SUITE_DATASETS = {"1k": 1000, "100k": 100000, "1M": 1000000}
+SUITE_TASK_COUNT = 10000
+SUITE_YEAR = 2022
+
+
+def run_main(arguments, environment, log_path):
+    """Runs the module under benchmark's command line with arguments, returning its wall time in seconds and its peak resident memory in MiB."""
+    started = time.perf_counter()
+    with open(log_path, "w") as log_file:
+        process = subprocess.Popen(
+            [sys.executable, MODULE_UNDER_BENCHMARK + ".py"] + arguments,
+            env=dict(os.environ, **environment),
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+        )
+        # Unlike resource.getrusage(RUSAGE_CHILDREN), this child's own resource usage
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1
+    seconds = time.perf_counter() - started
+    if process.returncode:
+        with open(log_path, "r") as log_file:
+            print(log_file.read()[-2000:])
+        raise RuntimeError("{} failed".format(" ".join(arguments)))
+    # Kilobytes on Linux, bytes on macOS
+    peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return seconds, peak_rss / 2**20
+
+
+def suite(
+    datasets="1k,100k",
+    latency=0.005,
+    rate_limit=0,
+    max_concurrency=click_up_timesheeting.DEFAULT_MAX_CONCURRENCY,
+    task_resolution=click_up_timesheeting.DEFAULT_TASK_RESOLUTION,
+    output_path=None,
+    baseline_path=None,
+    tolerance=None,
+):
+    """Measures end to end main() runs over SUITE_DATASETS (comma separated names) against the mocked Click-Up API: wall time, requests, peak RSS and phases.
+    The mocked API answers after latency seconds and allows rate_limit requests per minute, which main() is also told, unless 0.
+    Results are written as JSON to output_path, and checked against those of baseline_path if given: requests may not exceed the baseline's.
+    With a tolerance, wall time and peak RSS may not exceed the baseline's by more than tolerance times either, which only holds against a baseline recorded on the same machine.
+    """
+    from dateutil import tz
+
+    if isinstance(datasets, str):
+        datasets = datasets.split(",")
+    from_date, to_date = "{}-01-01".format(SUITE_YEAR), "{}-12-31".format(SUITE_YEAR)
+    _, _, from_ts, to_ts = click_up_timesheeting.time_entries_date_range(
+        from_date, to_date, tz.gettz(click_up_timesheeting.DEFAULT_TIMEZONE)
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, mock_click_up_api(
+        latency=latency, task_count=SUITE_TASK_COUNT, rate_limit=rate_limit
+    ) as server:
+        for dataset in datasets:
+            server.time_entries = fake_time_entries(
+                from_ts, to_ts, SUITE_DATASETS[dataset], SUITE_TASK_COUNT
+            )
+            server.time_entry_starts = [
+                int(entry["start"]) for entry in server.time_entries
+            ]
+            server.requests.clear()
+            profile_path = os.path.join(directory, dataset + ".json")
+            seconds, peak_rss_mib = run_main(
+                [
+                    "--from-date=" + from_date,
+                    "--to-date=" + to_date,
+                    "--click-up-token=" + DEFAULT_CLICKUP_TOKEN,
+                    "--click-up-team-id=" + DEFAULT_TEAM_ID,
+                    "--max-concurrency={}".format(max_concurrency),
+                    "--rate-limit={}".format(rate_limit),
+                    "--task-resolution=" + task_resolution,
+                    "--bypass-task-cache",
+                    "--as-json",
+                    "--json-output-path=" + os.path.join(directory, "report.json"),
+                    "--as-html",
+                    "--html-output-path=" + os.path.join(directory, "report.html"),
+                    "--profile",
+                    "--profile-output-path=" + profile_path,
+                ],
+                {
+                    "CLICKUP_API_URL": click_up_timesheeting.CLICKUP_API_URL,
+                    "XDG_CACHE_HOME": directory,
+                },
+                os.path.join(directory, dataset + ".log"),
+            )
+            with open(profile_path, "r") as fp:
+                profile = json.load(fp)
+            results[dataset] = {
+                "entries": SUITE_DATASETS[dataset],
+                "seconds": round(seconds, 3),
+                "peak_rss_mib": round(peak_rss_mib, 1),
+                "requests": sum(server.requests.values()),
+                "requests_by_endpoint": dict(server.requests),
+                "phases": {
+                    phase: round(timing["seconds"], 3)
+                    for phase, timing in profile["phases"].items()
+                },
+            }
+            print(
+                "{}: {} time entries in {:.2f}s, {} requests, {:.0f} MiB peak RSS".format(
+                    dataset,
+                    SUITE_DATASETS[dataset],
+                    seconds,
+                    results[dataset]["requests"],
+                    peak_rss_mib,
+                )
+            )
+            for phase, phase_seconds in list(results[dataset]["phases"].items())[:6]:
+                print("  {:>8.2f}s {}".format(phase_seconds, phase))
+
+    if output_path:
+        with open(output_path, "w") as fp:
+            json.dump(results, fp, indent=2)
+        print("Wrote", output_path)
+    if baseline_path:
+        with open(baseline_path, "r") as fp:
+            baseline = json.load(fp)
+        regressions = []
+        for dataset, result in results.items():
+            expected = baseline.get(dataset)
+            if expected is None:
+                continue
+            # Wall time and peak RSS depend on the machine, unlike requests
+            timed_metrics = ("seconds", "peak_rss_mib") if tolerance is not None else ()
+            for metric in timed_metrics:
+                if result[metric] > expected[metric] * (1 + tolerance):
+                    regressions.append(
+                        "{} {}: {:.2f} against {:.2f}".format(
+                            dataset, metric, result[metric], expected[metric]
+                        )
+                    )
+            if result["requests"] > expected["requests"]:
+                regressions.append(
+                    "{} requests: {} against {}".format(
+                        dataset, result["requests"], expected["requests"]
+                    )
+                )
+        assert not regressions, "Regressions from {}:\n{}".format(
+            baseline_path, "\n".join(regressions)
+        )
+
+
+def serving(
+    report_count=10,
+    entry_count=2000,
+    task_count=DEFAULT_TASK_COUNT,
+    latency=DEFAULT_LATENCY,
+    format="html",
+):
+    """Compares making report_count reports with a command line run each, and with requests to a warm report server, see serve()."""
+    import urllib.request
+    from dateutil import tz
+
+    from_date, to_date = "2022-01-01", "2022-12-31"
+    _, _, from_ts, to_ts = click_up_timesheeting.time_entries_date_range(
+        from_date, to_date, tz.gettz(click_up_timesheeting.DEFAULT_TIMEZONE)
+    )
+    with tempfile.TemporaryDirectory() as directory, mock_click_up_api(
+        latency=latency, task_count=task_count
+    ) as server:
+        server.time_entries = fake_time_entries(from_ts, to_ts, entry_count, task_count)
+        environment = {
+            "CLICKUP_API_URL": click_up_timesheeting.CLICKUP_API_URL,
+            "XDG_CACHE_HOME": directory,
+        }
+        arguments = [
+            "--from-date=" + from_date,
+            "--to-date=" + to_date,
+            "--click-up-token=" + DEFAULT_CLICKUP_TOKEN,
+            "--click-up-team-id=" + DEFAULT_TEAM_ID,
+            "--rate-limit=0",
+        ]
+        # The first run fills the task cache, as a server's first request does
+        run_main(arguments, environment, os.path.join(directory, "warmup.log"))
+        started = time.perf_counter()
+        for n in range(report_count):
+            run_main(
+                arguments
+                + [
+                    "--as-" + format,
+                    "--{}-output-path={}".format(
+                        format, os.path.join(directory, "{}.{}".format(n, format))
+                    ),
+                ],
+                environment,
+                os.path.join(directory, "{}.log".format(n)),
+            )
+        print(
+            "command line: {} {} reports in {:.2f}s".format(
+                report_count, format, time.perf_counter() - started
+            )
+        )
+
+        with redirect_stdout(io.StringIO()):
+            report_server = click_up_timesheeting.report_server(
+                port=0,
+                click_up_token=DEFAULT_CLICKUP_TOKEN,
+                click_up_team_id=DEFAULT_TEAM_ID,
+                rate_limit=0,
+                task_cache_path=os.path.join(directory, "server-tasks.sqlite3"),
+            )
+        report_server.RequestHandlerClass.log_message = lambda *args: None
+        thread = threading.Thread(target=report_server.serve_forever, daemon=True)
+        thread.start()
+        url = "http://127.0.0.1:{}/report?from_date={}&to_date={}&format={}".format(
+            report_server.server_address[1], from_date, to_date, format
+        )
+        try:
+            with redirect_stdout(io.StringIO()):
+                urllib.request.urlopen(url).read()
+                started = time.perf_counter()
+                for _ in range(report_count):
+                    urllib.request.urlopen(url).read()
+            print(
+                "report server: {} {} reports in {:.2f}s".format(
+                    report_count, format, time.perf_counter() - started
+                )
+            )
+        finally:
+            report_server.shutdown()
+            report_server.server_close()
+            if report_server.pdf_executor is not None:
+                report_server.pdf_executor.shutdown()
+            report_server.task_cache.close()
+
+
+if __name__ == "__main__":
+    fire.Fire(
+        {
+            "task_fetching": task_fetching,
+            "task_resolution": task_resolution,
+            "engines": engines,
+            "streaming": streaming,
+            "aggregation": aggregation,
+            "snapshots": snapshots,
+            "sub_ranges": sub_ranges,
+            "html_rendering": html_rendering,
+            "date_formatting": date_formatting,
+            "startup": startup,
+            "pdf_rendering": pdf_rendering,
+            "suite": suite,
+            "serving": serving,
+        }
+    )
@@ -1,28 +1,35 @@
 #!/usr/bin/env python
 # builtin modules
+from array import array
 import base64
+import bisect
+import codecs
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import functools
+import importlib.util
 import json
+import mmap
 import os
 import os.path
+import random
+import re
+import sqlite3
+import struct
 import sys
+import threading
+import time
 
 # contrib modules
-from babel.dates import format_date
-from dateutil import tz
-import dateutil.parser
-from dateutil.relativedelta import relativedelta
+# Heavier modules (asyncio, babel, dateutil, fire, jinja2, requests, numpy) are imported by the functions using them, for a fast startup
 from dotenv import load_dotenv
-import fire
 import gettext
-from jinja2 import Environment, FileSystemLoader
-import requests
-
 
 # Environment variables retrieval
 load_dotenv()
 CLICKUP_PK = os.getenv("CLICKUP_PK", False)
 CLICKUP_TEAM_ID = os.getenv("CLICKUP_TEAM_ID", False)
+CLICKUP_API_URL = os.getenv("CLICKUP_API_URL", "https://api.clickup.com/api/v2")
 
 # Global constants
 DEFAULT_MONTHS_BACKWARDS = 12
@@ -35,32 +42,952 @@ DEFAULT_LANGUAGE = "en_US"  # Also available: fr_FR
 DEFAULT_PDF_OUTPUT_PATH = "time-entries.pdf"
 DEFAULT_HTML_OUTPUT_PATH = "time-entries.html"
 DEFAULT_JSON_OUTPUT_PATH = "time-entries.json"
+DEFAULT_SNAPSHOT_OUTPUT_PATH = "time-entries.snapshot"
 DEFAULT_JSON_INDENTS = 2
+DATE_FORMAT_CACHE_SIZE = 8192  # formatted dates kept in memory, by format and language
 JSON_REQUIRED_KEYS = {"from_date", "to_date", "days", "tasks", "total_duration"}
-
-# Tasks-based view for time tracking
+# main() options which each report of a batch manifest can set, see batch()
+BATCH_REPORT_KEYS = {
+    "from_date",
+    "to_date",
+    "filters",
+    "language",
+    "as_json",
+    "json_output_path",
+    "as_html",
+    "html_output_path",
+    "as_pdf",
+    "pdf_output_path",
+    "output_title",
+    "company_logo_img_path",
+    "customer_name",
+    "consultant_name",
+    "customer_signature_field",
+    "consultant_signature_field",
+}
+DEFAULT_SERVE_HOST = "127.0.0.1"
+DEFAULT_SERVE_PORT = 8080
+DEFAULT_SERVE_TASK_CACHE_REFRESH_INTERVAL = (
+    60  # seconds between two task cache refreshes
+)
+# main() options which report requests to serve() can set, as query string parameters, along with format
+SERVE_REPORT_PARAMETERS = {
+    "from_date",
+    "to_date",
+    "language",
+    "output_title",
+    "customer_name",
+    "consultant_name",
+    "customer_signature_field",
+    "consultant_signature_field",
+    "format",
+}
+# Report formats served by serve(), with their content types
+SERVE_FORMATS = {
+    "json": "application/json",
+    "html": "text/html; charset=utf-8",
+    "pdf": "application/pdf",
+}
+# Task information fields which batch reports can be filtered on, by id or name
+TASK_FILTER_FIELDS = ("task", "list", "folder", "project", "space")
+CLICKUP_TASKS_PAGE_SIZE = 100  # Tasks per page in Click-Up task listings
+CLICKUP_LIST_IDS_PER_LISTING = 50  # Lists filtered by a single Click-Up task listing
+TASK_RESOLUTIONS = (
+    "per-task",  # one request per task
+    "bulk",  # paginated task listings of the time entries' lists
+    "lean",  # time entries' embedded task and location fields
+)
+DEFAULT_TASK_RESOLUTION = "per-task"
+ENGINES = (
+    "threads",  # time entries, then tasks, each fetched by a thread pool
+    "async",  # asyncio pipeline, looking tasks up as time entries arrive
+)
+DEFAULT_ENGINE = "threads"
+DEFAULT_MAX_CONCURRENCY = 8  # Maximum simultaneous Click-Up task requests
+DEFAULT_HTTP_TIMEOUT = 30  # seconds, for each Click-Up API request
+DEFAULT_RATE_LIMIT = 100  # requests per minute, Click-Up's lowest plan limit
+DEFAULT_MAX_RETRIES = 5  # for rate limited, failed or server error Click-Up requests
+DEFAULT_RETRY_BACKOFF = 1  # seconds, doubled after each retry
+DEFAULT_CACHE_DIRECTORY = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "click-up-timesheeting",
+)
+DEFAULT_TASK_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIRECTORY, "tasks.sqlite3")
+DEFAULT_TASK_CACHE_TTL = 7 * 24 * 3600  # seconds
+DEFAULT_TIME_ENTRY_STORE_PATH = os.path.join(
+    DEFAULT_CACHE_DIRECTORY, "time_entries.sqlite3"
+)
+DEFAULT_SYNC_OVERLAP_DAYS = 7  # Synced time entries younger than this are fetched again
+DEFAULT_CHUNK_MONTHS = 1  # Time entries are fetched by windows of that many months
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes read at once from streamed responses
+# Time zone offsets, thus local midnights, fall on quarter hours
+DAY_BUCKET_MS = 15 * 60 * 1000
+PROGRESS_STEP = 1000  # time entries loaded between two progress outputs
+DEFAULT_CHUNK_JOURNAL_DIRECTORY = os.path.join(
+    DEFAULT_CACHE_DIRECTORY, "time_entry_chunks"
+)
+CHUNK_JOURNAL_TTL = (
+    7 * 24 * 3600
+)  # seconds before an interrupted fetch's journal is given up
+# Compiled Jinja templates, reused across runs
+DEFAULT_TEMPLATE_CACHE_DIRECTORY = os.path.join(DEFAULT_CACHE_DIRECTORY, "templates")
+SNAPSHOT_MAGIC = (
+    b"CUTSNAP1"  # Leading bytes of snapshot files, with their format version
+)
+# TimeEntryColumns integer columns stored by snapshot files, in that order
+SNAPSHOT_COLUMNS = ("starts", "durations", "task_indexes")
+# Task information fields stored by snapshot files, those of task_from_time_entry()
+SNAPSHOT_TASK_FIELDS = (
+    "id",
+    "custom_id",
+    "name",
+    "status",
+    "list",
+    "folder",
+    "project",
+    "space",
+)
+# Dimensions of --group-by groupings, such as "folder>list>task", by what they are taken from
+GROUP_BY_DIMENSIONS = {
+    "year": "date",
+    "month": "date",
+    "week": "date",  # ISO 8601 week, such as "2023-W05"
+    "day": "date",
+    "space": "task",
+    "folder": "task",
+    "project": "task",
+    "list": "task",
+    "task": "task",
+    "tag": "task",  # Time entries of tasks with several tags count in each
+    "user": "user",
+}
+# GROUP_BY_DIMENSIONS snapshot files have no values of
+SNAPSHOT_MISSING_DIMENSIONS = {"tag", "user"}
+
+# Click-Up API clients, by API token
+CLICKUP_CLIENTS = {}
+CLICKUP_CLIENTS_LOCK = threading.Lock()
+# Tasks-based view for time tracking, of reports made without a ReportContext
 TASKS = {}
-# Days-based view for time tracking
+# Days-based view for time tracking, of reports made without a ReportContext
 DAYS = {}
+# Optional NumPy module, vectorizing aggregate_time_entries(): loaded by optional_numpy() on first use, None if missing
+numpy = False
+# HTML renderers, by template directory
+HTML_RENDERERS = {}
+HTML_RENDERERS_LOCK = threading.Lock()
+# WeasyPrint's HTML class and font configuration, loaded once per process by pdf_renderer()
+PDF_RENDERER = None
+# Phases wall time and counters of the current run, or None when not profiling, see start_profiling()
+PROFILER = None
+
+
+class Profiler:
+    """Wall time of a run's phases, by phase name, and counters such as of requests, response bytes and cache lookups.
+    Phases are recorded by @profiled functions and may nest, or overlap when run by several threads.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # phase name: [calls, seconds]
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.memoized_baselines = self.memoized_lookups()
+
+    def record(self, phase, seconds):
+        with self.lock:
+            timing = self.phases.setdefault(phase, [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+
+    def count(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @staticmethod
+    def memoized_lookups():
+        """Returns the (hits, misses) counts of memoized functions since the process started, by cache name."""
+        return {
+            name: tuple(function.cache_info()[:2])
+            for name, function in (
+                ("Babel locales", babel_locale),
+                ("day formatting", format_day),
+                ("date formatting", format_iso_date),
+            )
+        }
+
+    def report(self):
+        """Returns the run's profile as a JSON serializable dictionary of its total and phases wall time, counters, and cache lookups and hit rates."""
+        lookups = {
+            "task cache": (
+                self.counters.get("task cache hits", 0),
+                self.counters.get("task cache misses", 0),
+            )
+        }
+        for name, (hits, misses) in self.memoized_lookups().items():
+            baseline_hits, baseline_misses = self.memoized_baselines[name]
+            lookups[name] = (hits - baseline_hits, misses - baseline_misses)
+        return {
+            "seconds": time.perf_counter() - self.started,
+            "phases": {
+                phase: {"calls": calls, "seconds": seconds}
+                for phase, (calls, seconds) in sorted(
+                    self.phases.items(), key=lambda item: -item[1][1]
+                )
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "caches": {
+                name: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else None,
+                }
+                for name, (hits, misses) in lookups.items()
+            },
+        }
 
 
-def fetch_task_general_data(task_id, click_up_token):
-    """Get task information from the Click-Up API. Skip fetching if information is already in cache."""
-    if task_id in TASKS.keys():
-        return TASKS[task_id]
-    url = "https://api.clickup.com/api/v2/task/" + task_id
+def profiled(function):
+    """Decorates function so that the wall time of its calls is recorded into PROFILER under its name, when profiling."""
 
-    query = {"custom_task_ids": "true", "include_subtasks": "true"}
+    @functools.wraps(function)
+    def profiled_function(*args, **kwargs):
+        if PROFILER is None:
+            return function(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            PROFILER.record(function.__qualname__, time.perf_counter() - started)
+
+    return profiled_function
+
+
+def profile_count(counter, value=1):
+    """Adds value to a PROFILER counter, when profiling."""
+    if PROFILER is not None:
+        PROFILER.count(counter, value)
+
+
+def profiled_path(path):
+    """Returns a Click-Up API path with its team or task id replaced, to count requests by kind."""
+    return re.sub(r"^/(team|task)/[^/]+", r"/\1/{\1_id}", path)
+
+
+def start_profiling(profile=False, cprofile_output_path=None):
+    """Starts recording the run's phases into PROFILER if profile is set, and a cProfile profile of the main thread if cprofile_output_path is.
+    Returns the cProfile profiler, or None.
+    """
+    global PROFILER
+    if profile:
+        PROFILER = Profiler()
+    if cprofile_output_path:
+        import cProfile
+
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+        return cprofiler
+    return None
+
+
+def stop_profiling(cprofiler=None, profile_output_path=None, cprofile_output_path=None):
+    """Stops profiling, prints the profile summary and also writes it as JSON to the optional profile_output_path, then dumps cProfile stats to cprofile_output_path."""
+    global PROFILER
+    if PROFILER is not None:
+        profile = PROFILER.report()
+        PROFILER = None
+        print_profile(profile)
+        if profile_output_path:
+            with open(profile_output_path, "w") as profile_file:
+                json.dump(profile, profile_file, indent=DEFAULT_JSON_INDENTS)
+            print("Wrote", profile_output_path)
+    if cprofiler is not None:
+        cprofiler.disable()
+        cprofiler.dump_stats(cprofile_output_path)
+        print("Wrote", cprofile_output_path)
+
+
+def print_profile(profile):
+    """Prints a profile (see Profiler.report()) as tables of phases wall time, counters and cache hit rates."""
+    print("\nProfile: {:.3f}s".format(profile["seconds"]))
+    print("{:<50} {:>10} {:>10}".format("Phase", "Calls", "Seconds"))
+    for phase, timing in profile["phases"].items():
+        print(
+            "{:<50} {:>10} {:>10.3f}".format(phase, timing["calls"], timing["seconds"])
+        )
+    print("{:<50} {:>10}".format("Counter", "Value"))
+    for counter, value in profile["counters"].items():
+        print("{:<50} {:>10}".format(counter, value))
+    print("{:<50} {:>10} {:>10}".format("Cache", "Lookups", "Hit rate"))
+    for name, lookups in profile["caches"].items():
+        hit_rate = lookups["hit_rate"]
+        print(
+            "{:<50} {:>10} {:>10}".format(
+                name,
+                lookups["hits"] + lookups["misses"],
+                "-" if hit_rate is None else "{:.0%}".format(hit_rate),
+            )
+        )
+
+
+class RateLimiter:
+    """Token bucket pacing requests to rate_limit requests per minute, adjusted from Click-Up's X-RateLimit-* response headers.
+    A rate_limit of 0 disables pacing. Time spent waiting is added up in throttled_seconds.
+    """
+
+    def __init__(self, rate_limit=DEFAULT_RATE_LIMIT):
+        self.rate_limit = rate_limit
+        self.tokens = rate_limit
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0  # time.monotonic() value
+        self.throttled_seconds = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Waits until a request can be sent, then consumes a token."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.rate_limit:
+                    self.tokens = min(
+                        self.rate_limit,
+                        self.tokens + (now - self.updated_at) * self.rate_limit / 60,
+                    )
+                self.updated_at = now
+                if now >= self.blocked_until and (
+                    not self.rate_limit or self.tokens >= 1
+                ):
+                    self.tokens -= 1
+                    return
+                delay = max(
+                    self.blocked_until - now,
+                    (1 - self.tokens) * 60 / self.rate_limit if self.rate_limit else 0,
+                )
+            self.throttle(delay)
+
+    def update(self, headers):
+        """Aligns the bucket with the X-RateLimit-Limit, X-RateLimit-Remaining and X-RateLimit-Reset (epoch seconds) response headers."""
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        with self.lock:
+            if self.rate_limit:
+                self.rate_limit = limit
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0:
+                self.block(reset - time.time())
+
+    def block(self, delay):
+        """Holds back all requests for delay seconds."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    def throttle(self, delay):
+        if delay > 0:
+            with self.lock:
+                self.throttled_seconds += delay
+            time.sleep(delay)
+
+
+class ClickUpClient:
+    """Click-Up REST API client holding the API token and a pool of keep-alive connections, shared by all fetching threads.
+    Requests are paced by a RateLimiter and retried with jittered exponential backoff when rate limited (HTTP 429), on server errors and on connection errors.
+    """
+
+    def __init__(
+        self,
+        click_up_token,
+        pool_size=DEFAULT_MAX_CONCURRENCY,
+        timeout=DEFAULT_HTTP_TIMEOUT,
+        rate_limit=DEFAULT_RATE_LIMIT,
+        max_retries=DEFAULT_MAX_RETRIES,
+    ):
+        import requests
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limit = rate_limit
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.retries = 0
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Content-Type": "application/json",
+                "Authorization": click_up_token,
+                "Accept-Encoding": "gzip, deflate",
+            }
+        )
+        self.mount_adapter(pool_size)
+
+    def mount_adapter(self, pool_size):
+        """Mounts a pool of pool_size keep-alive connections, requests in flight finishing on the previous one."""
+        import requests
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def configure(self, **settings):
+        """Changes the client's __init__() settings in place, so that threads using it keep a working session."""
+        if settings.get("pool_size", self.pool_size) != self.pool_size:
+            self.mount_adapter(settings["pool_size"])
+        if settings.get("rate_limit", self.rate_limit) != self.rate_limit:
+            self.rate_limiter = RateLimiter(settings["rate_limit"])
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    def get(self, path, params=None, stream=False):
+        """Sends a GET request to the Click-Up API path, such as "/team". With stream, the response body is left to be read incrementally."""
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(
+                    CLICKUP_API_URL + path,
+                    params=params,
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                self.rate_limiter.update(response.headers)
+                if (
+                    response.status_code != 429 and response.status_code < 500
+                ) or attempt == self.max_retries:
+                    if PROFILER is not None:
+                        kind = profiled_path(path)
+                        PROFILER.count("requests " + kind)
+                        # Streamed response bodies are counted as they are read, see iter_time_entries_window()
+                        if not stream:
+                            PROFILER.count("bytes " + kind, len(response.content))
+                    return response
+                # Releases the connection of an unread streamed response
+                response.close()
+                if response.status_code == 429:
+                    # Click-Up tells when the rate limit resets, other clients' threads wait too
+                    self.rate_limiter.block(
+                        float(response.headers.get("Retry-After", 0))
+                    )
+            self.retries += 1
+            profile_count("retries")
+            self.rate_limiter.throttle(
+                random.uniform(0.5, 1) * DEFAULT_RETRY_BACKOFF * 2**attempt
+            )
+
+    def close(self):
+        self.session.close()
+
+
+def get_click_up_client(click_up_token, **settings):
+    """Returns the shared Click-Up API client for click_up_token, creating it or reconfiguring it if different ClickUpClient settings are asked for (None values are ignored).
+    Other threads may still be using the client, so it is never closed nor replaced.
+    """
+    settings = {k: v for k, v in settings.items() if v is not None}
+    with CLICKUP_CLIENTS_LOCK:
+        client = CLICKUP_CLIENTS.get(click_up_token)
+        if client is None:
+            client = ClickUpClient(click_up_token, **settings)
+            CLICKUP_CLIENTS[click_up_token] = client
+        elif any(getattr(client, k) != v for k, v in settings.items()):
+            client.configure(**settings)
+        return client
+
+
+class TaskCache:
+    """Persistent on-disk (SQLite) cache of Click-Up tasks information, keyed by team and task id.
+
+    Entries expire after ttl seconds, or sooner once Click-Up reports the task as updated (see refresh_updated_tasks()).
+    Updated tasks are listed at most once per refresh_interval seconds.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_TASK_CACHE_PATH,
+        ttl=DEFAULT_TASK_CACHE_TTL,
+        refresh_interval=0,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Concurrent refreshes wait for the first one rather than listing tasks again
+        self.refresh_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Shared by fetch_tasks_general_data() worker threads, serialized with self.lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks (team_id TEXT, task_id TEXT, data TEXT, date_updated INTEGER, fetched_at REAL, PRIMARY KEY (team_id, task_id))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS refreshes (team_id TEXT PRIMARY KEY, refreshed_at REAL)"
+            )
+
+    def get(self, team_id, task_id, expired=False):
+        """Returns cached task information, or None if absent or expired, unless expired information is accepted."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM tasks WHERE team_id = ? AND task_id = ? AND fetched_at >= ?",
+                (str(team_id), task_id, 0 if expired else time.time() - self.ttl),
+            ).fetchone()
+            # Counted under the lock, as worker threads look tasks up concurrently
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            profile_count("task cache misses")
+            return None
+        profile_count("task cache hits")
+        return json.loads(row[0])
+
+    def set(self, team_id, task_id, data):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)",
+                (
+                    str(team_id),
+                    task_id,
+                    json.dumps(data),
+                    millisecond_timestamp(data.get("date_updated")),
+                    time.time(),
+                ),
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.execute("DELETE FROM refreshes")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def refresh_updated_tasks(self, click_up_token, click_up_team_id):
+        """Evicts cached tasks which Click-Up reports as updated since this team's previous refresh, using a single paginated task listing. Returns the count of evicted tasks."""
+        with self.refresh_lock:
+            return self._refresh_updated_tasks(click_up_token, click_up_team_id)
+
+    def _refresh_updated_tasks(self, click_up_token, click_up_team_id):
+        team_id = str(click_up_team_id)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT refreshed_at FROM refreshes WHERE team_id = ?", (team_id,)
+            ).fetchone()
+            cached_count = self.connection.execute(
+                "SELECT COUNT(*) FROM tasks WHERE team_id = ?", (team_id,)
+            ).fetchone()[0]
+        refreshed_at = time.time()
+        if row is not None and refreshed_at - row[0] < self.refresh_interval:
+            return 0
+
+        evicted_count = 0
+        if row is not None and cached_count:
+            for task in fetch_team_tasks(
+                click_up_token,
+                click_up_team_id,
+                date_updated_gt=str(int(row[0] * 1000)),
+            ):
+                with self.lock, self.connection:
+                    evicted_count += self.connection.execute(
+                        "DELETE FROM tasks WHERE team_id = ? AND task_id = ? AND date_updated < ?",
+                        (
+                            team_id,
+                            task["id"],
+                            millisecond_timestamp(task.get("date_updated")),
+                        ),
+                    ).rowcount
+
+        # Only recorded once the whole listing is read, so that a failed refresh is retried next time
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO refreshes VALUES (?, ?)",
+                (team_id, refreshed_at),
+            )
+        return evicted_count
+
+
+class TimeEntryStore:
+    """Local on-disk (SQLite) store of raw Click-Up time entries, remembering for each team which time range has been synced.
+
+    Synced ranges are always contiguous: later syncs only fetch older history and the most recent days, which may still change.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_TIME_ENTRY_STORE_PATH,
+        overlap_days=DEFAULT_SYNC_OVERLAP_DAYS,
+    ):
+        self.path = path
+        self.overlap_ms = int(overlap_days * 24 * 3600 * 1000)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # May be used from the async engine's or several teams' threads, one at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (team_id TEXT, entry_id TEXT, start INTEGER, data TEXT, PRIMARY KEY (team_id, entry_id))"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_start ON entries (team_id, start)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS syncs (team_id TEXT PRIMARY KEY, synced_from INTEGER, synced_to INTEGER)"
+            )
+
+    def synced_range(self, team_id):
+        """Returns the (synced_from, synced_to) milliseconds timestamps already synced for team_id, or None."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT synced_from, synced_to FROM syncs WHERE team_id = ?",
+                (str(team_id),),
+            ).fetchone()
+
+    def team_ids(self):
+        """Returns the ids of the teams which time entries have been synced."""
+        with self.lock:
+            return [
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT team_id FROM syncs ORDER BY team_id"
+                )
+            ]
+
+    def windows_to_sync(self, team_id, from_date_ts, to_date_ts):
+        """Returns the (from, to) milliseconds timestamps windows to fetch so that the store covers from_date_ts to to_date_ts."""
+        synced_range = self.synced_range(team_id)
+        if synced_range is None:
+            return [(from_date_ts, to_date_ts)]
+        synced_from, synced_to = synced_range
+        windows = []
+        if from_date_ts < synced_from:
+            windows.append((from_date_ts, synced_from))
+        # The high-water mark minus an overlap still gets fetched again, as recent entries can still be edited
+        recent_from = max(synced_from, synced_to - self.overlap_ms)
+        if to_date_ts > recent_from:
+            windows.append((recent_from, max(to_date_ts, synced_to)))
+        return windows
+
+    def store(self, team_id, from_date_ts, to_date_ts, entries):
+        """Replaces the stored entries of team_id starting between from_date_ts and to_date_ts, and extends its synced range."""
+        team_id = str(team_id)
+        # Future time is not synced yet, whatever the requested dates
+        to_date_ts = min(to_date_ts, int(time.time() * 1000))
+        with self.lock, self.connection:
+            synced_range = self.synced_range(team_id)
+            self.connection.execute(
+                "DELETE FROM entries WHERE team_id = ? AND start BETWEEN ? AND ?",
+                (team_id, from_date_ts, to_date_ts),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (
+                    (team_id, entry["id"], int(entry["start"]), json.dumps(entry))
+                    for entry in entries
+                ),
+            )
+            if synced_range is not None:
+                from_date_ts = min(from_date_ts, synced_range[0])
+                to_date_ts = max(to_date_ts, synced_range[1])
+            self.connection.execute(
+                "INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)",
+                (team_id, from_date_ts, to_date_ts),
+            )
+
+    def entries(self, team_id, from_date_ts, to_date_ts):
+        """Returns the stored raw entries of team_id starting between from_date_ts and to_date_ts, by start time."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT data FROM entries WHERE team_id = ? AND start BETWEEN ? AND ? ORDER BY start, entry_id",
+                (str(team_id), from_date_ts, to_date_ts),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    @profiled
+    def sync(
+        self,
+        click_up_token,
+        click_up_team_id,
+        from_date_ts,
+        to_date_ts,
+        **fetch_options,
+    ):
+        """Fetches only the time entries missing from the store or recent enough to have changed, then returns all entries between from_date_ts and to_date_ts.
+        fetch_options are passed to fetch_time_entries_between().
+        """
+        for window_from_ts, window_to_ts in self.windows_to_sync(
+            click_up_team_id, from_date_ts, to_date_ts
+        ):
+            print(
+                "Syncing Click-Up time entries from {} to {}".format(
+                    datetime.fromtimestamp(window_from_ts / 1000),
+                    datetime.fromtimestamp(window_to_ts / 1000),
+                )
+            )
+            self.store(
+                click_up_team_id,
+                window_from_ts,
+                window_to_ts,
+                fetch_time_entries_between(
+                    click_up_token,
+                    click_up_team_id,
+                    window_from_ts,
+                    window_to_ts,
+                    **fetch_options,
+                ),
+            )
+        return self.entries(click_up_team_id, from_date_ts, to_date_ts)
+
+    def close(self):
+        self.connection.close()
+
+
+def millisecond_timestamp(value):
+    """Returns an integer from a Click-Up milliseconds timestamp string, or 0 if it is missing or invalid."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ReportContext:
+    """Tasks and days views of a report, along with its optional persistent task cache.
+    Reports of several teams also have a teams view, see grab_teams_time_entries(), and reports by user a users view, None otherwise.
+    Reports generated concurrently, such as from threads of one long-running process, each need their own context.
+    """
 
-    headers = {"Content-Type": "application/json", "Authorization": click_up_token}
+    def __init__(self, tasks=None, days=None, task_cache=None, teams=None, users=None):
+        self.tasks = {} if tasks is None else tasks
+        self.days = {} if days is None else days
+        self.task_cache = task_cache
+        self.teams = {} if teams is None else teams
+        self.users = users
 
-    response = requests.get(url, headers=headers, params=query)
+
+def report_context(context=None):
+    """Returns context, or a context over the module-level TASKS and DAYS views if None."""
+    if context is None:
+        return ReportContext(TASKS, DAYS)
+    return context
+
+
+def fetch_task_general_data(
+    task_id, click_up_token, click_up_team_id=None, task_cache=None, tasks=None
+):
+    """Get task information from the Click-Up API into the tasks view (defaulting to TASKS). Skip fetching if information is already in cache, either in memory or in the optional persistent task_cache."""
+    if tasks is None:
+        tasks = TASKS
+    if task_id in tasks.keys():
+        return tasks[task_id]
+    if task_cache is not None:
+        data = task_cache.get(click_up_team_id, task_id)
+        if data is not None:
+            tasks[task_id] = data
+            return data
+    path = "/task/" + task_id
+
+    query = {"custom_task_ids": "true", "include_subtasks": "true"}
+
+    response = get_click_up_client(click_up_token).get(path, params=query)
+    if not response.ok:
+        print(
+            "Could not fetch Click-Up task {}: HTTP {} {}".format(
+                task_id, response.status_code, response.text
+            )
+        )
+        exit(1)
 
     data = response.json()
-    TASKS[task_id] = data
+    tasks[task_id] = data
+    if task_cache is not None:
+        task_cache.set(click_up_team_id, task_id, data)
     return data
 
 
+@profiled
+def fetch_tasks_general_data(
+    task_ids,
+    click_up_token,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    click_up_team_id=None,
+    task_cache=None,
+    tasks=None,
+):
+    """Get several tasks information from the Click-Up API into the tasks view (defaulting to TASKS), with at most max_concurrency requests in flight. Tasks already in cache are not fetched again."""
+    if tasks is None:
+        tasks = TASKS
+    missing_task_ids = [
+        task_id for task_id in dict.fromkeys(task_ids) if task_id not in tasks
+    ]
+    if max_concurrency and max_concurrency > 1 and len(missing_task_ids) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(max_concurrency, len(missing_task_ids))
+        ) as executor:
+            # Consuming the results re-raises any exception from the workers
+            list(
+                executor.map(
+                    lambda task_id: fetch_task_general_data(
+                        task_id, click_up_token, click_up_team_id, task_cache, tasks
+                    ),
+                    missing_task_ids,
+                )
+            )
+        # Tasks were added in completion order, keep the order of a one by one fetch
+        for task_id in missing_task_ids:
+            tasks[task_id] = tasks.pop(task_id)
+    else:
+        for task_id in missing_task_ids:
+            fetch_task_general_data(
+                task_id, click_up_token, click_up_team_id, task_cache, tasks
+            )
+    return {task_id: tasks[task_id] for task_id in task_ids}
+
+
+@profiled
+def fetch_tasks_general_data_in_bulk(
+    task_ids,
+    click_up_token,
+    click_up_team_id,
+    list_ids=None,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache=None,
+    tasks=None,
+):
+    """Get several tasks information from Click-Up's filtered team tasks listing, narrowed down to list_ids, so that each request resolves a page of tasks.
+    Tasks missing from the listing, such as archived ones, are then fetched one by one with fetch_tasks_general_data().
+    """
+    if tasks is None:
+        tasks = TASKS
+    missing_task_ids = set()
+    for task_id in dict.fromkeys(task_ids):
+        if task_id in tasks:
+            continue
+        if task_cache is not None:
+            data = task_cache.get(click_up_team_id, task_id)
+            if data is not None:
+                tasks[task_id] = data
+                continue
+        missing_task_ids.add(task_id)
+
+    list_ids = sorted({str(list_id) for list_id in list_ids or []})
+    for i in range(0, max(len(list_ids), 1), CLICKUP_LIST_IDS_PER_LISTING):
+        if not missing_task_ids:
+            break
+        filters = (
+            {"list_ids[]": list_ids[i : i + CLICKUP_LIST_IDS_PER_LISTING]}
+            if list_ids
+            else {}
+        )
+        for task in fetch_team_tasks(click_up_token, click_up_team_id, **filters):
+            if task["id"] in missing_task_ids:
+                missing_task_ids.remove(task["id"])
+                tasks[task["id"]] = task
+                if task_cache is not None:
+                    task_cache.set(click_up_team_id, task["id"], task)
+                if not missing_task_ids:
+                    break
+
+    return fetch_tasks_general_data(
+        task_ids,
+        click_up_token,
+        max_concurrency=max_concurrency,
+        click_up_team_id=click_up_team_id,
+        task_cache=task_cache,
+        tasks=tasks,
+    )
+
+
+def task_from_time_entry(entry):
+    """Returns task information built from a time entry's task and task_location fields, shaped like fetch_task_general_data() results, or None if the task, list or folder names are missing."""
+    task = entry.get("task") or {}
+    location = entry.get("task_location") or {}
+    if not (
+        task.get("name") and location.get("list_name") and location.get("folder_name")
+    ):
+        return None
+    folder = {"id": str(location.get("folder_id")), "name": location["folder_name"]}
+    return {
+        "id": task["id"],
+        "custom_id": task.get("custom_id"),
+        "name": task["name"],
+        "status": task.get("status"),
+        "list": {"id": str(location.get("list_id")), "name": location["list_name"]},
+        "folder": folder,
+        "project": dict(folder),  # Click-Up's legacy name for folders
+        "space": {
+            "id": str(location.get("space_id")),
+            "name": location.get("space_name"),
+        },
+    }
+
+
+@profiled
+def resolve_tasks(
+    entries,
+    click_up_token,
+    click_up_team_id,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache=None,
+    tasks=None,
+):
+    """Fills the tasks view (defaulting to TASKS) with the information of every task the time entries refer to, with one of the TASK_RESOLUTIONS strategies."""
+    if tasks is None:
+        tasks = TASKS
+    task_ids = [d["task"]["id"] for d in entries]
+    known_task_ids = set(tasks)
+    if task_resolution == "lean":
+        # Only tasks missing some field from their time entries get fetched below
+        for d in entries:
+            if d["task"]["id"] not in tasks:
+                task = task_from_time_entry(d)
+                if task is not None:
+                    tasks[task["id"]] = task
+    if task_resolution == "bulk":
+        result = fetch_tasks_general_data_in_bulk(
+            task_ids,
+            click_up_token,
+            click_up_team_id,
+            list_ids=[
+                d["task_location"]["list_id"]
+                for d in entries
+                if d.get("task_location", {}).get("list_id")
+            ],
+            max_concurrency=max_concurrency,
+            task_cache=task_cache,
+            tasks=tasks,
+        )
+    else:
+        result = fetch_tasks_general_data(
+            task_ids,
+            click_up_token,
+            max_concurrency=max_concurrency,
+            click_up_team_id=click_up_team_id,
+            task_cache=task_cache,
+            tasks=tasks,
+        )
+    # Listings and lean lookups add tasks out of order, rows follow the time entries
+    order_tasks(tasks, task_ids, known_task_ids)
+    return result
+
+
+def order_tasks(tasks, task_ids, known_task_ids):
+    """Moves the tasks of task_ids missing from known_task_ids to the end of the tasks view, in task_ids order."""
+    for task_id in dict.fromkeys(task_ids):
+        if task_id in tasks and task_id not in known_task_ids:
+            tasks[task_id] = tasks.pop(task_id)
+
+
 def formatted_total_duration_human(tdh):
     """Returns a nice NNhNNmNN time representation for a total duration in seconds, from a tuple as returned by tupled_total_duration_human()."""
     return f"{tdh[0]:.0f}h{tdh[1]:.0f}m{tdh[2]:.0f}s"
@@ -77,23 +1004,63 @@ def tupled_total_duration_human(undived_seconds):
     )
 
 
+@profiled
 def fetch_user_teams(click_up_token):
-    url = "https://api.clickup.com/api/v2/team"
-
-    headers = {"Authorization": click_up_token}
-
-    response = requests.get(url, headers=headers)
+    response = get_click_up_client(click_up_token).get("/team")
+    if not response.ok:
+        print(
+            "Could not fetch Click-Up teams: HTTP {} {}".format(
+                response.status_code, response.text
+            )
+        )
+        exit(1)
 
     data = response.json()
     return data["teams"]
 
 
-def fetch_time_entries(
-    click_up_token, click_up_team_id, from_date, to_date, current_tz
-):
-    url = (
-        "https://api.clickup.com/api/v2/team/" + str(click_up_team_id) + "/time_entries"
+def fetch_team_members(click_up_token, click_up_team_id):
+    """Returns the users of the members of a team, see https://clickup.com/api/clickupreference/operation/GetAuthorizedTeams/ . Exits if the user is not a member of the team."""
+    for team in fetch_user_teams(click_up_token=click_up_token):
+        if str(team["id"]) == str(click_up_team_id):
+            return [member["user"] for member in team.get("members", [])]
+    print(
+        "User for given Click-Up user API key is not a member of team {}. Giving up.".format(
+            click_up_team_id
+        )
     )
+    exit(1)
+
+
+def fetch_team_tasks(click_up_token, click_up_team_id, **filters):
+    """Yields tasks from Click-Up's paginated filtered team tasks listing, including closed tasks and subtasks, narrowed down by extra query filters."""
+    path = "/team/" + str(click_up_team_id) + "/task"
+
+    page = 0
+    while True:
+        query = dict(filters, page=str(page), include_closed="true", subtasks="true")
+        response = get_click_up_client(click_up_token).get(path, params=query)
+        if not response.ok:
+            print(
+                "Could not list Click-Up team tasks: HTTP {} {}".format(
+                    response.status_code, response.text
+                )
+            )
+            exit(1)
+
+        data = response.json()
+        tasks = data.get("tasks", [])
+        yield from tasks
+        if data.get("last_page") or len(tasks) < CLICKUP_TASKS_PAGE_SIZE:
+            break
+        page += 1
+
+
+def time_entries_date_range(from_date, to_date, current_tz):
+    """Returns a (from_date, to_date, from_date_ts, to_date_ts) tuple of full date time strings and their milliseconds timestamps.
+    A missing to_date means now, a missing from_date means DEFAULT_MONTHS_BACKWARDS months before to_date.
+    """
+    from dateutil.relativedelta import relativedelta
 
     datetime_format = "%Y-%m-%d %H:%M:%S"
 
@@ -114,12 +1081,6 @@ def fetch_time_entries(
     else:
         from_date += " 00:00:00"
 
-    print(
-        "Gathering Click-Up time entries from {} to {}".format(
-            from_date, to_date if to_date else "now"
-        )
-    )
-
     from_date_ts = (
         datetime.strptime(from_date, datetime_format)
         .replace(tzinfo=current_tz)
@@ -136,187 +1097,1591 @@ def fetch_time_entries(
         if to_date
         else "0"
     )
+    return from_date, to_date, int(from_date_ts), int(to_date_ts)
 
-    query = {
-        "start_date": str(int(from_date_ts)),
-        "end_date": str(int(to_date_ts)),
-    }
-
-    headers = {"Content-Type": "application/json", "Authorization": click_up_token}
-
-    response = requests.get(url, headers=headers, params=query)
 
-    data = response.json()
-    return data["data"]
-
-
-def grab_time_entries(
-    from_date=None,
-    to_date=None,
-    click_up_token=None,
-    click_up_team_id=None,
-    time_zone=DEFAULT_TIMEZONE,
-    language=DEFAULT_LANGUAGE,
+def fetch_time_entries(
+    click_up_token, click_up_team_id, from_date, to_date, current_tz, **fetch_options
 ):
-    """Populates TASKS and DAYS views from Click-Up's API between from_date and to_date using the click_up_token and click_up_team_id."""
-    # API token is compulsory
-    if not click_up_token:
-        if CLICKUP_PK:
-            click_up_token = CLICKUP_PK
-        else:
-            print(
-                "Missing Click-Up REST API token (pk_* value), set it in .env or through the --click-up-token command line parameter (see --help)."
-            )
-            sys.exit(1)
-
-    # team_id can be provided or will be guessed from https://clickup.com/api/clickupreference/operation/GetAuthorizedTeams/
-    if not click_up_team_id:
-        if CLICKUP_TEAM_ID:
-            print("Using CLICKUP_TEAM_ID from environment.")
-            click_up_team_id = CLICKUP_TEAM_ID
-        else:
-            user_teams = fetch_user_teams(click_up_token=click_up_token)
-            if not user_teams:
-                print(
-                    "Missing Click-Up team parameter (--click-up-team-id or CLICKUP_TEAM_ID environment variable) not found and user for given Click-Up user API key has no teams. Giving up."
-                )
-                exit(1)
-            elif len(user_teams) > 1:
-                user_teams_overview = [
-                    {"id": team["id"], "name": team["name"]} for team in user_teams
-                ]
-                print(
-                    "Missing Click-Up team parameter (--click-up-team-id or CLICKUP_TEAM_ID environment variable) not found and user for given Click-Up user API key has several teams to choose from: {}. Giving up.".format(
-                        user_teams_overview
-                    )
-                )
-                exit(1)
-            else:
-                click_up_team_id = user_teams[0]["id"]
-                print(
-                    "Guessing team_id as user's only assigned team: {} ({}).".format(
-                        user_teams[0]["name"], click_up_team_id
-                    )
-                )
+    """Get time entries from the Click-Up API between from_date and to_date, see fetch_time_entries_between() for fetch_options."""
+    from_date, to_date, from_date_ts, to_date_ts = time_entries_date_range(
+        from_date, to_date, current_tz
+    )
 
-    current_tz = tz.gettz(time_zone)
+    print(
+        "Gathering Click-Up time entries from {} to {}".format(
+            from_date, to_date if to_date else "now"
+        )
+    )
 
-    data = fetch_time_entries(
-        click_up_token=click_up_token,
-        click_up_team_id=click_up_team_id,
-        from_date=from_date,
-        to_date=to_date,
+    return fetch_time_entries_between(
+        click_up_token,
+        click_up_team_id,
+        from_date_ts,
+        to_date_ts,
         current_tz=current_tz,
+        **fetch_options,
     )
 
-    undived_total_seconds = 0
 
-    # Browse each time entry within dates range
-    for d in data:
-        # Convert microseconds time entry duration to hours, minutes, seconds
-        duration_seconds = int(d["duration"]) / 1000
-        undived_total_seconds += duration_seconds
-        minutes, seconds = divmod(duration_seconds, 60)
-        hours, minutes = divmod(minutes, 60)
+def time_entries_chunks(from_date_ts, to_date_ts, chunk_months, current_tz=None):
+    """Splits the from_date_ts to to_date_ts milliseconds timestamps range into (from, to) windows, cut on the first day of every chunk_months months."""
+    from dateutil.relativedelta import relativedelta
 
-        # Fill TASK[task_id] with task info if unfetched yet, and add up duration
-        task_id = d["task"]["id"]
-        fetch_task_general_data(task_id, click_up_token)
-        if not "total_duration" in TASKS[task_id].keys():
-            TASKS[task_id]["total_duration"] = 0
-        TASKS[task_id]["total_duration"] += duration_seconds
+    if not chunk_months:
+        return [(from_date_ts, to_date_ts)]
+    chunks = []
+    chunk_from_ts = from_date_ts
+    chunk_start = datetime.fromtimestamp(from_date_ts / 1000, tz=current_tz).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    while chunk_from_ts <= to_date_ts:
+        chunk_start += relativedelta(months=chunk_months)
+        next_chunk_from_ts = int(chunk_start.timestamp() * 1000)
+        chunks.append((chunk_from_ts, min(next_chunk_from_ts - 1, to_date_ts)))
+        chunk_from_ts = next_chunk_from_ts
+    return chunks
+
+
+@profiled
+def fetch_time_entries_between(
+    click_up_token,
+    click_up_team_id,
+    from_date_ts,
+    to_date_ts,
+    chunk_months=DEFAULT_CHUNK_MONTHS,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    current_tz=None,
+    chunk_journal_directory=None,
+    assignees=None,
+):
+    """Get time entries from the Click-Up API between two milliseconds timestamps.
+    The range is fetched by chunk_months windows in parallel, then merged without duplicates by entry id.
+    Windows fetched are saved into the optional chunk_journal_directory until the whole range is fetched, so that an interrupted fetch can resume.
+    Time entries are the token owner's, unless those of assignees user ids are asked for.
+    """
+    chunks = time_entries_chunks(from_date_ts, to_date_ts, chunk_months, current_tz)
+    journal_paths = time_entries_chunks_journal_paths(
+        chunk_journal_directory, click_up_token, click_up_team_id, chunks, assignees
+    )
 
-        # Add up duration in DAYS[task_date]
-        task_start_ts = datetime.fromtimestamp(int(d["start"]) / 1000).replace(
-            tzinfo=current_tz
+    def fetch_chunk(chunk, journal_path):
+        return fetch_time_entries_chunk(
+            click_up_token, click_up_team_id, chunk, journal_path, assignees
         )
-        task_date = task_start_ts.strftime("%Y-%m-%d")
-        if not task_date in DAYS.keys():
-            DAYS[task_date] = {
-                "total_duration": 0,
-                "iso_date": task_start_ts.isoformat(),
-                "human_date": format_date(
-                    task_start_ts, format="full", locale=language
-                ),  # task_start_ts.strftime("%a, %d %b %Y"),
-            }
-        DAYS[task_date]["total_duration"] += duration_seconds
 
-        # Prepare TASKS[...]["total_duration_human"] for futher summarizing
-        TASKS[task_id]["total_duration_human"] = tupled_total_duration_human(
-            TASKS[task_id]["total_duration"]
-        )
+    if max_concurrency and max_concurrency > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(max_concurrency, len(chunks))
+        ) as executor:
+            chunks_entries = list(executor.map(fetch_chunk, chunks, journal_paths))
+    else:
+        chunks_entries = list(map(fetch_chunk, chunks, journal_paths))
+
+    return merge_time_entries_chunks(chunks_entries, journal_paths)
 
-        # Prepare DAYS[...]["total_duration_human"] for futher summarizing
-        DAYS[task_date]["total_duration_human"] = tupled_total_duration_human(
-            DAYS[task_date]["total_duration"]
+
+def time_entries_chunks_journal_paths(
+    chunk_journal_directory, click_up_token, click_up_team_id, chunks, assignees=None
+):
+    """Returns the journal file path of each chunk, or None values without chunk_journal_directory.
+    Paths are keyed by every parameter of the query, the token being hashed, so that fetches of other teams, users or tokens never share journals.
+    Journals of interrupted fetches older than CHUNK_JOURNAL_TTL are removed.
+    """
+    import hashlib
+
+    if not chunk_journal_directory:
+        return [None] * len(chunks)
+    os.makedirs(chunk_journal_directory, exist_ok=True)
+    expired = time.time() - CHUNK_JOURNAL_TTL
+    for entry in os.scandir(chunk_journal_directory):
+        if entry.is_file() and entry.stat().st_mtime < expired:
+            os.unlink(entry.path)
+
+    query_key = hashlib.sha256(
+        json.dumps(
+            [click_up_token, str(click_up_team_id), sorted(map(str, assignees or []))]
+        ).encode()
+    ).hexdigest()[:16]
+    return [
+        os.path.join(
+            chunk_journal_directory,
+            "{}-{}-{}.json".format(query_key, chunk_from_ts, chunk_to_ts),
         )
+        for chunk_from_ts, chunk_to_ts in chunks
+    ]
 
-        # Step progress output
-        print(".", end="", flush=True)
-    print()
 
+def fetch_time_entries_chunk(
+    click_up_token, click_up_team_id, chunk, journal_path=None, assignees=None
+):
+    """Get time entries for a (from, to) chunk from its journal file if any, otherwise from the Click-Up API, saving them into the journal file."""
+    if journal_path and os.path.exists(journal_path):
+        with open(journal_path, "r") as fp:
+            return json.load(fp)
+    entries = fetch_time_entries_window(
+        click_up_token, click_up_team_id, *chunk, assignees=assignees
+    )
+    if journal_path:
+        with open(journal_path + ".tmp", "w") as fp:
+            json.dump(entries, fp)
+        os.replace(journal_path + ".tmp", journal_path)
+    return entries
 
-def get_time_entries(from_date, to_date):
-    """Prepares a time entries and total dictionary from TASKS and DAYS views.
-    This function's results can be piped into print_time_entries() or render_time_entries_html() for console or HTML/PDF rendering.
 
-    This should be called after grab_time_entries() which takes care of populating depending data views.
-    """
-    days = [
-        {
-            "human_date": DAYS[date]["human_date"],
-            "iso_date": DAYS[date]["iso_date"],
-            "total_duration_raw": DAYS[date]["total_duration_human"],
-            "total_duration_human": formatted_total_duration_human(
-                DAYS[date]["total_duration_human"]
-            ),
-        }
-        for date in sorted(DAYS)
-    ]
-    tasks = [
-        {
-            "name": v["name"],
-            "list": v.get("list", {}).get("name"),
-            "project": v.get("project", {}).get("name"),
-            "folder": v.get("folder", {}).get("name"),
-            "total_duration_raw": v.get("total_duration_human", 0),
-            "total_duration_human": formatted_total_duration_human(
-                v.get("total_duration_human", 0)
-            ),
-        }
-        for k, v in TASKS.items()
-    ]
+def merge_time_entries_chunks(chunks_entries, journal_paths=()):
+    """Returns the time entries of all chunks without duplicates by entry id, and removes the chunks' journal files now that the whole range is fetched."""
+    # Entries across chunk boundaries may be returned twice
+    entries = {}
+    for chunk_entries in chunks_entries:
+        for entry in chunk_entries:
+            entries.setdefault(entry["id"], entry)
 
-    undived_total_seconds = sum(v["total_duration"] for v in TASKS.values())
-    minutes, seconds = divmod(undived_total_seconds, 60)
-    hours, minutes = divmod(minutes, 60)
+    for journal_path in journal_paths:
+        if journal_path:
+            os.unlink(journal_path)
+    return list(entries.values())
 
-    return {
-        "from_date": from_date,
-        "to_date": to_date,
-        "days": days,
-        "tasks": tasks,
-        "total_duration": {"hours": hours, "minutes": minutes, "seconds": seconds},
-    }
 
+def fetch_time_entries_window(
+    click_up_token, click_up_team_id, from_date_ts, to_date_ts, assignees=None
+):
+    """Get time entries from the Click-Up API between two milliseconds timestamps, in a single request."""
+    path = "/team/" + str(click_up_team_id) + "/time_entries"
 
-def print_time_entries(entries):
-    """Prints nicely day-based and task-based statistics, as stored in the TASKS and DAYS views."""
-    print("Daily time sheet:")
-    for date_entry in entries["days"]:
-        print(date_entry["human_date"], date_entry["total_duration_human"])
+    query = {
+        "start_date": str(int(from_date_ts)),
+        "end_date": str(int(to_date_ts)),
+        # Task names of the time entries' locations, used by the "lean" task resolution
+        "include_location_names": "true",
+    }
+    # Other users' time entries, which only the team's owner and admins can get
+    if assignees:
+        query["assignee"] = ",".join(str(user_id) for user_id in assignees)
 
-    print()
-    print("Tasks summary:")
-    for task in entries["tasks"]:
+    response = get_click_up_client(click_up_token).get(path, params=query)
+    if not response.ok:
         print(
-            task["name"],
-            task["list"],
+            "Could not fetch Click-Up time entries: HTTP {} {}".format(
+                response.status_code, response.text
+            )
+        )
+        exit(1)
+
+    data = response.json()
+    return data["data"]
+
+
+def iter_json_array(chunks, key):
+    """Yields the items of the key array of a JSON object, such as {"data": [...]}, decoding each one as soon as its bytes arrive from chunks.
+    Only the item being decoded is kept in memory, rather than the whole document.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    key_pattern = re.compile(r'"{}"\s*:\s*\['.format(re.escape(key)))
+    chunks = iter(chunks)
+    buffer = ""
+    position = (
+        None  # of the next array item within buffer, once the array start is found
+    )
+    exhausted = False
+    while True:
+        if position is None:
+            match = key_pattern.search(buffer)
+            if match:
+                buffer, position = buffer[match.end() :], 0
+        if position is not None:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer):
+                if buffer[position] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    pass  # The item is incomplete, more chunks are read below
+                else:
+                    # An item at the buffer's end, such as a number, may go on in the next chunk
+                    if end < len(buffer) or exhausted:
+                        yield item
+                        position = end
+                        continue
+        if exhausted:
+            raise ValueError("Truncated JSON: no complete {} array".format(key))
+        chunk = next(chunks, None)
+        if position is not None:
+            buffer, position = buffer[position:], 0
+        if chunk is None:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+
+def iter_time_entries_window(
+    click_up_token, click_up_team_id, from_date_ts, to_date_ts, assignees=None
+):
+    """Yields time entries from the Click-Up API between two milliseconds timestamps in a single request, as they are parsed from its streamed response."""
+    path = "/team/" + str(click_up_team_id) + "/time_entries"
+
+    query = {
+        "start_date": str(int(from_date_ts)),
+        "end_date": str(int(to_date_ts)),
+        "include_location_names": "true",
+    }
+    if assignees:
+        query["assignee"] = ",".join(str(user_id) for user_id in assignees)
+
+    response = get_click_up_client(click_up_token).get(path, params=query, stream=True)
+    with response:
+        if not response.ok:
+            print(
+                "Could not fetch Click-Up time entries: HTTP {} {}".format(
+                    response.status_code, response.text
+                )
+            )
+            exit(1)
+        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        if PROFILER is not None:
+            chunks = counted_chunks(chunks, "bytes " + profiled_path(path))
+        yield from iter_json_array(chunks, "data")
+
+
+def counted_chunks(chunks, counter):
+    """Yields chunks, adding their lengths to a PROFILER counter."""
+    for chunk in chunks:
+        profile_count(counter, len(chunk))
+        yield chunk
+
+
+def iter_time_entries(
+    click_up_token,
+    click_up_team_id,
+    from_date,
+    to_date,
+    current_tz,
+    chunk_months=DEFAULT_CHUNK_MONTHS,
+    assignees=None,
+):
+    """Yields time entries from the Click-Up API between from_date and to_date as they are streamed, one chunk_months window after the other.
+    Unlike fetch_time_entries(), at most one time entry is held in memory at once, besides the ids of those already yielded.
+    """
+    from_date, to_date, from_date_ts, to_date_ts = time_entries_date_range(
+        from_date, to_date, current_tz
+    )
+
+    print(
+        "Streaming Click-Up time entries from {} to {}".format(
+            from_date, to_date if to_date else "now"
+        )
+    )
+
+    # Entries across chunk boundaries may be returned twice
+    entry_ids = set()
+    for chunk in time_entries_chunks(
+        from_date_ts, to_date_ts, chunk_months, current_tz
+    ):
+        for entry in iter_time_entries_window(
+            click_up_token, click_up_team_id, *chunk, assignees=assignees
+        ):
+            if entry["id"] not in entry_ids:
+                entry_ids.add(entry["id"])
+                yield entry
+
+
+class TimeEntryColumns:
+    """Time entries loaded into compact columns: start and duration milliseconds, task index and user index.
+    Only the first time entry of each task is kept, to resolve the task from, and the user of the first time entry of each user.
+    """
+
+    def __init__(self, entries=None):
+        self.starts = array("q")
+        self.durations = array("q")
+        self.task_indexes = array("q")
+        self.task_ids = {}  # task id: task index
+        self.task_entries = []  # by task index
+        # Left empty by from_columns(), as snapshots keep no users
+        self.user_indexes = array("q")
+        self.user_ids = {}  # user id: user index
+        self.users = []  # by user index
+        self.sorted_by_start = False
+        if entries is not None:
+            self.extend(entries)
+
+    @classmethod
+    def from_columns(
+        cls, starts, durations, task_indexes, task_ids, sorted_by_start=False
+    ):
+        """Returns columns over existing starts, durations and task indexes integer sequences, such as memory-mapped ones, of the task_ids tasks."""
+        columns = cls()
+        columns.starts = starts
+        columns.durations = durations
+        columns.task_indexes = task_indexes
+        columns.task_ids = {task_id: i for i, task_id in enumerate(task_ids)}
+        columns.task_entries = [{"task": {"id": task_id}} for task_id in task_ids]
+        columns.sorted_by_start = sorted_by_start
+        return columns
+
+    @profiled
+    def extend(self, entries):
+        """Appends time entries, which may be streamed, printing a dot per time entry."""
+        loaded_count = 0
+        for d in entries:
+            task_id = d["task"]["id"]
+            task_index = self.task_ids.get(task_id)
+            if task_index is None:
+                task_index = self.task_ids[task_id] = len(self.task_entries)
+                self.task_entries.append(d)
+            user = d.get("user") or {"id": None}
+            user_index = self.user_ids.get(user["id"])
+            if user_index is None:
+                user_index = self.user_ids[user["id"]] = len(self.users)
+                self.users.append(user)
+            self.starts.append(int(d["start"]))
+            self.durations.append(int(d["duration"]))
+            self.task_indexes.append(task_index)
+            self.user_indexes.append(user_index)
+
+            # Step progress output
+            loaded_count += 1
+            if loaded_count == PROGRESS_STEP:
+                print("." * loaded_count, end="", flush=True)
+                loaded_count = 0
+        print("." * loaded_count)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def merge(self, other):
+        """Appends the time entries of other columns, of other tasks."""
+        task_offset = len(self.task_entries)
+        self.starts.extend(other.starts)
+        self.durations.extend(other.durations)
+        self.task_indexes.extend(
+            task_index + task_offset for task_index in other.task_indexes
+        )
+        for task_id, task_index in other.task_ids.items():
+            self.task_ids[task_id] = task_index + task_offset
+        self.task_entries.extend(other.task_entries)
+        # Users are shared across teams, unlike tasks
+        user_indexes = []
+        for user in other.users:
+            user_index = self.user_ids.get(user["id"])
+            if user_index is None:
+                user_index = self.user_ids[user["id"]] = len(self.users)
+                self.users.append(user)
+            user_indexes.append(user_index)
+        self.user_indexes.extend(
+            user_indexes[user_index] for user_index in other.user_indexes
+        )
+        self.sorted_by_start = False
+
+    def between(self, from_ts, to_ts):
+        """Returns new columns of the time entries starting between from_ts and to_ts milliseconds, with only their tasks.
+        Columns sorted by start, such as those of snapshots, are bisected and sliced instead of being scanned.
+        """
+        columns = TimeEntryColumns()
+        columns.sorted_by_start = self.sorted_by_start
+        if self.sorted_by_start:
+            first = bisect.bisect_left(self.starts, from_ts)
+            last = bisect.bisect_right(self.starts, to_ts, first)
+            columns.starts = self.starts[first:last]
+            columns.durations = self.durations[first:last]
+            task_indexes = self.task_indexes[first:last]
+            if self.user_indexes:
+                columns.user_indexes.extend(self.user_indexes[first:last])
+        else:
+            kept = [
+                i for i, start in enumerate(self.starts) if from_ts <= start <= to_ts
+            ]
+            columns.starts.extend(self.starts[i] for i in kept)
+            columns.durations.extend(self.durations[i] for i in kept)
+            task_indexes = [self.task_indexes[i] for i in kept]
+            if self.user_indexes:
+                columns.user_indexes.extend(self.user_indexes[i] for i in kept)
+        # Users keep their indexes, even those left without time entries
+        columns.user_ids = dict(self.user_ids)
+        columns.users = list(self.users)
+
+        # Only the remaining tasks are numbered again, by first time entry
+        task_ids = list(self.task_ids)
+        renumbered = {}
+        for task_index in task_indexes:
+            index = renumbered.get(task_index)
+            if index is None:
+                index = renumbered[task_index] = len(columns.task_entries)
+                columns.task_ids[task_ids[task_index]] = index
+                columns.task_entries.append(self.task_entries[task_index])
+            columns.task_indexes.append(index)
+        return columns
+
+
+def optional_numpy():
+    """Returns the numpy module, importing it on first use, or None if NumPy is not installed."""
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as numpy_module
+        except ImportError:
+            numpy_module = None
+        numpy = numpy_module
+    return numpy
+
+
+def day_of_bucket(bucket):
+    """Returns the local "%Y-%m-%d" date of a DAY_BUCKET_MS bucket number."""
+    return datetime.fromtimestamp(bucket * DAY_BUCKET_MS / 1000).strftime("%Y-%m-%d")
+
+
+@profiled
+def aggregate_time_entries(columns):
+    """Group-sums TimeEntryColumns durations by task and by local day of their start.
+    Returns the milliseconds durations by task index, and a {"%Y-%m-%d": (first start milliseconds, milliseconds duration)} dictionary.
+    Days are computed once per DAY_BUCKET_MS bucket instead of once per time entry, vectorized if NumPy is installed.
+    """
+    numpy = optional_numpy()
+    if numpy is not None and len(columns):
+        starts = numpy.frombuffer(columns.starts, dtype=numpy.int64)
+        durations = numpy.frombuffer(columns.durations, dtype=numpy.int64)
+        buckets, entry_buckets = numpy.unique(
+            starts // DAY_BUCKET_MS, return_inverse=True
+        )
+        dates = {}
+        bucket_days = numpy.array(
+            [
+                dates.setdefault(day_of_bucket(bucket), len(dates))
+                for bucket in buckets.tolist()
+            ],
+            dtype=numpy.int64,
+        )
+        entry_days = bucket_days[entry_buckets.reshape(-1)]
+        # Integer milliseconds sums stay exact as float64 weights, up to 2**53
+        task_durations = numpy.bincount(
+            numpy.frombuffer(columns.task_indexes, dtype=numpy.int64),
+            weights=durations,
+            minlength=len(columns.task_entries),
+        )
+        day_durations = numpy.bincount(
+            entry_days, weights=durations, minlength=len(dates)
+        )
+        _, day_first_entries = numpy.unique(entry_days, return_index=True)
+        return [int(duration) for duration in task_durations.tolist()], {
+            date: (int(starts[day_first_entries[i]]), int(day_durations[i]))
+            for date, i in dates.items()
+        }
+
+    task_durations = [0] * len(columns.task_entries)
+    for task_index, duration in zip(columns.task_indexes, columns.durations):
+        task_durations[task_index] += duration
+    bucket_dates = {}
+    days = {}
+    for start, duration in zip(columns.starts, columns.durations):
+        bucket = start // DAY_BUCKET_MS
+        date = bucket_dates.get(bucket)
+        if date is None:
+            date = bucket_dates[bucket] = day_of_bucket(bucket)
+        first_start, day_duration = days.get(date, (start, 0))
+        days[date] = (first_start, day_duration + duration)
+    return task_durations, days
+
+
+@profiled
+def aggregate_user_time_entries(columns):
+    """Group-sums TimeEntryColumns durations by user and task, and by user and local day of their start.
+    Returns a {user index: (milliseconds durations by task index, {"%Y-%m-%d": (first start milliseconds, milliseconds duration)})} dictionary.
+    """
+    users = {}
+    bucket_dates = {}
+    for start, duration, task_index, user_index in zip(
+        columns.starts, columns.durations, columns.task_indexes, columns.user_indexes
+    ):
+        user = users.get(user_index)
+        if user is None:
+            user = users[user_index] = ({}, {})
+        task_durations, days = user
+        task_durations[task_index] = task_durations.get(task_index, 0) + duration
+        bucket = start // DAY_BUCKET_MS
+        date = bucket_dates.get(bucket)
+        if date is None:
+            date = bucket_dates[bucket] = day_of_bucket(bucket)
+        first_start, day_duration = days.get(date, (start, 0))
+        days[date] = (first_start, day_duration + duration)
+    return users
+
+
+def split_group_by(group_by):
+    """Returns the lists of dimensions of comma-separated groupings such as "folder>list>task,month>week>day", or of a sequence of them."""
+    if isinstance(group_by, (list, tuple)):
+        groupings = group_by
+    else:
+        groupings = str(group_by).split(",")
+    return [
+        [dimension.strip() for dimension in grouping.split(">")]
+        for grouping in groupings
+        if grouping.strip()
+    ]
+
+
+def task_dimension_values(task, task_entry):
+    """Returns the (id, name) values of a task for each "task" dimension of GROUP_BY_DIMENSIONS."""
+    values = {
+        dimension: [
+            (task.get(dimension, {}).get("id"), task.get(dimension, {}).get("name"))
+        ]
+        for dimension in ("space", "folder", "project", "list")
+    }
+    values["task"] = [(task.get("id"), task.get("name"))]
+    # Tasks resolved from their time entries only have the tags of these
+    tags = task.get("tags") or task_entry.get("task_tags") or []
+    tag_names = list(dict.fromkeys(tag["name"] for tag in tags))
+    values["tag"] = [(name, name) for name in tag_names] or [(None, None)]
+    return values
+
+
+def date_dimension_values(date):
+    """Returns the (id, name) values of a "%Y-%m-%d" date for each "date" dimension of GROUP_BY_DIMENSIONS."""
+    year, week, _ = datetime.strptime(date, "%Y-%m-%d").isocalendar()
+    week = "{:04d}-W{:02d}".format(year, week)
+    return {
+        "year": [(date[:4], date[:4])],
+        "month": [(date[:7], date[:7])],
+        "week": [(week, week)],
+        "day": [(date, date)],
+    }
+
+
+@profiled
+def group_time_entries(columns, tasks, groupings):
+    """Group-sums TimeEntryColumns durations along each grouping of GROUP_BY_DIMENSIONS, such as ["folder", "list", "task"], with subtotals at every level, in a single pass over the time entries.
+    Tasks information comes from the tasks view. Returns a tree per grouping of {"duration": milliseconds, "children": {id: {"name", "duration", "children"}}} nodes.
+    """
+    # Dimension values of each task, user and day are computed once, rather than once per time entry
+    task_values = [
+        task_dimension_values(tasks.get(task_id, {"id": task_id}), task_entry)
+        for task_id, task_entry in zip(columns.task_ids, columns.task_entries)
+    ]
+    user_values = [
+        {"user": [(str(user["id"]), user.get("username"))]} for user in columns.users
+    ]
+    no_user_values = {"user": [(None, None)]}
+    bucket_values = {}
+    date_values = {}
+
+    trees = [{"duration": 0, "children": {}} for _ in groupings]
+    # Snapshots keep no users
+    user_indexes = (
+        columns.user_indexes
+        if len(columns.user_indexes) == len(columns.starts)
+        else [None] * len(columns.starts)
+    )
+    for start, duration, task_index, user_index in zip(
+        columns.starts, columns.durations, columns.task_indexes, user_indexes
+    ):
+        bucket = start // DAY_BUCKET_MS
+        entry_date_values = bucket_values.get(bucket)
+        if entry_date_values is None:
+            date = day_of_bucket(bucket)
+            entry_date_values = date_values.get(date)
+            if entry_date_values is None:
+                entry_date_values = date_values[date] = date_dimension_values(date)
+            bucket_values[bucket] = entry_date_values
+        entry_values = {
+            "date": entry_date_values,
+            "task": task_values[task_index],
+            "user": no_user_values if user_index is None else user_values[user_index],
+        }
+        for grouping, tree in zip(groupings, trees):
+            tree["duration"] += duration
+            nodes = [tree]
+            for dimension in grouping:
+                values = entry_values[GROUP_BY_DIMENSIONS[dimension]][dimension]
+                children = []
+                for node in nodes:
+                    for value_id, name in values:
+                        child = node["children"].get(value_id)
+                        if child is None:
+                            child = node["children"][value_id] = {
+                                "name": name,
+                                "duration": 0,
+                                "children": {},
+                            }
+                        child["duration"] += duration
+                        children.append(child)
+                nodes = children
+    return trees
+
+
+@profiled
+def refresh_task_cache(task_cache, click_up_token, click_up_team_id):
+    """Evicts updated tasks from the optional task_cache, see TaskCache.refresh_updated_tasks()."""
+    if task_cache is not None:
+        evicted_count = task_cache.refresh_updated_tasks(
+            click_up_token, click_up_team_id
+        )
+        if evicted_count:
+            print("Refreshing {} updated tasks from cache.".format(evicted_count))
+
+
+async def async_fetch_time_entries_and_tasks(
+    click_up_token,
+    click_up_team_id=None,
+    from_date=None,
+    to_date=None,
+    time_zone=DEFAULT_TIMEZONE,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    chunk_months=DEFAULT_CHUNK_MONTHS,
+    chunk_journal_directory=None,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    task_cache=None,
+    time_entry_store=None,
+    tasks=None,
+):
+    """Fetches time entries between from_date and to_date and resolves their tasks into the tasks view (defaulting to TASKS) as a non-blocking asyncio pipeline.
+    Team discovery (without click_up_team_id), time entries chunks and task lookups share a pool of max_concurrency threads,
+    and each chunk's new tasks are looked up as soon as it arrives, while other chunks are still being fetched.
+    The "bulk" task resolution waits for all chunks instead, so that each list's tasks are listed once.
+    Returns the (click_up_team_id, time entries) tuple.
+    """
+    import asyncio
+    from dateutil import tz
+
+    if tasks is None:
+        tasks = TASKS
+    known_task_ids = set(tasks)
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=max(max_concurrency or 1, 1)) as executor:
+        if not click_up_team_id:
+            click_up_team_id = await loop.run_in_executor(
+                executor, guess_click_up_team_id, click_up_token
+            )
+
+        current_tz = tz.gettz(time_zone)
+        from_date, to_date, from_date_ts, to_date_ts = time_entries_date_range(
+            from_date, to_date, current_tz
+        )
+        if time_entry_store is not None:
+            chunks, journal_paths = [(from_date_ts, to_date_ts)], []
+            chunk_futures = [
+                loop.run_in_executor(
+                    executor,
+                    functools.partial(
+                        time_entry_store.sync,
+                        click_up_token,
+                        click_up_team_id,
+                        from_date_ts,
+                        to_date_ts,
+                        chunk_months=chunk_months,
+                        max_concurrency=max_concurrency,
+                        current_tz=current_tz,
+                        chunk_journal_directory=chunk_journal_directory,
+                    ),
+                )
+            ]
+        else:
+            print(
+                "Gathering Click-Up time entries from {} to {}".format(
+                    from_date, to_date
+                )
+            )
+            chunks = time_entries_chunks(
+                from_date_ts, to_date_ts, chunk_months, current_tz
+            )
+            journal_paths = time_entries_chunks_journal_paths(
+                chunk_journal_directory, click_up_token, click_up_team_id, chunks
+            )
+            chunk_futures = [
+                loop.run_in_executor(
+                    executor,
+                    fetch_time_entries_chunk,
+                    click_up_token,
+                    click_up_team_id,
+                    chunk,
+                    journal_path,
+                )
+                for chunk, journal_path in zip(chunks, journal_paths)
+            ]
+
+        # Cached tasks must be checked for updates before being looked up
+        await loop.run_in_executor(
+            executor, refresh_task_cache, task_cache, click_up_token, click_up_team_id
+        )
+
+        looked_up_task_ids = set()
+        task_lookups = []
+        bulk_entries = []
+        for chunk_future in asyncio.as_completed(chunk_futures):
+            new_entries = []
+            for d in await chunk_future:
+                if d["task"]["id"] not in looked_up_task_ids:
+                    looked_up_task_ids.add(d["task"]["id"])
+                    new_entries.append(d)
+            if task_resolution == "per-task":
+                task_lookups += [
+                    loop.run_in_executor(
+                        executor,
+                        fetch_task_general_data,
+                        d["task"]["id"],
+                        click_up_token,
+                        click_up_team_id,
+                        task_cache,
+                        tasks,
+                    )
+                    for d in new_entries
+                ]
+            elif task_resolution == "bulk":
+                # Listing lists' tasks again for every chunk would cost more requests than it saves
+                bulk_entries += new_entries
+            elif new_entries:
+                task_lookups.append(
+                    loop.run_in_executor(
+                        executor,
+                        functools.partial(
+                            resolve_tasks,
+                            new_entries,
+                            click_up_token,
+                            click_up_team_id,
+                            task_resolution=task_resolution,
+                            max_concurrency=1,
+                            task_cache=task_cache,
+                            tasks=tasks,
+                        ),
+                    )
+                )
+        if bulk_entries:
+            task_lookups.append(
+                loop.run_in_executor(
+                    executor,
+                    functools.partial(
+                        resolve_tasks,
+                        bulk_entries,
+                        click_up_token,
+                        click_up_team_id,
+                        task_resolution=task_resolution,
+                        max_concurrency=max_concurrency,
+                        task_cache=task_cache,
+                        tasks=tasks,
+                    ),
+                )
+            )
+        await asyncio.gather(*task_lookups)
+
+    entries = merge_time_entries_chunks(
+        [chunk_future.result() for chunk_future in chunk_futures], journal_paths
+    )
+    # Tasks were added as chunks and lookups completed, rows follow the time entries
+    order_tasks(tasks, [d["task"]["id"] for d in entries], known_task_ids)
+    return click_up_team_id, entries
+
+
+def require_api_token(click_up_token):
+    """Returns click_up_token, defaulting to the CLICKUP_PK environment variable. Exits if neither is set, as the API token is compulsory."""
+    if click_up_token:
+        return click_up_token
+    if CLICKUP_PK:
+        return CLICKUP_PK
+    print(
+        "Missing Click-Up REST API token (pk_* value), set it in .env or through the --click-up-token command line parameter (see --help)."
+    )
+    sys.exit(1)
+
+
+def guess_click_up_team_id(click_up_token):
+    """Returns the id of the user's only team, see https://clickup.com/api/clickupreference/operation/GetAuthorizedTeams/ . Exits if the user has no or several teams."""
+    user_teams = fetch_user_teams(click_up_token=click_up_token)
+    if not user_teams:
+        print(
+            "Missing Click-Up team parameter (--click-up-team-id or CLICKUP_TEAM_ID environment variable) not found and user for given Click-Up user API key has no teams. Giving up."
+        )
+        exit(1)
+    elif len(user_teams) > 1:
+        user_teams_overview = [
+            {"id": team["id"], "name": team["name"]} for team in user_teams
+        ]
+        print(
+            "Missing Click-Up team parameter (--click-up-team-id or CLICKUP_TEAM_ID environment variable) not found and user for given Click-Up user API key has several teams to choose from: {}. Giving up.".format(
+                user_teams_overview
+            )
+        )
+        exit(1)
+    click_up_team_id = user_teams[0]["id"]
+    print(
+        "Guessing team_id as user's only assigned team: {} ({}).".format(
+            user_teams[0]["name"], click_up_team_id
+        )
+    )
+    return click_up_team_id
+
+
+@functools.lru_cache(maxsize=None)
+def babel_locale(language):
+    """Returns the Babel locale of a language such as "fr_FR", parsed once."""
+    from babel import Locale
+
+    return Locale.parse(language)
+
+
+@functools.lru_cache(maxsize=DATE_FORMAT_CACHE_SIZE)
+def format_day(day, format="full", language=DEFAULT_LANGUAGE):
+    """Returns a date formatted by Babel in one of its formats ("full", "short"...) for language, memoized."""
+    from babel.dates import format_date
+
+    return format_date(day, format=format, locale=babel_locale(language))
+
+
+def parse_iso_date(a_date):
+    """Returns the date of an ISO 8601 string such as "2023-01-31T08:00:00+01:00" or "2023-01-31 23:59:59", with dateutil's parser for formats datetime.fromisoformat() does not handle."""
+    try:
+        return datetime.fromisoformat(a_date).date()
+    except ValueError:
+        import dateutil.parser
+
+        return dateutil.parser.parse(a_date).date()
+
+
+@functools.lru_cache(maxsize=DATE_FORMAT_CACHE_SIZE)
+def format_iso_date(a_date, format="full", language=DEFAULT_LANGUAGE):
+    """Returns the date of an ISO 8601 string formatted by Babel for language, see format_day(), memoized."""
+    return format_day(parse_iso_date(a_date), format, language)
+
+
+def add_day_durations(days_view, days, current_tz, language=DEFAULT_LANGUAGE):
+    """Adds up the {"%Y-%m-%d": (first start milliseconds, milliseconds duration)} days of aggregate_time_entries() into a days view."""
+    for task_date, (first_start, duration_ms) in days.items():
+        task_start_ts = datetime.fromtimestamp(first_start / 1000).replace(
+            tzinfo=current_tz
+        )
+        if not task_date in days_view.keys():
+            days_view[task_date] = {
+                "total_duration": 0,
+                "iso_date": task_start_ts.isoformat(),
+                "human_date": format_day(
+                    task_start_ts.date(), "full", language
+                ),  # task_start_ts.strftime("%a, %d %b %Y"),
+            }
+        days_view[task_date]["total_duration"] += duration_ms / 1000
+
+        # Prepare days_view[...]["total_duration_human"] for futher summarizing
+        days_view[task_date]["total_duration_human"] = tupled_total_duration_human(
+            days_view[task_date]["total_duration"]
+        )
+
+
+def fill_report_views(
+    context,
+    data,
+    click_up_token,
+    click_up_team_id,
+    current_tz,
+    language=DEFAULT_LANGUAGE,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache=None,
+):
+    """Adds up the durations of time entries from data, or of TimeEntryColumns, into the context's days and tasks views, resolving tasks missing from its tasks view.
+    Returns the TimeEntryColumns of the time entries.
+    """
+    # Load time entries within dates range into columns, then add up durations by task and by day at once
+    columns = data if isinstance(data, TimeEntryColumns) else TimeEntryColumns(data)
+    task_durations, days = aggregate_time_entries(columns)
+    add_day_durations(context.days, days, current_tz, language)
+
+    # Fetch all distinct tasks at once, several at a time, instead of one by one within the loop below
+    resolve_tasks(
+        columns.task_entries,
+        click_up_token,
+        click_up_team_id,
+        task_resolution=task_resolution,
+        max_concurrency=max_concurrency,
+        task_cache=task_cache,
+        tasks=context.tasks,
+    )
+
+    for task_id, task_index in columns.task_ids.items():
+        # Fill TASK[task_id] with task info if unfetched yet, and add up duration
+        fetch_task_general_data(task_id, click_up_token, tasks=context.tasks)
+        if not "total_duration" in context.tasks[task_id].keys():
+            context.tasks[task_id]["total_duration"] = 0
+        context.tasks[task_id]["total_duration"] += task_durations[task_index] / 1000
+
+        # Prepare context.tasks[...]["total_duration_human"] for futher summarizing
+        context.tasks[task_id]["total_duration_human"] = tupled_total_duration_human(
+            context.tasks[task_id]["total_duration"]
+        )
+
+    # Same durations by user, for reports by user
+    if context.users is not None:
+        task_ids = list(columns.task_ids)
+        user_aggregates = aggregate_user_time_entries(columns)
+        for user_index, (user_task_durations, user_days) in user_aggregates.items():
+            user = columns.users[user_index]
+            user_view = context.users.setdefault(
+                str(user["id"]),
+                {
+                    "username": user.get("username"),
+                    "email": user.get("email"),
+                    "total_duration": 0,
+                    "tasks": {},
+                    "days": {},
+                },
+            )
+            add_day_durations(user_view["days"], user_days, current_tz, language)
+            for task_index, duration_ms in user_task_durations.items():
+                user_task = user_view["tasks"].setdefault(
+                    task_ids[task_index], {"total_duration": 0}
+                )
+                user_task["total_duration"] += duration_ms / 1000
+                user_task["total_duration_human"] = tupled_total_duration_human(
+                    user_task["total_duration"]
+                )
+            user_view["total_duration"] += sum(user_task_durations.values()) / 1000
+            user_view["total_duration_human"] = tupled_total_duration_human(
+                user_view["total_duration"]
+            )
+    return columns
+
+
+@profiled
+def grab_time_entries(
+    from_date=None,
+    to_date=None,
+    click_up_token=None,
+    click_up_team_id=None,
+    time_zone=DEFAULT_TIMEZONE,
+    language=DEFAULT_LANGUAGE,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache=None,
+    time_entry_store=None,
+    chunk_months=DEFAULT_CHUNK_MONTHS,
+    chunk_journal_directory=None,
+    http_pool_size=None,
+    http_timeout=DEFAULT_HTTP_TIMEOUT,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    max_retries=DEFAULT_MAX_RETRIES,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    engine=DEFAULT_ENGINE,
+    stream=False,
+    by_user=False,
+    context=None,
+):
+    """Populates the context's tasks and days views (defaulting to TASKS and DAYS) from Click-Up's API between from_date and to_date using the click_up_token and click_up_team_id.
+    Tasks information is reused from the optional persistent task_cache, defaulting to the context's, when fresh enough.
+    With a time_entry_store, only missing or recent time entries are fetched and the report is built from the store.
+    Time entries are fetched by chunk_months windows, see fetch_time_entries_between().
+    All requests share one pool of http_pool_size connections, defaulting to max_concurrency, paced to rate_limit requests per minute.
+    Tasks are resolved with the task_resolution strategy, see resolve_tasks().
+    The "async" engine fetches both in a single pipeline, see async_fetch_time_entries_and_tasks().
+    With stream, time entries are aggregated while being parsed from the responses instead of being loaded at once, see iter_time_entries().
+    With by_user, the time entries of all the team's members are fetched at once, rather than the token owner's, and the context's users view is populated too.
+    Returns the TimeEntryColumns of the time entries, which write_snapshot() can save.
+    """
+    from dateutil import tz
+
+    context = report_context(context)
+    if task_cache is None:
+        task_cache = context.task_cache
+
+    click_up_token = require_api_token(click_up_token)
+
+    # All fetchers below reuse this client's connections and rate limiter
+    client = get_click_up_client(
+        click_up_token,
+        pool_size=http_pool_size or max_concurrency,
+        timeout=http_timeout,
+        rate_limit=rate_limit,
+        max_retries=max_retries,
+    )
+
+    # team_id can be provided or will be guessed from https://clickup.com/api/clickupreference/operation/GetAuthorizedTeams/
+    if not click_up_team_id:
+        if CLICKUP_TEAM_ID:
+            print("Using CLICKUP_TEAM_ID from environment.")
+            click_up_team_id = CLICKUP_TEAM_ID
+        elif engine != "async":  # The async engine guesses it within its pipeline
+            click_up_team_id = guess_click_up_team_id(click_up_token)
+
+    current_tz = tz.gettz(time_zone)
+    fetch_options = {
+        "chunk_months": chunk_months,
+        "max_concurrency": max_concurrency,
+        "chunk_journal_directory": chunk_journal_directory,
+    }
+
+    # All members' time entries are fetched by the same requests, filtered by assignee
+    assignees = None
+    if by_user:
+        if context.users is None:
+            context.users = {}
+        assignees = [
+            user["id"] for user in fetch_team_members(click_up_token, click_up_team_id)
+        ]
+
+    if engine == "async":
+        import asyncio
+
+        click_up_team_id, data = asyncio.run(
+            async_fetch_time_entries_and_tasks(
+                click_up_token,
+                click_up_team_id,
+                from_date=from_date,
+                to_date=to_date,
+                time_zone=time_zone,
+                task_resolution=task_resolution,
+                task_cache=task_cache,
+                time_entry_store=time_entry_store,
+                tasks=context.tasks,
+                **fetch_options,
+            )
+        )
+    elif time_entry_store is not None:
+        _, _, from_date_ts, to_date_ts = time_entries_date_range(
+            from_date, to_date, current_tz
+        )
+        data = time_entry_store.sync(
+            click_up_token,
+            click_up_team_id,
+            from_date_ts,
+            to_date_ts,
+            current_tz=current_tz,
+            **fetch_options,
+        )
+    elif stream:
+        data = iter_time_entries(
+            click_up_token,
+            click_up_team_id,
+            from_date,
+            to_date,
+            current_tz,
+            chunk_months=chunk_months,
+            assignees=assignees,
+        )
+    else:
+        data = fetch_time_entries(
+            click_up_token=click_up_token,
+            click_up_team_id=click_up_team_id,
+            from_date=from_date,
+            to_date=to_date,
+            current_tz=current_tz,
+            assignees=assignees,
+            **fetch_options,
+        )
+
+    if engine != "async":
+        refresh_task_cache(task_cache, click_up_token, click_up_team_id)
+
+    columns = fill_report_views(
+        context,
+        data,
+        click_up_token,
+        click_up_team_id,
+        current_tz,
+        language,
+        task_resolution=task_resolution,
+        max_concurrency=max_concurrency,
+        task_cache=task_cache,
+    )
+
+    if client.rate_limiter.throttled_seconds:
+        print(
+            "Throttled for {:.1f}s by Click-Up's rate limit ({} retries).".format(
+                client.rate_limiter.throttled_seconds, client.retries
+            )
+        )
+    return columns
+
+
+def split_click_up_team_ids(click_up_team_id):
+    """Returns the list of team ids of a comma-separated string such as "123,456", of a sequence of them, or ["all"]."""
+    if isinstance(click_up_team_id, (list, tuple)):
+        team_ids = click_up_team_id
+    else:
+        team_ids = str(click_up_team_id).split(",")
+    return [str(team_id).strip() for team_id in team_ids if str(team_id).strip()]
+
+
+def merge_durations(view, other_view):
+    """Adds up the durations of the items of other_view, such as tasks or days, into view's."""
+    for key, item in other_view.items():
+        if key not in view:
+            view[key] = item
+            continue
+        view[key]["total_duration"] += item["total_duration"]
+        view[key]["total_duration_human"] = tupled_total_duration_human(
+            view[key]["total_duration"]
+        )
+        # The day's first time entry, of whichever team
+        if "iso_date" in item and item["iso_date"] < view[key]["iso_date"]:
+            view[key]["iso_date"] = item["iso_date"]
+
+
+def merge_report_views(context, team_context):
+    """Adds up the tasks, days and users views of team_context into the context's."""
+    merge_durations(context.tasks, team_context.tasks)
+    merge_durations(context.days, team_context.days)
+    if team_context.users is not None:
+        if context.users is None:
+            context.users = {}
+        for user_id, user in team_context.users.items():
+            if user_id not in context.users:
+                context.users[user_id] = user
+                continue
+            merge_durations(context.users[user_id]["tasks"], user["tasks"])
+            merge_durations(context.users[user_id]["days"], user["days"])
+            merge_durations(context.users, {user_id: user})
+
+
+@profiled
+def grab_teams_time_entries(
+    click_up_team_id="all",
+    click_up_token=None,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    http_pool_size=None,
+    context=None,
+    **options,
+):
+    """Populates the context's tasks and days views (defaulting to TASKS and DAYS) from the time entries of several Click-Up teams, given as a comma-separated click_up_team_id or "all" of the user's teams.
+    Teams are grabbed concurrently with grab_time_entries() and its options, sharing one client with a pool of http_pool_size connections per team and the context's task cache.
+    The context's teams view gets each team's name and total duration.
+    Returns the TimeEntryColumns of the time entries of all teams.
+    """
+    context = report_context(context)
+    if options.get("task_cache") is None:
+        options["task_cache"] = context.task_cache
+
+    click_up_token = require_api_token(click_up_token)
+
+    # Teams are named after https://clickup.com/api/clickupreference/operation/GetAuthorizedTeams/
+    team_ids = split_click_up_team_ids(click_up_team_id)
+    user_teams = {
+        str(team["id"]): team["name"]
+        for team in fetch_user_teams(click_up_token=click_up_token)
+    }
+    if team_ids == ["all"]:
+        team_ids = list(user_teams)
+    if not team_ids:
+        print("User for given Click-Up user API key has no teams. Giving up.")
+        exit(1)
+
+    # All teams' threads share this client's connections and rate limiter, see grab_time_entries()
+    http_pool_size = (http_pool_size or max_concurrency) * len(team_ids)
+
+    def grab_team(team_id):
+        team_context = ReportContext(task_cache=options["task_cache"])
+        columns = grab_time_entries(
+            click_up_token=click_up_token,
+            click_up_team_id=team_id,
+            max_concurrency=max_concurrency,
+            http_pool_size=http_pool_size,
+            context=team_context,
+            **options,
+        )
+        return team_context, columns
+
+    with ThreadPoolExecutor(max_workers=len(team_ids)) as executor:
+        teams = list(zip(team_ids, executor.map(grab_team, team_ids)))
+
+    columns = TimeEntryColumns()
+    for team_id, (team_context, team_columns) in teams:
+        merge_report_views(context, team_context)
+        columns.merge(team_columns)
+        total_duration = sum(
+            task["total_duration"] for task in team_context.tasks.values()
+        )
+        context.teams[team_id] = {
+            "name": user_teams.get(team_id, team_id),
+            "total_duration": total_duration,
+            "total_duration_human": tupled_total_duration_human(total_duration),
+        }
+    return columns
+
+
+@profiled
+def report_from_time_entry_store(
+    time_entry_store,
+    click_up_team_id=None,
+    from_date=None,
+    to_date=None,
+    time_zone=DEFAULT_TIMEZONE,
+    language=DEFAULT_LANGUAGE,
+    task_cache=None,
+    context=None,
+):
+    """Populates the context's tasks and days views (defaulting to TASKS and DAYS) offline, from the raw time entries of a TimeEntryStore between from_date and to_date.
+    Time entries are found by a range scan of the store's start index. Their tasks information comes from the task_cache even if expired, else from the time entries themselves as with the "lean" task resolution, else from their task names.
+    Missing dates default to the synced range's bounds, and the rest of the last synced day is left out. Returns the TimeEntryColumns of these time entries.
+    """
+    from dateutil import tz
+
+    context = report_context(context)
+    if task_cache is None:
+        task_cache = context.task_cache
+
+    # The team is the only one synced, unless given
+    if not click_up_team_id:
+        team_ids = time_entry_store.team_ids()
+        if len(team_ids) != 1:
+            print("Use --click-up-team-id to pick one of the synced teams:", team_ids)
+            exit(1)
+        click_up_team_id = team_ids[0]
+    synced_range = time_entry_store.synced_range(click_up_team_id)
+    if synced_range is None:
+        print(
+            "No time entries of team {} were synced yet, use --sync without --offline first".format(
+                click_up_team_id
+            )
+        )
+        exit(1)
+
+    current_tz = tz.gettz(time_zone)
+    _, _, from_date_ts, to_date_ts = time_entries_date_range(
+        from_date, to_date, current_tz
+    )
+    synced_from, synced_to = synced_range
+    if not from_date:
+        from_date_ts = max(from_date_ts, synced_from)
+    if not to_date:
+        to_date_ts = min(to_date_ts, synced_to)
+    # Syncs stop at their own time, so the rest of that day cannot have been synced yet
+    synced_to_day_end_ts = int(
+        datetime.fromtimestamp(synced_to / 1000, tz=current_tz)
+        .replace(hour=23, minute=59, second=59, microsecond=999999)
+        .timestamp()
+        * 1000
+    )
+    if synced_to < to_date_ts <= synced_to_day_end_ts:
+        print(
+            "Time entries were synced until {}, reporting up to then.".format(
+                datetime.fromtimestamp(synced_to / 1000, tz=current_tz)
+            )
+        )
+        to_date_ts = synced_to
+    if from_date_ts < synced_from or to_date_ts > synced_to:
+        print(
+            "Time entries were only synced from {} to {}, use --sync without --offline first".format(
+                datetime.fromtimestamp(synced_from / 1000),
+                datetime.fromtimestamp(synced_to / 1000),
+            )
+        )
+        exit(1)
+    data = time_entry_store.entries(click_up_team_id, from_date_ts, to_date_ts)
+
+    # Tasks information without any request, so that fill_report_views() does not fetch any
+    for d in data:
+        task_id = d["task"]["id"]
+        if task_id not in context.tasks:
+            context.tasks[task_id] = (
+                (
+                    task_cache is not None
+                    and task_cache.get(click_up_team_id, task_id, expired=True)
+                )
+                or task_from_time_entry(d)
+                or {"id": task_id, "name": d["task"].get("name") or task_id}
+            )
+    return fill_report_views(
+        context, data, None, click_up_team_id, current_tz, language
+    )
+
+
+@profiled
+def write_snapshot(snapshot_path, columns, tasks, **metadata):
+    """Writes TimeEntryColumns sorted by start, the SNAPSHOT_TASK_FIELDS of their tasks information and metadata into a binary snapshot file.
+    The file holds SNAPSHOT_MAGIC, the length of a JSON header padded to 8 bytes, the header, then each of SNAPSHOT_COLUMNS as little-endian 64 bits integers.
+    """
+    order = sorted(range(len(columns)), key=columns.starts.__getitem__)
+    header = dict(
+        metadata,
+        entry_count=len(order),
+        tasks=[
+            {
+                field: tasks[task_id][field]
+                for field in SNAPSHOT_TASK_FIELDS
+                if field in tasks[task_id]
+            }
+            for task_id in columns.task_ids
+        ],
+    )
+    header = json.dumps(header).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    # Written aside then moved, not to leave a truncated snapshot behind
+    with open(snapshot_path + ".tmp", "wb") as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        snapshot_file.write(struct.pack("<Q", len(header)))
+        snapshot_file.write(header)
+        for name in SNAPSHOT_COLUMNS:
+            column = getattr(columns, name)
+            column = array("q", [column[i] for i in order])
+            if sys.byteorder == "big":
+                column.byteswap()
+            column.tofile(snapshot_file)
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+    return snapshot_path
+
+
+class Snapshot:
+    """Time entries and tasks information of a snapshot file written by write_snapshot().
+    Columns are memory-mapped instead of being read and parsed at once.
+    """
+
+    def __init__(self, snapshot_path):
+        self.path = snapshot_path
+        with open(snapshot_path, "rb") as snapshot_file:
+            self.mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = len(SNAPSHOT_MAGIC) + 8
+        if self.mmap[: len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError("Not a time entries snapshot: " + snapshot_path)
+        (header_length,) = struct.unpack_from("<Q", self.mmap, len(SNAPSHOT_MAGIC))
+        header = json.loads(self.mmap[offset : offset + header_length])
+        offset += header_length
+        entry_count = header.pop("entry_count")
+        if len(self.mmap) != offset + 8 * entry_count * len(SNAPSHOT_COLUMNS):
+            raise ValueError("Truncated time entries snapshot: " + snapshot_path)
+
+        # Task information by id, in task index order
+        self.tasks = {task["id"]: task for task in header.pop("tasks")}
+        self.metadata = header
+        view = memoryview(self.mmap)
+        columns = []
+        for _ in SNAPSHOT_COLUMNS:
+            column = view[offset : offset + 8 * entry_count].cast("q")
+            if sys.byteorder == "big":
+                column = array("q", column)
+                column.byteswap()
+            columns.append(column)
+            offset += 8 * entry_count
+        self.columns = TimeEntryColumns.from_columns(
+            *columns, list(self.tasks), sorted_by_start=True
+        )
+
+    def date_range(self, current_tz):
+        """Returns the (from_date, to_date) dates covered by the snapshot, as recorded in its metadata or else those of its first and last time entries, None if unknown."""
+        starts = self.columns.starts
+        return tuple(
+            self.metadata.get(key)
+            or (
+                datetime.fromtimestamp(starts[index] / 1000, current_tz).strftime(
+                    "%Y-%m-%d"
+                )
+                if len(starts)
+                else None
+            )
+            for key, index in (("from_date", 0), ("to_date", -1))
+        )
+
+
+@profiled
+def report_from_snapshot(
+    snapshot,
+    from_date=None,
+    to_date=None,
+    time_zone=DEFAULT_TIMEZONE,
+    language=DEFAULT_LANGUAGE,
+    context=None,
+):
+    """Populates the context's tasks and days views (defaulting to TASKS and DAYS) offline from a Snapshot, with only its time entries between from_date and to_date if either is given.
+    Returns the TimeEntryColumns of these time entries.
+    """
+    from dateutil import tz
+
+    context = report_context(context)
+    current_tz = tz.gettz(time_zone)
+    columns = snapshot.columns
+    if from_date or to_date:
+        # Dates outside of the snapshot would be reported as if nothing was done then
+        snapshot_from_date, snapshot_to_date = snapshot.date_range(current_tz)
+        if (from_date and snapshot_from_date and from_date < snapshot_from_date) or (
+            to_date and snapshot_to_date and to_date > snapshot_to_date
+        ):
+            print(
+                "Dates {} to {} are not all in the snapshot, which covers {} to {}".format(
+                    from_date, to_date, snapshot_from_date, snapshot_to_date
+                )
+            )
+            exit(1)
+        _, _, from_date_ts, to_date_ts = time_entries_date_range(
+            from_date, to_date, current_tz
+        )
+        columns = columns.between(from_date_ts, to_date_ts)
+
+    # Tasks information comes from the snapshot, so that nothing is fetched
+    for task_id in columns.task_ids:
+        if task_id not in context.tasks:
+            context.tasks[task_id] = dict(snapshot.tasks[task_id])
+    return fill_report_views(
+        context,
+        columns,
+        None,
+        snapshot.metadata.get("team_id"),
+        current_tz,
+        language,
+    )
+
+
+def report_time_entries(from_date, to_date, days_view, task_durations, tasks):
+    """Returns a time entries dictionary of a days view and of the task_durations of tasks, both by id, see get_time_entries()."""
+    days = [
+        {
+            "human_date": days_view[date]["human_date"],
+            "iso_date": days_view[date]["iso_date"],
+            "total_duration_raw": days_view[date]["total_duration_human"],
+            "total_duration_human": formatted_total_duration_human(
+                days_view[date]["total_duration_human"]
+            ),
+        }
+        for date in sorted(days_view)
+    ]
+    task_rows = [
+        {
+            "name": tasks[k]["name"],
+            "list": tasks[k].get("list", {}).get("name"),
+            "project": tasks[k].get("project", {}).get("name"),
+            "folder": tasks[k].get("folder", {}).get("name"),
+            "total_duration_raw": v.get("total_duration_human", 0),
+            "total_duration_human": formatted_total_duration_human(
+                v.get("total_duration_human", 0)
+            ),
+        }
+        for k, v in task_durations.items()
+    ]
+
+    undived_total_seconds = sum(v["total_duration"] for v in task_durations.values())
+    minutes, seconds = divmod(undived_total_seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "days": days,
+        "tasks": task_rows,
+        "total_duration": {"hours": hours, "minutes": minutes, "seconds": seconds},
+    }
+
+
+@profiled
+def get_time_entries(from_date, to_date, context=None):
+    """Prepares a time entries and total dictionary from the context's tasks and days views, defaulting to TASKS and DAYS.
+    This function's results can be piped into print_time_entries() or render_time_entries_html() for console or HTML/PDF rendering.
+
+    This should be called after grab_time_entries() which takes care of populating depending data views.
+    """
+    context = report_context(context)
+    time_entries = report_time_entries(
+        from_date, to_date, context.days, context.tasks, context.tasks
+    )
+    # Reports of several teams break their total down by team, see grab_teams_time_entries()
+    if context.teams:
+        time_entries["teams"] = [
+            {
+                "id": team_id,
+                "name": team["name"],
+                "total_duration_raw": team["total_duration_human"],
+                "total_duration_human": formatted_total_duration_human(
+                    team["total_duration_human"]
+                ),
+            }
+            for team_id, team in context.teams.items()
+        ]
+    # Reports by user have a report of the same form per user, see write_user_report_outputs()
+    if context.users is not None:
+        time_entries["users"] = [
+            dict(
+                report_time_entries(
+                    from_date, to_date, user["days"], user["tasks"], context.tasks
+                ),
+                id=user_id,
+                username=user["username"],
+                email=user["email"],
+            )
+            for user_id, user in context.users.items()
+        ]
+    return time_entries
+
+
+def get_time_entry_groups(columns, groupings, context=None):
+    """Prepares the groupings of group_time_entries() for reports, as {"group_by", "total_duration_raw", "total_duration_human", "groups"} dictionaries, see get_time_entries().
+    Groups have a dimension, an id, a name, durations and their own groups along the grouping's next dimension, sorted by name.
+    """
+    context = report_context(context)
+
+    def report_groups(children, dimensions):
+        groups = [
+            {
+                "dimension": dimensions[0],
+                "id": value_id,
+                "name": node["name"],
+                "total_duration_raw": tupled_total_duration_human(
+                    node["duration"] / 1000
+                ),
+                "total_duration_human": formatted_total_duration_human(
+                    tupled_total_duration_human(node["duration"] / 1000)
+                ),
+                "groups": report_groups(node["children"], dimensions[1:]),
+            }
+            for value_id, node in children.items()
+        ]
+        return sorted(groups, key=lambda group: str(group["name"] or ""))
+
+    trees = group_time_entries(columns, context.tasks, groupings)
+    return [
+        {
+            "group_by": ">".join(grouping),
+            "total_duration_raw": tupled_total_duration_human(tree["duration"] / 1000),
+            "total_duration_human": formatted_total_duration_human(
+                tupled_total_duration_human(tree["duration"] / 1000)
+            ),
+            "groups": report_groups(tree["children"], grouping),
+        }
+        for grouping, tree in zip(groupings, trees)
+    ]
+
+
+def print_time_entry_groups(groups, depth=1):
+    """Prints groups of get_time_entry_groups(), indented by level."""
+    for group in groups:
+        print("  " * depth + str(group["name"]), group["total_duration_human"])
+        print_time_entry_groups(group["groups"], depth + 1)
+
+
+def print_time_entries(entries):
+    """Prints nicely day-based and task-based statistics, as stored in the TASKS and DAYS views."""
+    print("Daily time sheet:")
+    for date_entry in entries["days"]:
+        print(date_entry["human_date"], date_entry["total_duration_human"])
+
+    print()
+    print("Tasks summary:")
+    for task in entries["tasks"]:
+        print(
+            task["name"],
+            task["list"],
             task["project"],
             task["folder"],
             task["total_duration_human"],
         )
 
+    if entries.get("teams"):
+        print()
+        print("Teams summary:")
+        for team in entries["teams"]:
+            print(team["name"], team["total_duration_human"])
+
+    for grouping in entries.get("groups", []):
+        print()
+        print(
+            "{} summary:".format(grouping["group_by"].replace(">", " > ").capitalize())
+        )
+        print_time_entry_groups(grouping["groups"])
+
+    if entries.get("users"):
+        print()
+        print("Users summary:")
+        for user in entries["users"]:
+            print(
+                user["username"],
+                "{hours:.0f}h{minutes:.0f}m{seconds:.0f}".format(
+                    **user["total_duration"]
+                ),
+            )
+
     print()
     print(
         "Total: {hours:.0f}h{minutes:.0f}m{seconds:.0f}".format(
@@ -325,72 +2690,738 @@ def print_time_entries(entries):
     )
 
 
-def render_time_entries_html(
+class HtmlRenderer:
+    """Renders time entries HTML reports from the Jinja templates of template_directory.
+    Translations are loaded once per language, and templates compiled once per language, as each language has its own Jinja environment.
+    With a template_cache_directory, compiled templates are also cached on disk across runs.
+    """
+
+    def __init__(
+        self,
+        template_directory=DEFAULT_HTML_JINJA_TEMPLATE_DIRECTORY,
+        template_cache_directory=None,
+    ):
+        from jinja2 import FileSystemBytecodeCache
+
+        self.template_directory = template_directory
+        self.bytecode_cache = None
+        if template_cache_directory:
+            os.makedirs(template_cache_directory, exist_ok=True)
+            self.bytecode_cache = FileSystemBytecodeCache(template_cache_directory)
+        self.environments = {}  # by language
+        self.translations = {}  # by language
+        self.lock = threading.Lock()
+
+    def translation(self, language):
+        """Returns the gettext translations of language."""
+        with self.lock:
+            if language not in self.translations:
+                self.translations[language] = gettext.translation(
+                    "messages",
+                    os.path.abspath(os.path.join(os.path.dirname(__file__), "locale")),
+                    languages=[language],
+                )
+            return self.translations[language]
+
+    def environment(self, language):
+        """Returns the Jinja environment of language, with its translations installed."""
+        from jinja2 import Environment, FileSystemLoader
+
+        translations = self.translation(language)
+        with self.lock:
+            if language not in self.environments:
+                environment = Environment(
+                    loader=FileSystemLoader(self.template_directory),
+                    extensions=["jinja2.ext.i18n"],
+                    bytecode_cache=self.bytecode_cache,
+                )
+                environment.install_gettext_translations(translations)
+                self.environments[language] = environment
+            return self.environments[language]
+
+    def render(
+        self,
+        time_entries,
+        title=None,
+        language=None,
+        company_logo=None,
+        customer_name=None,
+        consultant_name=None,
+        customer_signature_field=None,
+        consultant_signature_field=None,
+        template=DEFAULT_HTML_JINJA_TEMPLATE,
+    ):
+        company_logo_base64 = None
+        if company_logo:
+            with open(company_logo, "rb") as logo_fp:
+                company_logo_base64 = "data:image/png;base64," + base64.encodebytes(
+                    logo_fp.read()
+                ).decode("utf-8")
+
+        if not language:
+            language = DEFAULT_LANGUAGE
+
+        def jinja_render_date_str_with_babel(a_date, format="full"):
+            if not a_date:
+                return format_day(datetime.today().date(), format, language)
+            return format_iso_date(a_date, format, language)
+
+        if not title:
+            title = gettext.gettext(DEFAULT_HTML_TITLE)
+
+        # Shared templates are left untouched, str_to_date being a render variable rather than a template global
+        content = (
+            self.environment(language)
+            .get_template(template)
+            .render(
+                {
+                    "str_to_date": jinja_render_date_str_with_babel,
+                    "document_title": title,
+                    "html_lang": ("fr" if language.startswith("fr") else "en"),
+                    "customer_name": customer_name,
+                    "consultant_name": consultant_name,
+                    "time_entries": time_entries,
+                    "base64_company_logo": company_logo_base64,
+                    "customer_signature_field": customer_signature_field,
+                    "consultant_signature_field": consultant_signature_field,
+                },
+                presentational_hints=True,
+            )
+        )
+        return content
+
+
+def get_html_renderer(
+    template_directory=DEFAULT_HTML_JINJA_TEMPLATE_DIRECTORY,
+    template_cache_directory=None,
+):
+    """Returns the shared HtmlRenderer of template_directory, creating it on first use.
+    Its compiled templates are cached on disk into template_cache_directory, defaulting to DEFAULT_TEMPLATE_CACHE_DIRECTORY.
+    """
+    with HTML_RENDERERS_LOCK:
+        key = os.path.abspath(template_directory)
+        if key not in HTML_RENDERERS:
+            HTML_RENDERERS[key] = HtmlRenderer(
+                template_directory,
+                template_cache_directory or DEFAULT_TEMPLATE_CACHE_DIRECTORY,
+            )
+        return HTML_RENDERERS[key]
+
+
+@profiled
+def render_time_entries_html(
+    time_entries,
+    title=None,
+    language=None,
+    company_logo=None,
+    customer_name=None,
+    consultant_name=None,
+    customer_signature_field=None,
+    consultant_signature_field=None,
+):
+    """Renders a time entries dictionary, as returned by get_time_entries(), into an HTML report, see HtmlRenderer."""
+    return get_html_renderer().render(
+        time_entries,
+        title=title,
+        language=language,
+        company_logo=company_logo,
+        customer_name=customer_name,
+        consultant_name=consultant_name,
+        customer_signature_field=customer_signature_field,
+        consultant_signature_field=consultant_signature_field,
+    )
+
+
+def pdf_renderer():
+    """Returns this process' WeasyPrint (HTML class, FontConfiguration) pair, importing WeasyPrint on first use only."""
+    global PDF_RENDERER
+    if PDF_RENDERER is None:
+        try:
+            from weasyprint import HTML
+            from weasyprint.text.fonts import FontConfiguration
+        except ModuleNotFoundError:
+            print(
+                "The --as-pdf and --pdf-output-path options required the Python weasyprint module to be installed."
+            )
+            exit(1)
+        PDF_RENDERER = (HTML, FontConfiguration())
+    return PDF_RENDERER
+
+
+@profiled
+def render_pdf(html_content, pdf_output_path=DEFAULT_PDF_OUTPUT_PATH):
+    """Writes html_content as a PDF file to pdf_output_path and returns it, or returns the PDF's bytes if pdf_output_path is None."""
+    HTML, font_config = pdf_renderer()
+    pdf_content = HTML(string=html_content).write_pdf(
+        pdf_output_path, font_config=font_config
+    )
+    return pdf_output_path if pdf_output_path is not None else pdf_content
+
+
+@profiled
+def render_pdfs(payloads, processes=None):
+    """Writes PDF files from (html_content, pdf_output_path) payloads concurrently, returning their paths.
+    WeasyPrint layout being CPU-bound, PDFs are rendered by a pool of processes, defaulting to one per CPU, each importing WeasyPrint once.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    payloads = list(payloads)
+    if processes == 1 or len(payloads) <= 1:
+        return [render_pdf(*payload) for payload in payloads]
+    # Fails early rather than from each pool process
+    if PDF_RENDERER is None and importlib.util.find_spec("weasyprint") is None:
+        pdf_renderer()
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=pdf_renderer
+    ) as executor:
+        return list(executor.map(render_pdf, *zip(*payloads)))
+
+
+def write_report_outputs(
     time_entries,
-    title=None,
-    language=None,
-    company_logo=None,
+    as_json=False,
+    json_output_path=DEFAULT_JSON_OUTPUT_PATH,
+    as_html=False,
+    html_output_path=DEFAULT_HTML_OUTPUT_PATH,
+    as_pdf=False,
+    pdf_output_path=DEFAULT_PDF_OUTPUT_PATH,
+    output_title=DEFAULT_HTML_TITLE,
+    language=DEFAULT_LANGUAGE,
+    company_logo_img_path=None,
     customer_name=None,
     consultant_name=None,
-    customer_signature_field=None,
-    consultant_signature_field=None,
+    customer_signature_field=False,
+    consultant_signature_field=False,
+    defer_pdf=False,
 ):
-    company_logo_base64 = None
-    if company_logo:
-        with open(company_logo, "rb") as logo_fp:
-            company_logo_base64 = "data:image/png;base64," + base64.encodebytes(
-                logo_fp.read()
-            ).decode("utf-8")
+    """Writes the JSON, HTML and PDF outputs asked for of a time entries dictionary, as returned by get_time_entries().
+    With defer_pdf, the PDF output is not rendered but its (html_content, pdf_output_path) payload returned, for render_pdfs().
+    """
+    # JSON output
+    if as_json:
+        json_output_path = json_output_path or DEFAULT_JSON_OUTPUT_PATH
+        with open(json_output_path, "w") as fp:
+            fp.write(json.dumps(time_entries, indent=DEFAULT_JSON_INDENTS))
+        print("Wrote", json_output_path)
 
-    if not language:
-        language = DEFAULT_LANGUAGE
+    if company_logo_img_path:
+        if not os.path.exists(company_logo_img_path):
+            print("Provided company logo file does not exist.")
+            exit(1)
 
-    def jinja_render_date_str_with_babel(a_date, format="full"):
-        date = dateutil.parser.parse(a_date) if a_date else None
-        return format_date(date, format=format, locale=language)
+    # Console and JSON only outputs need no templating
+    if not (as_html or as_pdf):
+        return None
 
-    environment = Environment(
-        loader=FileSystemLoader(DEFAULT_HTML_JINJA_TEMPLATE_DIRECTORY),
-        extensions=["jinja2.ext.i18n"],
+    html_content = render_time_entries_html(
+        time_entries,
+        title=output_title,
+        language=language,
+        company_logo=company_logo_img_path,
+        customer_name=customer_name,
+        consultant_name=consultant_name,
+        customer_signature_field=customer_signature_field,
+        consultant_signature_field=consultant_signature_field,
     )
-    translations = gettext.translation(
-        "messages",
-        os.path.abspath(os.path.join(os.path.dirname(__file__), "locale")),
-        languages=[language],
+
+    # HTML output
+    if as_html:
+        html_output_path = html_output_path or DEFAULT_HTML_OUTPUT_PATH
+        with open(html_output_path, "w") as fp:
+            fp.write(html_content)
+        print("Wrote", html_output_path)
+
+    # PDF output
+    if as_pdf:
+        pdf_output_path = pdf_output_path or DEFAULT_PDF_OUTPUT_PATH
+        if defer_pdf:
+            return html_content, pdf_output_path
+        render_pdf(html_content=html_content, pdf_output_path=pdf_output_path)
+        print("Wrote", pdf_output_path)
+
+
+def user_output_path(output_path, user):
+    """Returns the output path of a user's report, such as "report-123.pdf" for "report.pdf"."""
+    root, extension = os.path.splitext(output_path)
+    return "{}-{}{}".format(root, user["id"], extension)
+
+
+def write_user_report_outputs(
+    time_entries,
+    as_json=False,
+    json_output_path=DEFAULT_JSON_OUTPUT_PATH,
+    as_html=False,
+    html_output_path=DEFAULT_HTML_OUTPUT_PATH,
+    as_pdf=False,
+    pdf_output_path=DEFAULT_PDF_OUTPUT_PATH,
+    consultant_name=None,
+    **output_options,
+):
+    """Writes the outputs asked for of each user's report of a time entries dictionary by user, see write_report_outputs(), next to the whole report's outputs.
+    Each user is the consultant of their report, unless consultant_name is given.
+    """
+    for user in time_entries.get("users", []):
+        write_report_outputs(
+            user,
+            as_json=as_json,
+            json_output_path=user_output_path(
+                json_output_path or DEFAULT_JSON_OUTPUT_PATH, user
+            ),
+            as_html=as_html,
+            html_output_path=user_output_path(
+                html_output_path or DEFAULT_HTML_OUTPUT_PATH, user
+            ),
+            as_pdf=as_pdf,
+            pdf_output_path=user_output_path(
+                pdf_output_path or DEFAULT_PDF_OUTPUT_PATH, user
+            ),
+            consultant_name=consultant_name or user["username"],
+            **output_options,
+        )
+
+
+def language_locale(language):
+    """Returns the locale of a --language option value, "english" or "french"."""
+    return (
+        "fr_FR"
+        if language == "french"
+        else ("en_US" if language == "english" else "en_US")
     )
-    environment.install_gettext_translations(translations)
 
-    if not title:
-        title = gettext.gettext(DEFAULT_HTML_TITLE)
 
-    template = environment.get_template(DEFAULT_HTML_JINJA_TEMPLATE)
-    template.globals["str_to_date"] = jinja_render_date_str_with_babel
-    content = template.render(
-        {
-            "document_title": title,
-            "html_lang": ("fr" if language.startswith("fr") else "en"),
-            "customer_name": customer_name,
-            "consultant_name": consultant_name,
-            "time_entries": time_entries,
-            "base64_company_logo": company_logo_base64,
-            "customer_signature_field": customer_signature_field,
-            "consultant_signature_field": consultant_signature_field,
-        },
-        presentational_hints=True,
+def load_batch_manifest(manifest_path):
+    """Returns the report specs of a JSON or YAML (.yaml or .yml) batch manifest, each merged into the manifest's defaults.
+    A manifest is an object with optional "defaults" and a list of "reports", setting BATCH_REPORT_KEYS options.
+    Outputs without a path are numbered after their report, such as "time-entries-2.pdf" for the second one.
+    """
+    with open(manifest_path, "r") as fp:
+        if manifest_path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ModuleNotFoundError:
+                print("YAML batch manifests require the Python PyYAML module.")
+                exit(1)
+            manifest = yaml.safe_load(fp)
+        else:
+            manifest = json.load(fp)
+
+    specs = [
+        dict(manifest.get("defaults") or {}, **report)
+        for report in manifest.get("reports") or []
+    ]
+    for spec in specs:
+        unknown_keys = spec.keys() - BATCH_REPORT_KEYS
+        if unknown_keys:
+            print(
+                "Unknown batch report keys {}, expected some of: {}".format(
+                    sorted(unknown_keys), sorted(BATCH_REPORT_KEYS)
+                )
+            )
+            exit(1)
+        unknown_fields = (spec.get("filters") or {}).keys() - set(TASK_FILTER_FIELDS)
+        if unknown_fields:
+            print(
+                "Unknown batch report filters {}, expected some of: {}".format(
+                    sorted(unknown_fields), TASK_FILTER_FIELDS
+                )
+            )
+            exit(1)
+        if spec.get("company_logo_img_path") and not os.path.exists(
+            spec["company_logo_img_path"]
+        ):
+            print(
+                "Provided company logo file does not exist:",
+                spec["company_logo_img_path"],
+            )
+            exit(1)
+
+    # Reports without output paths are numbered rather than all writing the default ones
+    output_paths = {}
+    for index, spec in enumerate(specs, 1):
+        for output, output_path_key, default_output_path in (
+            ("as_json", "json_output_path", DEFAULT_JSON_OUTPUT_PATH),
+            ("as_html", "html_output_path", DEFAULT_HTML_OUTPUT_PATH),
+            ("as_pdf", "pdf_output_path", DEFAULT_PDF_OUTPUT_PATH),
+        ):
+            if not spec.get(output):
+                continue
+            if not spec.get(output_path_key) and len(specs) > 1:
+                root, extension = os.path.splitext(default_output_path)
+                spec[output_path_key] = "{}-{}{}".format(root, index, extension)
+            output_path = spec.get(output_path_key) or default_output_path
+            if output_path in output_paths:
+                print(
+                    "Batch reports {} and {} both write {}".format(
+                        output_paths[output_path], index, output_path
+                    )
+                )
+                exit(1)
+            output_paths[output_path] = index
+    return specs
+
+
+def task_matches_filters(task, filters):
+    """Tells whether task information matches all filters, a {field: value or list of values} dictionary of TASK_FILTER_FIELDS, compared to the field's id or name."""
+    for field, values in (filters or {}).items():
+        if not isinstance(values, list):
+            values = [values]
+        item = task if field == "task" else task.get(field) or {}
+        if not {str(item.get("id")), item.get("name")} & {str(v) for v in values}:
+            return False
+    return True
+
+
+def batch(
+    manifest_path,
+    click_up_token=CLICKUP_PK,
+    click_up_team_id=CLICKUP_TEAM_ID,
+    time_zone=DEFAULT_TIMEZONE,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache_path=None,
+    task_cache_ttl=DEFAULT_TASK_CACHE_TTL,
+    bypass_task_cache=False,
+    sync=False,
+    time_entry_store_path=None,
+    sync_overlap_days=DEFAULT_SYNC_OVERLAP_DAYS,
+    chunk_months=DEFAULT_CHUNK_MONTHS,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    render_processes=None,
+    profile=False,
+    profile_output_path=None,
+    cprofile_output_path=None,
+):
+    """Generates every report of a batch manifest (see load_batch_manifest()) in one run.
+    Time entries of all reports' date ranges are fetched and their tasks resolved once, then partitioned by report dates and filters.
+    PDF outputs are rendered by render_processes processes in parallel, defaulting to one per CPU, see render_pdfs().
+    With profile, phases wall time, requests and cache hits of the run are summed up at its end, see main().
+    """
+    from dateutil import tz
+
+    cprofiler = start_profiling(profile, cprofile_output_path)
+
+    specs = load_batch_manifest(manifest_path)
+    if task_resolution not in TASK_RESOLUTIONS:
+        print("--task-resolution must be one of", TASK_RESOLUTIONS)
+        exit(1)
+
+    click_up_token = require_api_token(click_up_token)
+    get_click_up_client(
+        click_up_token, pool_size=max_concurrency, rate_limit=rate_limit
     )
-    return content
+    if not click_up_team_id:
+        click_up_team_id = guess_click_up_team_id(click_up_token)
 
+    # A single fetch covers all reports
+    current_tz = tz.gettz(time_zone)
+    date_ranges = [
+        time_entries_date_range(spec.get("from_date"), spec.get("to_date"), current_tz)
+        for spec in specs
+    ]
+    from_date_ts = min(date_range[2] for date_range in date_ranges)
+    to_date_ts = max(date_range[3] for date_range in date_ranges)
+    print(
+        "Gathering Click-Up time entries of {} reports from {} to {}".format(
+            len(specs),
+            min(date_range[0] for date_range in date_ranges),
+            max(date_range[1] for date_range in date_ranges),
+        )
+    )
+    fetch_options = {"chunk_months": chunk_months, "max_concurrency": max_concurrency}
+    if sync:
+        time_entry_store = TimeEntryStore(
+            time_entry_store_path or DEFAULT_TIME_ENTRY_STORE_PATH,
+            overlap_days=sync_overlap_days,
+        )
+        data = time_entry_store.sync(
+            click_up_token,
+            click_up_team_id,
+            from_date_ts,
+            to_date_ts,
+            current_tz=current_tz,
+            **fetch_options,
+        )
+        time_entry_store.close()
+    else:
+        data = fetch_time_entries_between(
+            click_up_token,
+            click_up_team_id,
+            from_date_ts,
+            to_date_ts,
+            current_tz=current_tz,
+            **fetch_options,
+        )
 
-def render_pdf(html_content, pdf_output_path=DEFAULT_PDF_OUTPUT_PATH):
-    try:
-        from weasyprint import HTML
-    except ModuleNotFoundError:
-        print(
-            "The --as-pdf and --pdf-output-path options required the Python weasyprint module to be installed."
+    task_cache = None
+    if not bypass_task_cache:
+        task_cache = TaskCache(
+            task_cache_path or DEFAULT_TASK_CACHE_PATH, ttl=task_cache_ttl
+        )
+        refresh_task_cache(task_cache, click_up_token, click_up_team_id)
+    tasks = {}
+    resolve_tasks(
+        data,
+        click_up_token,
+        click_up_team_id,
+        task_resolution=task_resolution,
+        max_concurrency=max_concurrency,
+        task_cache=task_cache,
+        tasks=tasks,
+    )
+    if task_cache is not None:
+        task_cache.close()
+
+    # Each report adds up durations into its own copies of the tasks it refers to
+    reports = []
+    for spec, (_, _, report_from_ts, report_to_ts) in zip(specs, date_ranges):
+        report_data = [
+            d
+            for d in data
+            if report_from_ts <= int(d["start"]) <= report_to_ts
+            and task_matches_filters(tasks[d["task"]["id"]], spec.get("filters"))
+        ]
+        context = ReportContext(
+            tasks={d["task"]["id"]: dict(tasks[d["task"]["id"]]) for d in report_data}
+        )
+        language = language_locale(spec.get("language"))
+        fill_report_views(
+            context, report_data, click_up_token, click_up_team_id, current_tz, language
+        )
+        outputs = {
+            key: value
+            for key, value in spec.items()
+            if key not in ("from_date", "to_date", "filters")
+        }
+        outputs["language"] = language
+        reports.append(
+            (
+                get_time_entries(spec.get("from_date"), spec.get("to_date"), context),
+                outputs,
+            )
         )
+
+    # JSON and HTML outputs are quick to write, PDF ones are rendered in parallel below
+    pdf_payloads = []
+    for time_entries, outputs in reports:
+        pdf_payload = write_report_outputs(time_entries, defer_pdf=True, **outputs)
+        if pdf_payload:
+            pdf_payloads.append(pdf_payload)
+    for pdf_output_path in render_pdfs(pdf_payloads, processes=render_processes):
+        print("Wrote", pdf_output_path)
+
+    stop_profiling(cprofiler, profile_output_path, cprofile_output_path)
+    return reports
+
+
+def report_server(
+    host=DEFAULT_SERVE_HOST,
+    port=DEFAULT_SERVE_PORT,
+    click_up_token=CLICKUP_PK,
+    click_up_team_id=CLICKUP_TEAM_ID,
+    time_zone=DEFAULT_TIMEZONE,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache_path=None,
+    task_cache_ttl=DEFAULT_TASK_CACHE_TTL,
+    task_cache_refresh_interval=DEFAULT_SERVE_TASK_CACHE_REFRESH_INTERVAL,
+    bypass_task_cache=False,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    company_logo_img_path=None,
+    render_processes=None,
+):
+    """Returns an HTTP server, not serving yet, of reports asked for by GET /report requests, see serve().
+    Its task_cache and pdf_executor attributes are to be closed and shut down once done serving.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import multiprocessing
+    from urllib.parse import parse_qs, urlsplit
+
+    if task_resolution not in TASK_RESOLUTIONS:
+        print("--task-resolution must be one of", TASK_RESOLUTIONS)
+        exit(1)
+    if company_logo_img_path and not os.path.exists(company_logo_img_path):
+        print("Provided company logo file does not exist.")
         exit(1)
 
-    HTML(string=html_content).write_pdf(pdf_output_path)
+    click_up_token = require_api_token(click_up_token)
+
+    # The client and its connections, created with grab_time_entries()' settings, are kept across requests
+    get_click_up_client(
+        click_up_token,
+        pool_size=max_concurrency,
+        timeout=DEFAULT_HTTP_TIMEOUT,
+        rate_limit=rate_limit,
+        max_retries=DEFAULT_MAX_RETRIES,
+    )
+    if not click_up_team_id:
+        click_up_team_id = guess_click_up_team_id(click_up_token)
+    # Requests share the task cache, checked for updated tasks once per refresh interval
+    task_cache = None
+    if not bypass_task_cache:
+        task_cache = TaskCache(
+            task_cache_path or DEFAULT_TASK_CACHE_PATH,
+            ttl=task_cache_ttl,
+            refresh_interval=task_cache_refresh_interval,
+        )
+
+    # Templates are compiled before the first request
+    get_html_renderer().environment(DEFAULT_LANGUAGE).get_template(
+        DEFAULT_HTML_JINJA_TEMPLATE
+    )
+    # Pool processes import WeasyPrint once, spawned rather than forked from this multi-threaded process
+    pdf_executor = None
+    if importlib.util.find_spec("weasyprint") is not None:
+        pdf_executor = ProcessPoolExecutor(
+            max_workers=render_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=pdf_renderer,
+        )
+
+    def report(
+        format,
+        from_date=None,
+        to_date=None,
+        language=None,
+        output_title=DEFAULT_HTML_TITLE,
+        customer_name=None,
+        consultant_name=None,
+        customer_signature_field=False,
+        consultant_signature_field=False,
+    ):
+        """Returns the report asked for by a request's parameters, in format."""
+        language = language_locale(language)
+
+        # Each request has its own report context, sharing the task cache
+        context = ReportContext(task_cache=task_cache)
+        grab_time_entries(
+            from_date=from_date,
+            to_date=to_date,
+            click_up_token=click_up_token,
+            click_up_team_id=click_up_team_id,
+            time_zone=time_zone,
+            language=language,
+            max_concurrency=max_concurrency,
+            task_cache=task_cache,
+            rate_limit=rate_limit,
+            task_resolution=task_resolution,
+            context=context,
+        )
+        time_entries = get_time_entries(from_date, to_date, context)
+        if format == "json":
+            return json.dumps(time_entries, indent=DEFAULT_JSON_INDENTS).encode("utf-8")
+
+        html_content = render_time_entries_html(
+            time_entries,
+            title=output_title,
+            language=language,
+            company_logo=company_logo_img_path,
+            customer_name=customer_name,
+            consultant_name=consultant_name,
+            customer_signature_field=customer_signature_field,
+            consultant_signature_field=consultant_signature_field,
+        )
+        if format == "html":
+            return html_content.encode("utf-8")
+        return pdf_executor.submit(render_pdf, html_content, None).result()
+
+    class ReportRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != "/report":
+                self.send_error(404)
+                return
+            parameters = {
+                name: values[-1] for name, values in parse_qs(url.query).items()
+            }
+            unknown_parameters = parameters.keys() - SERVE_REPORT_PARAMETERS
+            if unknown_parameters:
+                self.send_error(
+                    400, "Unknown parameters: " + ", ".join(sorted(unknown_parameters))
+                )
+                return
+            for name in ("customer_signature_field", "consultant_signature_field"):
+                if name in parameters:
+                    parameters[name] = parameters[name].lower() in ("1", "true", "yes")
+            format = parameters.pop("format", "json")
+            if format not in SERVE_FORMATS:
+                self.send_error(
+                    400, "format must be one of " + ", ".join(SERVE_FORMATS)
+                )
+                return
+            if format == "pdf" and pdf_executor is None:
+                self.send_error(501, "PDF reports require the weasyprint module")
+                return
+
+            try:
+                content = report(format, **parameters)
+            except SystemExit:
+                # Failures are printed before exiting, as on the command line
+                self.send_error(502, "Report failed, see the server's output")
+                return
+            except Exception as e:
+                self.send_error(500, "Report failed: {}".format(e))
+                raise
+            self.send_response(200)
+            self.send_header("Content-Type", SERVE_FORMATS[format])
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    server.daemon_threads = True
+    server.task_cache = task_cache
+    server.pdf_executor = pdf_executor
+    return server
+
+
+def serve(
+    host=DEFAULT_SERVE_HOST,
+    port=DEFAULT_SERVE_PORT,
+    click_up_token=CLICKUP_PK,
+    click_up_team_id=CLICKUP_TEAM_ID,
+    time_zone=DEFAULT_TIMEZONE,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache_path=None,
+    task_cache_ttl=DEFAULT_TASK_CACHE_TTL,
+    task_cache_refresh_interval=DEFAULT_SERVE_TASK_CACHE_REFRESH_INTERVAL,
+    bypass_task_cache=False,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    company_logo_img_path=None,
+    render_processes=None,
+):
+    """Serves reports over a local HTTP API until interrupted, such as GET /report?from_date=2023-01-01&to_date=2023-01-31&format=pdf.
+    Requests take main()'s SERVE_REPORT_PARAMETERS as query string parameters, with format one of SERVE_FORMATS (default: json), and are served concurrently.
+    The Click-Up client and its connections, the task cache, compiled templates and WeasyPrint's pool of render_processes processes stay warm across requests.
+    """
+    server = report_server(
+        host=host,
+        port=port,
+        click_up_token=click_up_token,
+        click_up_team_id=click_up_team_id,
+        time_zone=time_zone,
+        max_concurrency=max_concurrency,
+        task_cache_path=task_cache_path,
+        task_cache_ttl=task_cache_ttl,
+        task_cache_refresh_interval=task_cache_refresh_interval,
+        bypass_task_cache=bypass_task_cache,
+        rate_limit=rate_limit,
+        task_resolution=task_resolution,
+        company_logo_img_path=company_logo_img_path,
+        render_processes=render_processes,
+    )
+    print("Serving reports on http://{}:{}/report".format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if server.pdf_executor is not None:
+            server.pdf_executor.shutdown()
+        if server.task_cache is not None:
+            server.task_cache.close()
 
 
 def main(
@@ -403,6 +3434,10 @@ def main(
     json_input_path=None,
     as_json=False,
     json_output_path=DEFAULT_JSON_OUTPUT_PATH,
+    from_snapshot=False,
+    snapshot_input_path=None,
+    as_snapshot=False,
+    snapshot_output_path=DEFAULT_SNAPSHOT_OUTPUT_PATH,
     as_html=False,
     html_output_path=DEFAULT_HTML_OUTPUT_PATH,
     as_pdf=False,
@@ -414,15 +3449,50 @@ def main(
     consultant_name=None,
     customer_signature_field=False,
     consultant_signature_field=False,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    task_cache_path=None,
+    task_cache_ttl=DEFAULT_TASK_CACHE_TTL,
+    bypass_task_cache=False,
+    clear_task_cache=False,
+    sync=False,
+    time_entry_store_path=None,
+    sync_overlap_days=DEFAULT_SYNC_OVERLAP_DAYS,
+    chunk_months=DEFAULT_CHUNK_MONTHS,
+    resumable_fetch=False,
+    http_pool_size=None,
+    http_timeout=DEFAULT_HTTP_TIMEOUT,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    max_retries=DEFAULT_MAX_RETRIES,
+    task_resolution=DEFAULT_TASK_RESOLUTION,
+    engine=DEFAULT_ENGINE,
+    stream=False,
+    by_user=False,
+    group_by=None,
+    offline=False,
+    profile=False,
+    profile_output_path=None,
+    cprofile_output_path=None,
 ):
-    language = (
-        "fr_FR"
-        if language == "french"
-        else ("en_US" if language == "english" else "en_US")
-    )
+    # Phases wall time, requests and cache hits of this run, see --profile
+    cprofiler = start_profiling(profile, cprofile_output_path)
+
+    language = language_locale(language)
 
     print("Language:", language)
 
+    # Groupings such as --group-by="folder>list>task,month>week>day", each with subtotals at every level
+    groupings = split_group_by(group_by) if group_by else []
+    for grouping in groupings:
+        if not set(grouping) <= GROUP_BY_DIMENSIONS.keys():
+            print("--group-by dimensions must be among", tuple(GROUP_BY_DIMENSIONS))
+            exit(1)
+    # JSON outputs and snapshots keep no per-user time entries
+    if by_user and (from_json or from_snapshot or as_snapshot):
+        print(
+            "--by-user cannot be combined with --from-json, --from-snapshot or --as-snapshot"
+        )
+        exit(1)
+
     # The from_json and json_input_path options allow reusing a JSON file already output with the as_json+json_output_path options pair
     # This provides a manual form of caching
     if from_json:
@@ -439,59 +3509,191 @@ def main(
                         JSON_REQUIRED_KEYS,
                     )
                     exit(1)
-    else:
-        # Grab time entries from Click-Up's online API
-        grab_time_entries(
+        if as_snapshot or groupings:
+            print(
+                "--as-snapshot and --group-by need raw time entries, from Click-Up or --from-snapshot"
+            )
+            exit(1)
+    # The from_snapshot and snapshot_input_path options allow making reports offline from a snapshot already output with the as_snapshot+snapshot_output_path options pair
+    # Unlike JSON outputs, snapshots keep raw time entries, so that reports over any of their dates can be made
+    elif from_snapshot:
+        if not snapshot_input_path:
+            print("You must use --snapshot-input-path with --from-snapshot")
+            exit(1)
+        # Snapshots keep neither the users of time entries nor the tags of tasks
+        if any(set(grouping) & SNAPSHOT_MISSING_DIMENSIONS for grouping in groupings):
+            print(
+                "--group-by cannot use {} dimensions with --from-snapshot".format(
+                    " or ".join(sorted(SNAPSHOT_MISSING_DIMENSIONS))
+                )
+            )
+            exit(1)
+        print("Using", snapshot_input_path)
+        try:
+            snapshot = Snapshot(snapshot_input_path)
+        except ValueError as e:
+            print(e)
+            exit(1)
+        context = ReportContext()
+        columns = report_from_snapshot(
+            snapshot,
             from_date=from_date,
             to_date=to_date,
-            click_up_token=click_up_token,
-            click_up_team_id=click_up_team_id,
             time_zone=time_zone,
             language=language,
+            context=context,
         )
+        snapshot_metadata = dict(snapshot.metadata)
+        if from_date or to_date:
+            snapshot_metadata.update(from_date=from_date, to_date=to_date)
+        time_entries = get_time_entries(from_date, to_date, context)
+    else:
+        if task_resolution not in TASK_RESOLUTIONS:
+            print("--task-resolution must be one of", TASK_RESOLUTIONS)
+            exit(1)
+        if engine not in ENGINES:
+            print("--engine must be one of", ENGINES)
+            exit(1)
+        if stream and (sync or resumable_fetch or engine == "async"):
+            print(
+                "--stream cannot be combined with --sync, --resumable-fetch or --engine=async"
+            )
+            exit(1)
+        if offline and not sync:
+            print("--offline needs the time entry store of --sync")
+            exit(1)
+        # The store and the chunk journal only keep the token owner's time entries
+        if by_user and (sync or resumable_fetch or engine == "async"):
+            print(
+                "--by-user cannot be combined with --sync, --resumable-fetch or --engine=async"
+            )
+            exit(1)
+        # Several teams, such as --click-up-team-id=123,456 or "all", are grabbed concurrently into one report
+        team_ids = split_click_up_team_ids(click_up_team_id or "")
+        several_teams = len(team_ids) > 1 or team_ids == ["all"]
+        if several_teams and offline:
+            print("--offline reports are made of one team only")
+            exit(1)
+
+        # Tasks information is cached on disk across runs, unless bypassed
+        task_cache = None
+        if not bypass_task_cache:
+            task_cache = TaskCache(
+                task_cache_path or DEFAULT_TASK_CACHE_PATH, ttl=task_cache_ttl
+            )
+            if clear_task_cache:
+                task_cache.clear()
+                print("Cleared task cache", task_cache.path)
+
+        # Time entries can be synced incrementally into a local store instead of being fully fetched
+        time_entry_store = None
+        if sync:
+            time_entry_store = TimeEntryStore(
+                time_entry_store_path or DEFAULT_TIME_ENTRY_STORE_PATH,
+                overlap_days=sync_overlap_days,
+            )
+
+        # This report's own views, not mixed with other reports of this process
+        context = ReportContext(task_cache=task_cache)
+
+        if offline:
+            # Report from the time entries already synced into the store, without touching Click-Up's API
+            columns = report_from_time_entry_store(
+                time_entry_store,
+                click_up_team_id=click_up_team_id,
+                from_date=from_date,
+                to_date=to_date,
+                time_zone=time_zone,
+                language=language,
+                task_cache=task_cache,
+                context=context,
+            )
+        else:
+            # Grab time entries from Click-Up's online API
+            grab = grab_teams_time_entries if several_teams else grab_time_entries
+            columns = grab(
+                from_date=from_date,
+                to_date=to_date,
+                click_up_token=click_up_token,
+                click_up_team_id=(
+                    ",".join(team_ids) if several_teams else click_up_team_id
+                ),
+                time_zone=time_zone,
+                language=language,
+                max_concurrency=max_concurrency,
+                task_cache=task_cache,
+                time_entry_store=time_entry_store,
+                chunk_months=chunk_months,
+                chunk_journal_directory=(
+                    DEFAULT_CHUNK_JOURNAL_DIRECTORY if resumable_fetch else None
+                ),
+                http_pool_size=http_pool_size,
+                http_timeout=http_timeout,
+                rate_limit=rate_limit,
+                max_retries=max_retries,
+                task_resolution=task_resolution,
+                engine=engine,
+                stream=stream,
+                by_user=by_user,
+                context=context,
+            )
+        if task_cache is not None:
+            task_cache.close()
+        if time_entry_store is not None:
+            time_entry_store.close()
+
+        snapshot_metadata = {
+            "team_id": ",".join(context.teams) or click_up_team_id or None,
+            "from_date": from_date,
+            "to_date": to_date,
+        }
 
         # Make a nice consolidated dictionary ready for all forms of template rendering
-        time_entries = get_time_entries(from_date, to_date)
+        time_entries = get_time_entries(from_date, to_date, context)
 
-    # JSON output
-    if as_json:
-        json_output_path = json_output_path or DEFAULT_JSON_OUTPUT_PATH
-        with open(json_output_path, "w") as fp:
-            fp.write(json.dumps(time_entries, indent=DEFAULT_JSON_INDENTS))
-        print("Wrote", json_output_path)
+    # All groupings are computed in one pass over the raw time entries
+    if groupings:
+        time_entries["groups"] = get_time_entry_groups(columns, groupings, context)
+
+    # Raw time entries and their tasks, for later reports made offline with --from-snapshot
+    if as_snapshot:
+        write_snapshot(
+            snapshot_output_path, columns, context.tasks, **snapshot_metadata
+        )
+        print("Wrote", snapshot_output_path)
 
     # CLI standard output
     print_time_entries(time_entries)
 
-    if company_logo_img_path:
-        if not os.path.exists(company_logo_img_path):
-            print("Provided company logo file does not exist.")
-            exit(1)
-
-    html_content = render_time_entries_html(
-        time_entries,
-        title=output_title,
-        language=language,
-        company_logo=company_logo_img_path,
-        customer_name=customer_name,
-        consultant_name=consultant_name,
-        customer_signature_field=customer_signature_field,
-        consultant_signature_field=consultant_signature_field,
-    )
-
-    # HTML output
-    if as_html:
-        html_output_path = html_output_path or DEFAULT_HTML_OUTPUT_PATH
-        with open(html_output_path, "w") as fp:
-            fp.write(html_content)
-        print("Wrote", html_output_path)
+    output_options = {
+        "as_json": as_json,
+        "json_output_path": json_output_path,
+        "as_html": as_html,
+        "html_output_path": html_output_path,
+        "as_pdf": as_pdf,
+        "pdf_output_path": pdf_output_path,
+        "output_title": output_title,
+        "language": language,
+        "company_logo_img_path": company_logo_img_path,
+        "customer_name": customer_name,
+        "consultant_name": consultant_name,
+        "customer_signature_field": customer_signature_field,
+        "consultant_signature_field": consultant_signature_field,
+    }
+    write_report_outputs(time_entries, **output_options)
+    # One report per consultant, along with the whole team's
+    write_user_report_outputs(time_entries, **output_options)
 
-    # PDF output
-    if as_pdf:
-        pdf_output_path = pdf_output_path or DEFAULT_PDF_OUTPUT_PATH
-        render_pdf(html_content=html_content, pdf_output_path=pdf_output_path)
-        print("Wrote", pdf_output_path)
+    stop_profiling(cprofiler, profile_output_path, cprofile_output_path)
 
 
 if __name__ == "__main__":
-    fire.Fire(main)
+    import fire
+
+    # python click_up_timesheeting.py batch <manifest path> [--option=value...]
+    # python click_up_timesheeting.py serve [--option=value...]
+    subcommands = {"batch": batch, "serve": serve}
+    if sys.argv[1:2] and sys.argv[1] in subcommands:
+        fire.Fire(subcommands[sys.argv[1]], command=sys.argv[2:])
+    else:
+        fire.Fire(main)
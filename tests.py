@@ -1,12 +1,18 @@
 # builtin modules
 import builtins
-from copy import copy
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
+from datetime import datetime
 import json
 import os
 import os.path
 from pathlib import Path
 import subprocess
 import sys
+import threading
+import time
+import urllib.error
+import urllib.request
 import uuid
 
 # third-party modules
@@ -33,6 +39,7 @@ DEFAULT_CONSULTANT_NAME = "Mrs Ba Consultant"
 DEFAULT_TEAM_API_URL = "https://api.clickup.com/api/v2/team"
 DEFAULT_TIME_ENTRIES_API_URL = "https://api.clickup.com/api/v2/team/{}/time_entries"
 DEFAULT_TASK_API_URL = "https://api.clickup.com/api/v2/task/{}"
+DEFAULT_TEAM_TASKS_API_URL = "https://api.clickup.com/api/v2/team/{}/task"
 DEFAULT_TEAM_ID = "1234"
 DEFAULT_CLICKUP_TOKEN = "anytoken"
 DEFAULT_INPUT_JSON_PATH = "examples/example1.json"
@@ -213,6 +220,44 @@ DEFAULT_USER_TEAMS_MULTIPLE_JSON = {
 }
 
 
+@pytest.fixture(autouse=True)
+def temporary_task_cache_path(monkeypatch, tmp_path):
+    """Keeps the persistent task cache out of the user's cache directory."""
+    task_cache_path = str(tmp_path / "tasks.sqlite3")
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".DEFAULT_TASK_CACHE_PATH", task_cache_path)
+    return task_cache_path
+
+
+@pytest.fixture(autouse=True)
+def temporary_time_entry_store_path(monkeypatch, tmp_path):
+    """Keeps the local time entry store out of the user's cache directory."""
+    time_entry_store_path = str(tmp_path / "time_entries.sqlite3")
+    monkeypatch.setattr(
+        MODULE_UNDER_TEST + ".DEFAULT_TIME_ENTRY_STORE_PATH", time_entry_store_path
+    )
+    return time_entry_store_path
+
+
+@pytest.fixture(autouse=True)
+def fresh_click_up_clients(monkeypatch):
+    """Gives each test its own Click-Up API clients, with untouched rate limiters."""
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".CLICKUP_CLIENTS", {})
+
+
+@pytest.fixture(autouse=True)
+def temporary_template_cache_directory(monkeypatch, tmp_path):
+    """Keeps compiled templates out of the user's cache directory.
+    Each test also gets its own HTML renderers.
+    """
+    template_cache_directory = str(tmp_path / "templates")
+    monkeypatch.setattr(
+        MODULE_UNDER_TEST + ".DEFAULT_TEMPLATE_CACHE_DIRECTORY",
+        template_cache_directory,
+    )
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".HTML_RENDERERS", {})
+    return template_cache_directory
+
+
 def get_output_filename_from_locals(input_vars, output_format, for_cli=False):
     if "requests_mock" in input_vars:
         del input_vars["requests_mock"]
@@ -237,6 +282,227 @@ def test_fetch_task_general_data(requests_mock):
     assert result["id"] == DEFAULT_TASK_ID
 
 
+@pytest.mark.parametrize("max_concurrency", [1, 4])
+def test_fetch_tasks_general_data(monkeypatch, requests_mock, max_concurrency):
+    task_ids = ["abc1", "abc2", "abc3", "abc2"]
+    for task_id in task_ids:
+        requests_mock.get(
+            DEFAULT_TASK_API_URL.format(task_id),
+            json=dict(DEFAULT_TASK_JSON, id=task_id, name="Task " + task_id),
+        )
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+
+    result = click_up_timesheeting.fetch_tasks_general_data(
+        task_ids, DEFAULT_CLICKUP_TOKEN, max_concurrency=max_concurrency
+    )
+    assert list(result) == ["abc1", "abc2", "abc3"]
+    assert [task["name"] for task in result.values()] == [
+        "Task abc1",
+        "Task abc2",
+        "Task abc3",
+    ]
+    assert requests_mock.call_count == 3
+
+
+def test_fill_report_views_task_order(monkeypatch):
+    task_ids = ["task{}".format(i) for i in range(6)]
+    entries = [
+        dict(DEFAULT_TIME_ENTRIES_JSON["data"][0], id=str(i), task={"id": task_id})
+        for i, task_id in enumerate(task_ids)
+    ]
+
+    # Tasks of earlier time entries are slower to fetch
+    def fetch_task_general_data(
+        task_id, click_up_token, click_up_team_id=None, task_cache=None, tasks=None
+    ):
+        if task_id not in tasks:
+            time.sleep(0.01 * (len(task_ids) - task_ids.index(task_id)))
+            tasks[task_id] = {"id": task_id, "name": "Task " + task_id}
+        return tasks[task_id]
+
+    monkeypatch.setattr(
+        MODULE_UNDER_TEST + ".fetch_task_general_data", fetch_task_general_data
+    )
+    rows = {}
+    for max_concurrency in (1, 8):
+        context = click_up_timesheeting.ReportContext()
+        click_up_timesheeting.fill_report_views(
+            context,
+            entries,
+            DEFAULT_CLICKUP_TOKEN,
+            DEFAULT_TEAM_ID,
+            tz.gettz(click_up_timesheeting.DEFAULT_TIMEZONE),
+            task_resolution="per-task",
+            max_concurrency=max_concurrency,
+        )
+        time_entries = click_up_timesheeting.get_time_entries(None, None, context)
+        rows[max_concurrency] = [task["name"] for task in time_entries["tasks"]]
+
+    # Rows follow the first time entry of each task, however fast it was fetched
+    assert rows[8] == rows[1] == ["Task " + task_id for task_id in task_ids]
+
+
+def test_resolve_tasks_in_bulk(monkeypatch, requests_mock):
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+    entries = [
+        dict(
+            DEFAULT_TIME_ENTRIES_JSON["data"][0],
+            id=str(i),
+            task={"id": task_id},
+        )
+        for i, task_id in enumerate(["listed1", "listed2", "archived", "listed1"])
+    ]
+    requests_mock.get(
+        DEFAULT_TEAM_TASKS_API_URL.format(DEFAULT_TEAM_ID),
+        json={
+            "tasks": [
+                dict(DEFAULT_TASK_JSON, id="other"),
+                dict(DEFAULT_TASK_JSON, id="listed2", name="Listed 2"),
+                dict(DEFAULT_TASK_JSON, id="listed1", name="Listed 1"),
+            ],
+            "last_page": True,
+        },
+    )
+    requests_mock.get(
+        DEFAULT_TASK_API_URL.format("archived"),
+        json=dict(DEFAULT_TASK_JSON, id="archived", name="Archived"),
+    )
+
+    result = click_up_timesheeting.resolve_tasks(
+        entries, DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID, task_resolution="bulk"
+    )
+    assert [task["name"] for task in result.values()] == [
+        "Listed 1",
+        "Listed 2",
+        "Archived",
+    ]
+    assert "other" not in click_up_timesheeting.TASKS
+    # The tasks view follows the time entries, not the listing
+    assert list(click_up_timesheeting.TASKS) == ["listed1", "listed2", "archived"]
+    assert requests_mock.call_count == 2
+    assert requests_mock.request_history[0].qs["list_ids[]"] == ["1560300071"]
+
+
+def test_resolve_tasks_lean(monkeypatch, requests_mock):
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+    entry = DEFAULT_TIME_ENTRIES_JSON["data"][0]
+    entries = [
+        dict(entry, id="3", task={"id": "nolocation"}, task_location={}),
+        entry,
+        dict(entry, id="2", task={"id": DEFAULT_TASK_ID, "name": "woof"}),
+    ]
+    requests_mock.get(
+        DEFAULT_TASK_API_URL.format("nolocation"),
+        json=dict(DEFAULT_TASK_JSON, id="nolocation", name="Fetched"),
+    )
+
+    result = click_up_timesheeting.resolve_tasks(
+        entries, DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID, task_resolution="lean"
+    )
+    assert requests_mock.call_count == 1
+    assert result["nolocation"]["name"] == "Fetched"
+    lean_task = result[DEFAULT_TASK_ID]
+    assert lean_task["name"] == "woof"
+    assert lean_task["list"]["name"] == "List"
+    assert lean_task["folder"]["name"] == lean_task["project"]["name"] == "Folder"
+    # The fetched task keeps the place of its first time entry
+    assert list(click_up_timesheeting.TASKS) == ["nolocation", DEFAULT_TASK_ID]
+
+
+def test_task_cache(temporary_task_cache_path):
+    task_cache = click_up_timesheeting.TaskCache(temporary_task_cache_path)
+    assert task_cache.get(DEFAULT_TEAM_ID, DEFAULT_TASK_ID) is None
+
+    task_cache.set(DEFAULT_TEAM_ID, DEFAULT_TASK_ID, DEFAULT_TASK_JSON)
+    assert task_cache.get(DEFAULT_TEAM_ID, DEFAULT_TASK_ID) == DEFAULT_TASK_JSON
+    assert task_cache.get("other team", DEFAULT_TASK_ID) is None
+    task_cache.close()
+
+    # Persisted across instances, until expired or cleared
+    task_cache = click_up_timesheeting.TaskCache(temporary_task_cache_path)
+    assert task_cache.get(DEFAULT_TEAM_ID, DEFAULT_TASK_ID) == DEFAULT_TASK_JSON
+    assert (task_cache.hits, task_cache.misses) == (1, 0)
+    task_cache.ttl = -1
+    assert task_cache.get(DEFAULT_TEAM_ID, DEFAULT_TASK_ID) is None
+    task_cache.ttl = click_up_timesheeting.DEFAULT_TASK_CACHE_TTL
+    task_cache.clear()
+    assert task_cache.get(DEFAULT_TEAM_ID, DEFAULT_TASK_ID) is None
+    task_cache.close()
+
+
+def test_task_cache_concurrent_lookups(temporary_task_cache_path):
+    task_cache = click_up_timesheeting.TaskCache(temporary_task_cache_path)
+    task_cache.set(DEFAULT_TEAM_ID, DEFAULT_TASK_ID, DEFAULT_TASK_JSON)
+    task_ids = [DEFAULT_TASK_ID, "missing"] * 500
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                lambda task_id: task_cache.get(DEFAULT_TEAM_ID, task_id), task_ids
+            )
+        )
+    # No lookup is lost to another thread's count
+    assert (task_cache.hits, task_cache.misses) == (500, 500)
+    task_cache.close()
+
+
+def test_task_cache_refresh_updated_tasks(requests_mock, temporary_task_cache_path):
+    requests_mock.get(
+        DEFAULT_TEAM_TASKS_API_URL.format(DEFAULT_TEAM_ID),
+        json={
+            "tasks": [
+                {"id": "updated", "date_updated": "2000"},
+                {"id": "unchanged", "date_updated": "1000"},
+            ],
+            "last_page": True,
+        },
+    )
+    task_cache = click_up_timesheeting.TaskCache(temporary_task_cache_path)
+    for task_id in ("updated", "unchanged"):
+        task_cache.set(
+            DEFAULT_TEAM_ID, task_id, {"id": task_id, "date_updated": "1000"}
+        )
+
+    # The first refresh only records the refresh time
+    assert task_cache.refresh_updated_tasks(DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID) == 0
+    assert not requests_mock.called
+
+    # A failed listing is not taken for "no updates", nor recorded as a refresh
+    with req_mock.Mocker() as failing_mock:
+        failing_mock.get(
+            DEFAULT_TEAM_TASKS_API_URL.format(DEFAULT_TEAM_ID),
+            status_code=403,
+            json={"err": "Forbidden"},
+        )
+        with pytest.raises(SystemExit):
+            task_cache.refresh_updated_tasks(DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID)
+        failed_updated_gt = failing_mock.last_request.qs["date_updated_gt"]
+
+    assert task_cache.refresh_updated_tasks(DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID) == 1
+    assert requests_mock.last_request.qs["date_updated_gt"] == failed_updated_gt
+    assert task_cache.get(DEFAULT_TEAM_ID, "updated") is None
+    assert task_cache.get(DEFAULT_TEAM_ID, "unchanged")["id"] == "unchanged"
+    task_cache.close()
+
+
+def test_fetch_task_general_data_from_task_cache(
+    monkeypatch, requests_mock, temporary_task_cache_path
+):
+    setup_requests_mock(requests_mock, task=True)
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+    task_cache = click_up_timesheeting.TaskCache(temporary_task_cache_path)
+
+    click_up_timesheeting.fetch_task_general_data(
+        DEFAULT_TASK_ID, DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID, task_cache
+    )
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+    result = click_up_timesheeting.fetch_task_general_data(
+        DEFAULT_TASK_ID, DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID, task_cache
+    )
+    assert result["name"] == DEFAULT_TASK_NAME
+    assert requests_mock.call_count == 1
+    task_cache.close()
+
+
 def test_fetch_time_entries(requests_mock):
     setup_requests_mock(requests_mock, entries=True)
 
@@ -252,6 +518,1071 @@ def test_fetch_time_entries(requests_mock):
     assert result[0]["id"] == "1963465985517105840"
 
 
+def test_time_entries_chunks():
+    paris_tz = tz.gettz("Europe/Paris")
+    from_date_ts = int(datetime(2022, 11, 15, tzinfo=paris_tz).timestamp() * 1000)
+    to_date_ts = int(datetime(2023, 2, 10, tzinfo=paris_tz).timestamp() * 1000)
+    chunks = click_up_timesheeting.time_entries_chunks(
+        from_date_ts, to_date_ts, 1, paris_tz
+    )
+    assert [
+        datetime.fromtimestamp(chunk_from_ts / 1000, tz=paris_tz).date().isoformat()
+        for chunk_from_ts, _ in chunks
+    ] == ["2022-11-15", "2022-12-01", "2023-01-01", "2023-02-01"]
+    assert chunks[0][0] == from_date_ts and chunks[-1][1] == to_date_ts
+    assert all(
+        chunk[1] + 1 == next_chunk[0] for chunk, next_chunk in zip(chunks, chunks[1:])
+    )
+    assert click_up_timesheeting.time_entries_chunks(
+        from_date_ts, to_date_ts, None
+    ) == [(from_date_ts, to_date_ts)]
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 4])
+def test_fetch_time_entries_between_chunks(requests_mock, tmp_path, max_concurrency):
+    # Every chunk returns the same entry, which is merged back into one
+    setup_requests_mock(requests_mock, entries=True)
+    from_date_ts = int(datetime(2022, 1, 1).timestamp() * 1000)
+    to_date_ts = int(datetime(2022, 12, 31).timestamp() * 1000)
+    chunk_journal_directory = tmp_path / "chunks"
+
+    entries = click_up_timesheeting.fetch_time_entries_between(
+        DEFAULT_CLICKUP_TOKEN,
+        DEFAULT_TEAM_ID,
+        from_date_ts,
+        to_date_ts,
+        chunk_months=3,
+        max_concurrency=max_concurrency,
+        chunk_journal_directory=str(chunk_journal_directory),
+    )
+    assert entries == DEFAULT_TIME_ENTRIES_JSON["data"]
+    assert requests_mock.call_count == 4
+    assert not list(chunk_journal_directory.iterdir())
+
+
+def test_fetch_time_entries_between_resume(requests_mock, tmp_path):
+    from_date_ts = int(datetime(2022, 1, 1).timestamp() * 1000)
+    to_date_ts = int(datetime(2022, 12, 31).timestamp() * 1000)
+    first_chunk = click_up_timesheeting.time_entries_chunks(
+        from_date_ts, to_date_ts, 6
+    )[0]
+    # A first interrupted fetch left its first chunk in the journal
+    journal_path = click_up_timesheeting.time_entries_chunks_journal_paths(
+        str(tmp_path), DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID, [first_chunk]
+    )[0]
+    with open(journal_path, "w") as fp:
+        json.dump([{"id": "journaled"}], fp)
+    # Journals of other queries, and expired ones, are not resumed from
+    other_paths = [
+        click_up_timesheeting.time_entries_chunks_journal_paths(
+            str(tmp_path), token, team_id, [first_chunk], assignees
+        )[0]
+        for token, team_id, assignees in (
+            ("pk_other", DEFAULT_TEAM_ID, None),
+            (DEFAULT_CLICKUP_TOKEN, "999", None),
+            (DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID, ["123"]),
+        )
+    ]
+    assert len({journal_path, *other_paths}) == 4
+    expired_path = tmp_path / "expired.json"
+    expired_path.write_text("[]")
+    expired = time.time() - click_up_timesheeting.CHUNK_JOURNAL_TTL - 1
+    os.utime(expired_path, (expired, expired))
+    requests_mock.get(
+        DEFAULT_TIME_ENTRIES_API_URL.format(DEFAULT_TEAM_ID),
+        json={"data": [{"id": "fetched"}]},
+    )
+
+    entries = click_up_timesheeting.fetch_time_entries_between(
+        DEFAULT_CLICKUP_TOKEN,
+        DEFAULT_TEAM_ID,
+        from_date_ts,
+        to_date_ts,
+        chunk_months=6,
+        chunk_journal_directory=str(tmp_path),
+    )
+    assert entries == [{"id": "journaled"}, {"id": "fetched"}]
+    assert requests_mock.call_count == 1
+    assert not list(tmp_path.iterdir())
+
+
+def test_time_entry_store_sync(requests_mock, temporary_time_entry_store_path):
+    setup_requests_mock(requests_mock, entries=True)
+    day_ms = 24 * 3600 * 1000
+    entry_start = DEFAULT_TIME_ENTRIES_JSON["data"][0]["start"]
+    from_date_ts, to_date_ts = entry_start - 30 * day_ms, entry_start + 30 * day_ms
+    time_entry_store = click_up_timesheeting.TimeEntryStore(
+        temporary_time_entry_store_path, overlap_days=2
+    )
+
+    entries = time_entry_store.sync(
+        DEFAULT_CLICKUP_TOKEN,
+        DEFAULT_TEAM_ID,
+        from_date_ts,
+        to_date_ts,
+        chunk_months=None,
+    )
+    assert entries == DEFAULT_TIME_ENTRIES_JSON["data"]
+    assert requests_mock.last_request.qs["start_date"] == [str(from_date_ts)]
+    assert time_entry_store.synced_range(DEFAULT_TEAM_ID) == (
+        from_date_ts,
+        to_date_ts,
+    )
+
+    # Only the days before the high-water mark and later ones are fetched again
+    entries = time_entry_store.sync(
+        DEFAULT_CLICKUP_TOKEN,
+        DEFAULT_TEAM_ID,
+        from_date_ts,
+        to_date_ts + day_ms,
+        chunk_months=None,
+    )
+    assert entries == DEFAULT_TIME_ENTRIES_JSON["data"]
+    assert requests_mock.call_count == 2
+    assert requests_mock.last_request.qs["start_date"] == [str(to_date_ts - 2 * day_ms)]
+
+    # Already synced ranges are answered offline
+    time_entry_store.sync(
+        DEFAULT_CLICKUP_TOKEN,
+        DEFAULT_TEAM_ID,
+        from_date_ts,
+        entry_start,
+        chunk_months=None,
+    )
+    assert requests_mock.call_count == 2
+
+    # Older history gets synced, without fetching recent days again
+    time_entry_store.sync(
+        DEFAULT_CLICKUP_TOKEN,
+        DEFAULT_TEAM_ID,
+        from_date_ts - day_ms,
+        entry_start,
+        chunk_months=None,
+    )
+    assert requests_mock.call_count == 3
+    assert requests_mock.last_request.qs["end_date"] == [str(from_date_ts)]
+    time_entry_store.close()
+
+
+def test_main_sync(monkeypatch, requests_mock):
+    setup_requests_mock(requests_mock, all=True)
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".DAYS", {})
+    kwargs = {
+        "click_up_token": DEFAULT_CLICKUP_TOKEN,
+        "click_up_team_id": DEFAULT_TEAM_ID,
+        "from_date": DEFAULT_FROM_DATE,
+        "to_date": DEFAULT_TO_DATE,
+        "sync": True,
+    }
+    click_up_timesheeting.main(**kwargs)
+    entries_requests = [
+        request
+        for request in requests_mock.request_history
+        if request.path.endswith("/time_entries")
+    ]
+    assert len(entries_requests) == 1
+
+    # The whole range is in the store already, beyond the re-sync overlap
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".DAYS", {})
+    requests_mock.reset_mock()
+    click_up_timesheeting.main(
+        **dict(kwargs, from_date="2023-01-02", to_date="2023-01-10")
+    )
+    assert not [
+        request
+        for request in requests_mock.request_history
+        if request.path.endswith("/time_entries")
+    ]
+
+
+def test_main_offline(requests_mock, tmp_path):
+    setup_requests_mock(requests_mock, all=True)
+    kwargs = {
+        "click_up_token": DEFAULT_CLICKUP_TOKEN,
+        "click_up_team_id": DEFAULT_TEAM_ID,
+        "from_date": "2020-06-01",
+        "to_date": "2020-06-30",
+        "sync": True,
+        "as_json": True,
+    }
+    click_up_timesheeting.main(json_output_path=str(tmp_path / "online.json"), **kwargs)
+
+    # Reports over synced dates only read the store, sub-ranges included
+    requests_mock.reset_mock()
+    click_up_timesheeting.main(
+        offline=True, json_output_path=str(tmp_path / "offline.json"), **kwargs
+    )
+    click_up_timesheeting.main(
+        offline=True,
+        json_output_path=str(tmp_path / "empty.json"),
+        **dict(
+            kwargs, click_up_team_id=None, from_date="2020-06-01", to_date="2020-06-21"
+        ),
+    )
+    assert not requests_mock.request_history
+    with open(tmp_path / "online.json") as online, open(
+        tmp_path / "offline.json"
+    ) as offline:
+        assert json.load(online) == json.load(offline)
+    with open(tmp_path / "empty.json") as empty:
+        assert json.load(empty)["tasks"] == []
+
+    with pytest.raises(SystemExit):
+        click_up_timesheeting.main(offline=True, **dict(kwargs, to_date="2020-07-31"))
+
+    # Today is only synced until the sync's time, which reports stop at
+    timezone = tz.gettz(click_up_timesheeting.DEFAULT_TIMEZONE)
+    today = datetime.now(timezone).strftime("%Y-%m-%d")
+    today_kwargs = dict(
+        kwargs,
+        from_date=today,
+        to_date=today,
+        json_output_path=str(tmp_path / "today.json"),
+    )
+    click_up_timesheeting.main(**today_kwargs)
+    requests_mock.reset_mock()
+    click_up_timesheeting.main(offline=True, **today_kwargs)
+    assert not requests_mock.request_history
+
+
+def test_main_several_teams(requests_mock, tmp_path, capsys):
+    other_team_id = DEFAULT_USER_TEAMS_MULTIPLE_JSON["teams"][1]["id"]
+    other_entry = dict(
+        DEFAULT_TIME_ENTRIES_JSON["data"][0],
+        id="2",
+        task=dict(
+            DEFAULT_TIME_ENTRIES_JSON["data"][0]["task"], id="other", name="meow"
+        ),
+        duration="60000",
+    )
+    setup_requests_mock(requests_mock, entries=True)
+    requests_mock.get(DEFAULT_TEAM_API_URL, json=DEFAULT_USER_TEAMS_MULTIPLE_JSON)
+    requests_mock.get(
+        DEFAULT_TIME_ENTRIES_API_URL.format(other_team_id), json={"data": [other_entry]}
+    )
+    for team_id in (DEFAULT_TEAM_ID, other_team_id):
+        requests_mock.get(
+            DEFAULT_TEAM_TASKS_API_URL.format(team_id),
+            json={"tasks": [], "last_page": True},
+        )
+    kwargs = {
+        "click_up_token": DEFAULT_CLICKUP_TOKEN,
+        "from_date": "2020-06-01",
+        "to_date": "2020-06-30",
+        "task_resolution": "lean",
+        "bypass_task_cache": True,
+        "as_json": True,
+    }
+    reports = {}
+    for click_up_team_id in ("all", (DEFAULT_TEAM_ID, other_team_id)):
+        json_output_path = str(tmp_path / "{}.json".format(len(reports)))
+        click_up_timesheeting.main(
+            click_up_team_id=click_up_team_id,
+            json_output_path=json_output_path,
+            **kwargs,
+        )
+        with open(json_output_path) as json_file:
+            reports[click_up_team_id] = json.load(json_file)
+    assert "Teams summary:" in capsys.readouterr().out
+
+    # Both teams' time entries add up into one report, broken down by team
+    report = reports["all"]
+    assert report == reports[(DEFAULT_TEAM_ID, other_team_id)]
+    assert sorted(task["name"] for task in report["tasks"]) == ["meow", "woof"]
+    assert [(team["id"], team["name"]) for team in report["teams"]] == [
+        (team["id"], team["name"]) for team in DEFAULT_USER_TEAMS_MULTIPLE_JSON["teams"]
+    ]
+    assert report["teams"][1]["total_duration_raw"] == [0, 1, 0]
+    assert [
+        sum(day["total_duration_raw"][i] for day in report["days"]) for i in range(3)
+    ] == [
+        sum(team["total_duration_raw"][i] for team in report["teams"]) for i in range(3)
+    ]
+
+    with pytest.raises(SystemExit):
+        click_up_timesheeting.main(
+            click_up_team_id="all", sync=True, offline=True, **kwargs
+        )
+
+
+def test_main_by_user(requests_mock, tmp_path, capsys):
+    entry = DEFAULT_TIME_ENTRIES_JSON["data"][0]
+    other_user = {"id": 123, "username": "John Doe", "email": "john@example.com"}
+    entries = [
+        entry,
+        dict(entry, id="2", user=other_user, duration="60000"),
+        dict(
+            entry,
+            id="3",
+            user=other_user,
+            task=dict(entry["task"], id="other", name="meow"),
+            start=entry["start"] + 24 * 3600 * 1000,
+            duration="120000",
+        ),
+    ]
+    setup_requests_mock(requests_mock, team=True)
+    requests_mock.get(
+        DEFAULT_TIME_ENTRIES_API_URL.format(DEFAULT_TEAM_ID), json={"data": entries}
+    )
+    click_up_timesheeting.main(
+        click_up_token=DEFAULT_CLICKUP_TOKEN,
+        click_up_team_id=DEFAULT_TEAM_ID,
+        from_date="2020-06-01",
+        to_date="2020-06-30",
+        task_resolution="lean",
+        bypass_task_cache=True,
+        by_user=True,
+        as_json=True,
+        json_output_path=str(tmp_path / "report.json"),
+    )
+    assert "Users summary:" in capsys.readouterr().out
+
+    # All team members' time entries are fetched at once
+    entries_requests = [
+        request
+        for request in requests_mock.request_history
+        if request.path.endswith("/time_entries")
+    ]
+    assert len(entries_requests) == 1
+    assert entries_requests[0].qs["assignee"] == ["123"]
+
+    with open(tmp_path / "report.json") as json_file:
+        report = json.load(json_file)
+    assert (report["total_duration"]["hours"], report["total_duration"]["minutes"]) == (
+        1,
+        15,
+    )
+    users = {user["id"]: user for user in report["users"]}
+    assert sorted(users) == ["1", "123"]
+    assert sorted(
+        (task["name"], task["total_duration_raw"]) for task in users["123"]["tasks"]
+    ) == [("meow", [0, 2, 0]), ("woof", [0, 1, 0])]
+    assert [day["total_duration_raw"] for day in users["123"]["days"]] == [
+        [0, 1, 0],
+        [0, 2, 0],
+    ]
+    assert (
+        users["1"]["total_duration"]["hours"],
+        users["1"]["total_duration"]["minutes"],
+    ) == (1, 12)
+
+    # Each user gets their own report, of the same form
+    with open(tmp_path / "report-123.json") as json_file:
+        assert json.load(json_file) == users["123"]
+
+    for option in ("sync", "from_json", "from_snapshot", "as_snapshot"):
+        with pytest.raises(SystemExit):
+            click_up_timesheeting.main(
+                click_up_token=DEFAULT_CLICKUP_TOKEN,
+                json_input_path=DEFAULT_INPUT_JSON_PATH,
+                snapshot_input_path=str(tmp_path / "entries.snapshot"),
+                by_user=True,
+                **{option: True},
+            )
+    assert not os.path.exists(tmp_path / "entries.snapshot")
+
+
+def test_main_group_by(requests_mock, tmp_path, capsys):
+    entry = DEFAULT_TIME_ENTRIES_JSON["data"][0]
+    other_user = {"id": 123, "username": "John Doe"}
+    entries = [
+        entry,
+        dict(
+            entry,
+            id="2",
+            user=other_user,
+            task=dict(entry["task"], id="other", name="meow"),
+            start=entry["start"] + 24 * 3600 * 1000,
+            duration="120000",
+        ),
+    ]
+    setup_requests_mock(requests_mock, team=True)
+    requests_mock.get(
+        DEFAULT_TIME_ENTRIES_API_URL.format(DEFAULT_TEAM_ID), json={"data": entries}
+    )
+    click_up_timesheeting.main(
+        click_up_token=DEFAULT_CLICKUP_TOKEN,
+        click_up_team_id=DEFAULT_TEAM_ID,
+        from_date="2020-06-01",
+        to_date="2020-06-30",
+        task_resolution="lean",
+        bypass_task_cache=True,
+        group_by="folder>list>task,month>week>day,user>tag",
+        as_json=True,
+        json_output_path=str(tmp_path / "report.json"),
+    )
+    assert "Folder > list > task summary:" in capsys.readouterr().out
+    with open(tmp_path / "report.json") as json_file:
+        report = json.load(json_file)
+
+    def names(groups):
+        return [(group["name"], names(group["groups"])) for group in groups]
+
+    def seconds(group):
+        hours, minutes, seconds = group["total_duration_raw"]
+        return hours * 3600 + minutes * 60 + seconds
+
+    def assert_subtotals(group):
+        if group["groups"]:
+            assert seconds(group) == pytest.approx(sum(map(seconds, group["groups"])))
+        for child in group["groups"]:
+            assert_subtotals(child)
+
+    locations, dates, users = report["groups"]
+    assert locations["group_by"] == "folder>list>task"
+    assert names(locations["groups"]) == [
+        ("Folder", [("List", [("meow", []), ("woof", [])])])
+    ]
+    assert names(dates["groups"]) == [
+        ("2020-06", [("2020-W26", [("2020-06-22", []), ("2020-06-23", [])])])
+    ]
+    # Time entries count in each of their tags
+    tags = [("content-request", []), ("marketing-okr", [])]
+    assert names(users["groups"]) == [
+        ("John Doe", tags),
+        ("first_name last_name", tags),
+    ]
+    for grouping in (locations, dates):
+        assert grouping["total_duration_raw"] == list(
+            report["total_duration"][unit] for unit in ("hours", "minutes", "seconds")
+        )
+        assert_subtotals(grouping)
+
+    with pytest.raises(SystemExit):
+        click_up_timesheeting.main(
+            click_up_token=DEFAULT_CLICKUP_TOKEN, group_by="task>color"
+        )
+
+
+def test_main_profile(requests_mock, tmp_path, capsys):
+    setup_requests_mock(requests_mock, all=True)
+    click_up_timesheeting.main(
+        click_up_token=DEFAULT_CLICKUP_TOKEN,
+        click_up_team_id=DEFAULT_TEAM_ID,
+        from_date=DEFAULT_FROM_DATE,
+        to_date=DEFAULT_TO_DATE,
+        profile=True,
+        profile_output_path=str(tmp_path / "profile.json"),
+        cprofile_output_path=str(tmp_path / "profile.prof"),
+    )
+    assert click_up_timesheeting.PROFILER is None
+    assert "Profile: " in capsys.readouterr().out
+    with open(tmp_path / "profile.json") as profile_file:
+        profile = json.load(profile_file)
+    assert profile["phases"]["grab_time_entries"]["calls"] == 1
+    assert "get_time_entries" in profile["phases"]
+    assert profile["counters"]["requests /task/{task_id}"] == 1
+    assert profile["counters"]["bytes /team/{team_id}/time_entries"] > 0
+    assert profile["caches"]["task cache"] == {"hits": 0, "misses": 1, "hit_rate": 0}
+    assert os.path.getsize(tmp_path / "profile.prof")
+
+
+@pytest.mark.parametrize("sorted_by_start", [True, False])
+def test_time_entry_columns_between(sorted_by_start):
+    entries = [
+        {
+            "task": {"id": "task{}".format(n % 3)},
+            "start": str(n * 1000),
+            "duration": "1",
+        }
+        for n in range(10)
+    ]
+    columns = click_up_timesheeting.TimeEntryColumns(entries)
+    columns.sorted_by_start = sorted_by_start
+    subset = columns.between(4000, 6000)
+    assert list(subset.starts) == [4000, 5000, 6000]
+    assert list(subset.task_indexes) == [0, 1, 2]
+    assert list(subset.task_ids) == ["task1", "task2", "task0"]
+
+
+@pytest.mark.parametrize("task_resolution", ["per-task", "lean", "bulk"])
+def test_grab_time_entries_async_engine(monkeypatch, requests_mock, task_resolution):
+    setup_requests_mock(requests_mock, all=True)
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".CLICKUP_TEAM_ID", None)
+    task_ids = ["task1", "task2", "task3"]
+
+    # Each monthly chunk has its own task, of the same list
+    def time_entries(request, context):
+        start_ts = int(request.qs["start_date"][0]) / 1000
+        timezone = tz.gettz(click_up_timesheeting.DEFAULT_TIMEZONE)
+        month = datetime.fromtimestamp(start_ts, timezone).month
+        entry = DEFAULT_TIME_ENTRIES_JSON["data"][0]
+        task = dict(entry["task"], id=task_ids[month - 1])
+        return {"data": [dict(entry, id=str(month), task=task)]}
+
+    requests_mock.get(
+        DEFAULT_TIME_ENTRIES_API_URL.format(DEFAULT_TEAM_ID), json=time_entries
+    )
+    requests_mock.get(
+        DEFAULT_TEAM_TASKS_API_URL.format(DEFAULT_TEAM_ID),
+        json={
+            "tasks": [
+                dict(DEFAULT_TASK_JSON, id=task_id, name="Task " + task_id)
+                for task_id in reversed(task_ids)
+            ],
+            "last_page": True,
+        },
+    )
+    for task_id in task_ids:
+        requests_mock.get(
+            DEFAULT_TASK_API_URL.format(task_id),
+            json=dict(DEFAULT_TASK_JSON, id=task_id, name="Task " + task_id),
+        )
+    fetch_time_entries_chunk = click_up_timesheeting.fetch_time_entries_chunk
+
+    # Earlier chunks complete last
+    def slow_fetch_time_entries_chunk(click_up_token, click_up_team_id, chunk, *args):
+        timezone = tz.gettz(click_up_timesheeting.DEFAULT_TIMEZONE)
+        month = datetime.fromtimestamp(chunk[0] / 1000, timezone).month
+        time.sleep(0.05 * (len(task_ids) - month))
+        return fetch_time_entries_chunk(click_up_token, click_up_team_id, chunk, *args)
+
+    monkeypatch.setattr(
+        MODULE_UNDER_TEST + ".fetch_time_entries_chunk", slow_fetch_time_entries_chunk
+    )
+    views = {}
+    rows = {}
+    for engine in click_up_timesheeting.ENGINES:
+        monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+        monkeypatch.setattr(MODULE_UNDER_TEST + ".DAYS", {})
+        requests_mock.reset_mock()
+        click_up_timesheeting.grab_time_entries(
+            from_date=DEFAULT_FROM_DATE,
+            to_date="2023-03-31",
+            click_up_token=DEFAULT_CLICKUP_TOKEN,
+            chunk_months=1,
+            task_resolution=task_resolution,
+            engine=engine,
+        )
+        views[engine] = (
+            deepcopy(click_up_timesheeting.TASKS),
+            deepcopy(click_up_timesheeting.DAYS),
+            requests_mock.call_count,
+        )
+        time_entries = click_up_timesheeting.get_time_entries(None, None)
+        rows[engine] = [task["name"] for task in time_entries["tasks"]]
+    # Same views from as many requests, the team being guessed by the async pipeline too
+    assert views["async"] == views["threads"]
+    assert list(views["async"][0]) == list(views["threads"][0]) == task_ids
+    tasks = views["threads"][0]
+    assert rows["async"] == rows["threads"] == [tasks[i]["name"] for i in task_ids]
+
+
+def test_iter_json_array():
+    document = json.dumps(
+        {"team": {"data": "é"}, "data": [{"id": "é1", "n": [1, 2]}, 3, {"id": "2"}]}
+    ).encode("utf-8")
+    expected = [{"id": "é1", "n": [1, 2]}, 3, {"id": "2"}]
+    # Items are decoded the same, whatever chunk boundaries
+    # even within a UTF-8 character
+    for chunk_size in (1, 2, 7, len(document)):
+        chunks = [
+            document[i : i + chunk_size] for i in range(0, len(document), chunk_size)
+        ]
+        assert list(click_up_timesheeting.iter_json_array(chunks, "data")) == expected
+
+    with pytest.raises(ValueError):
+        list(click_up_timesheeting.iter_json_array([document[:-20]], "data"))
+
+
+def test_grab_time_entries_stream(monkeypatch, requests_mock):
+    setup_requests_mock(requests_mock, all=True)
+    views = {}
+    for stream in (False, True):
+        monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+        monkeypatch.setattr(MODULE_UNDER_TEST + ".DAYS", {})
+        click_up_timesheeting.grab_time_entries(
+            from_date=DEFAULT_FROM_DATE,
+            to_date=DEFAULT_TO_DATE,
+            click_up_token=DEFAULT_CLICKUP_TOKEN,
+            click_up_team_id=DEFAULT_TEAM_ID,
+            stream=stream,
+        )
+        views[stream] = (
+            deepcopy(click_up_timesheeting.TASKS),
+            deepcopy(click_up_timesheeting.DAYS),
+        )
+    assert views[True] == views[False]
+    assert views[True][1]
+
+
+def test_main_snapshot(monkeypatch, requests_mock, tmp_path):
+    second_entry = dict(
+        DEFAULT_TIME_ENTRIES_JSON["data"][0],
+        id="2",
+        task=dict(
+            DEFAULT_TIME_ENTRIES_JSON["data"][0]["task"], id="other", name="meow"
+        ),
+        start=1592841559129 + 3 * 24 * 3600 * 1000,
+        duration="60000",
+    )
+    requests_mock.get(
+        DEFAULT_TIME_ENTRIES_API_URL.format(DEFAULT_TEAM_ID),
+        json={"data": [second_entry, DEFAULT_TIME_ENTRIES_JSON["data"][0]]},
+    )
+    kwargs = {
+        "click_up_token": DEFAULT_CLICKUP_TOKEN,
+        "click_up_team_id": DEFAULT_TEAM_ID,
+        "task_resolution": "lean",
+        "as_json": True,
+    }
+    snapshot_path = str(tmp_path / "entries.snapshot")
+    click_up_timesheeting.main(
+        as_snapshot=True,
+        snapshot_output_path=snapshot_path,
+        json_output_path=str(tmp_path / "online.json"),
+        **kwargs,
+    )
+    snapshot = click_up_timesheeting.Snapshot(snapshot_path)
+    assert list(snapshot.columns.starts) == sorted(
+        [second_entry["start"], DEFAULT_TIME_ENTRIES_JSON["data"][0]["start"]]
+    )
+    assert snapshot.metadata["team_id"] == DEFAULT_TEAM_ID
+
+    # Reports from the snapshot are made offline, for all or some of its dates
+    requests_mock.reset_mock()
+    click_up_timesheeting.main(
+        from_snapshot=True,
+        snapshot_input_path=snapshot_path,
+        json_output_path=str(tmp_path / "offline.json"),
+        **kwargs,
+    )
+    click_up_timesheeting.main(
+        from_snapshot=True,
+        snapshot_input_path=snapshot_path,
+        from_date="2020-06-22",
+        to_date="2020-06-23",
+        json_output_path=str(tmp_path / "range.json"),
+        **kwargs,
+    )
+    assert not requests_mock.request_history
+    with open(tmp_path / "online.json") as online, open(
+        tmp_path / "offline.json"
+    ) as offline:
+        assert json.load(online) == json.load(offline)
+    with open(tmp_path / "range.json") as range_json:
+        time_entries = json.load(range_json)
+    assert [task["name"] for task in time_entries["tasks"]] == ["woof"]
+    assert len(time_entries["days"]) == 1
+
+    # Dates beyond the snapshot's first and last days cannot be reported from it
+    for dates in (
+        {"from_date": "2020-06-01"},
+        {"from_date": "2020-06-22", "to_date": "2020-07-31"},
+    ):
+        with pytest.raises(SystemExit):
+            click_up_timesheeting.main(
+                from_snapshot=True, snapshot_input_path=snapshot_path, **dates, **kwargs
+            )
+
+    # Snapshots keep no users nor tags to group by
+    snapshot_kwargs = dict(
+        kwargs,
+        from_snapshot=True,
+        snapshot_input_path=snapshot_path,
+        json_output_path=str(tmp_path / "groups.json"),
+    )
+    click_up_timesheeting.main(group_by="folder>task", **snapshot_kwargs)
+    for group_by in ("month>user", "tag"):
+        with pytest.raises(SystemExit):
+            click_up_timesheeting.main(group_by=group_by, **snapshot_kwargs)
+
+    with open(snapshot_path, "r+b") as snapshot_file:
+        snapshot_file.truncate(os.path.getsize(snapshot_path) - 8)
+    with pytest.raises(ValueError):
+        click_up_timesheeting.Snapshot(snapshot_path)
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_aggregate_time_entries(monkeypatch, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(MODULE_UNDER_TEST + ".numpy", None)
+    elif click_up_timesheeting.optional_numpy() is None:
+        pytest.skip("NumPy is not installed")
+    # Spread over DST changes and day boundaries
+    entries = [
+        {
+            "task": {"id": "task{}".format(n % 7)},
+            "start": str(1679698800000 + n * 1234567),
+            "duration": str(n * 1000 + 1),
+        }
+        for n in range(1000)
+    ]
+    columns = click_up_timesheeting.TimeEntryColumns(entries)
+    task_durations, days = click_up_timesheeting.aggregate_time_entries(columns)
+
+    expected_days = {}
+    for d in entries:
+        date = datetime.fromtimestamp(int(d["start"]) / 1000).strftime("%Y-%m-%d")
+        first_start, duration = expected_days.get(date, (int(d["start"]), 0))
+        expected_days[date] = (first_start, duration + int(d["duration"]))
+    assert days == expected_days
+    assert [d["task"]["id"] for d in columns.task_entries] == [
+        "task{}".format(n) for n in range(7)
+    ]
+    assert task_durations == [
+        sum(int(d["duration"]) for d in entries[n::7]) for n in range(7)
+    ]
+    assert click_up_timesheeting.aggregate_time_entries(
+        click_up_timesheeting.TimeEntryColumns()
+    ) == ([], {})
+
+
+def test_report_contexts_in_threads(monkeypatch, requests_mock):
+    setup_requests_mock(requests_mock, all=True)
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".DAYS", {})
+
+    def report(context):
+        click_up_timesheeting.grab_time_entries(
+            from_date=DEFAULT_FROM_DATE,
+            to_date=DEFAULT_TO_DATE,
+            click_up_token=DEFAULT_CLICKUP_TOKEN,
+            click_up_team_id=DEFAULT_TEAM_ID,
+            context=context,
+        )
+        return click_up_timesheeting.get_time_entries(
+            DEFAULT_FROM_DATE, DEFAULT_TO_DATE, context
+        )
+
+    expected = report(click_up_timesheeting.ReportContext())
+    contexts = [click_up_timesheeting.ReportContext() for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=len(contexts)) as executor:
+        results = list(executor.map(report, contexts))
+    # Each report has its own totals, and module-level views are left alone
+    assert results == [expected] * len(contexts)
+    assert expected["tasks"]
+    assert click_up_timesheeting.TASKS == click_up_timesheeting.DAYS == {}
+
+
+def test_batch(requests_mock, tmp_path):
+    setup_requests_mock(requests_mock, all=True)
+    manifest = {
+        "defaults": {
+            "from_date": "2020-06-01",
+            "to_date": "2020-06-30",
+            "as_json": True,
+        },
+        "reports": [
+            {"json_output_path": str(tmp_path / "june.json"), "language": "french"},
+            {
+                "json_output_path": str(tmp_path / "july.json"),
+                "from_date": "2020-07-01",
+                "to_date": "2020-07-31",
+            },
+            {
+                "json_output_path": str(tmp_path / "other-folder.json"),
+                "filters": {"folder": ["Other folder", "999"]},
+            },
+            {
+                "json_output_path": str(tmp_path / "list.json"),
+                "filters": {"list": "123", "task": DEFAULT_TASK_NAME},
+                "as_html": True,
+                "html_output_path": str(tmp_path / "list.html"),
+            },
+        ],
+    }
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps(manifest))
+
+    reports = click_up_timesheeting.batch(
+        str(manifest_path),
+        click_up_token=DEFAULT_CLICKUP_TOKEN,
+        click_up_team_id=DEFAULT_TEAM_ID,
+        chunk_months=0,
+        render_processes=2,
+    )
+    # All reports' time entries and tasks are fetched at once
+    assert [
+        request.path.rsplit("/", 1)[-1] for request in requests_mock.request_history
+    ] == [
+        "time_entries",
+        DEFAULT_TASK_ID,
+    ]
+    june, july, other_folder, filtered_list = (
+        json.loads((tmp_path / name).read_text())
+        for name in ("june.json", "july.json", "other-folder.json", "list.json")
+    )
+    assert [task["name"] for task in june["tasks"]] == [DEFAULT_TASK_NAME]
+    assert june == json.loads(json.dumps(reports[0][0]))
+    assert filtered_list["tasks"] == june["tasks"]
+    assert (tmp_path / "list.html").exists()
+    assert not july["tasks"] and not july["days"]
+    assert not other_folder["tasks"]
+
+
+def test_report_server(requests_mock):
+    setup_requests_mock(requests_mock, all=True)
+    server = click_up_timesheeting.report_server(
+        port=0,
+        click_up_token=DEFAULT_CLICKUP_TOKEN,
+        click_up_team_id=DEFAULT_TEAM_ID,
+        rate_limit=0,
+    )
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    url = "http://127.0.0.1:{}".format(server.server_address[1])
+
+    def get(path):
+        # urllib rather than requests, which requests_mock intercepts
+        try:
+            with urllib.request.urlopen(url + path) as response:
+                return (
+                    response.status,
+                    response.headers["Content-Type"],
+                    response.read(),
+                )
+        except urllib.error.HTTPError as e:
+            return e.code, None, None
+
+    try:
+        query = "from_date={}&to_date={}".format(DEFAULT_FROM_DATE, DEFAULT_TO_DATE)
+        responses = [get("/report?" + query)]
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            responses += executor.map(
+                get,
+                ["/report?" + query] * 2
+                + ["/report?format=html&language=french&" + query],
+            )
+        for status, content_type, content in responses[:3]:
+            assert (status, content_type) == (200, "application/json")
+            assert json.loads(content)["tasks"][0]["name"] == DEFAULT_TASK_NAME
+        status, content_type, content = responses[3]
+        assert status == 200 and content_type.startswith("text/html")
+        assert b'lang="fr"' in content
+        # Tasks were resolved once, then from the shared task cache
+        task_requests = [
+            request
+            for request in requests_mock.request_history
+            if request.path.startswith("/api/v2/task/")
+        ]
+        assert len(task_requests) == 1
+        # Updated tasks are listed at most once per refresh interval, not per request
+        assert not [
+            request
+            for request in requests_mock.request_history
+            if request.path.endswith("/task")
+        ]
+
+        assert get("/report?format=docx")[0] == 400
+        assert get("/report?json_output_path=x")[0] == 400
+        assert get("/other")[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        if server.pdf_executor is not None:
+            server.pdf_executor.shutdown()
+        server.task_cache.close()
+
+
+def test_require_api_token(monkeypatch, tmp_path):
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".CLICKUP_PK", "pk_env")
+    assert click_up_timesheeting.require_api_token("pk_given") == "pk_given"
+    assert click_up_timesheeting.require_api_token(None) == "pk_env"
+
+    # Every entry point refuses to run without a token
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".CLICKUP_PK", None)
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"reports": [{}]}))
+    for run in (
+        click_up_timesheeting.grab_time_entries,
+        click_up_timesheeting.grab_teams_time_entries,
+        lambda click_up_token: click_up_timesheeting.batch(
+            str(manifest_path), click_up_token=click_up_token
+        ),
+        lambda click_up_token: click_up_timesheeting.report_server(
+            port=0, click_up_token=click_up_token
+        ),
+    ):
+        with pytest.raises(SystemExit):
+            run(click_up_token=None)
+
+
+def test_batch_manifest_errors(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    for report in ({"unknown": 1}, {"filters": {"tag": "x"}}):
+        manifest_path.write_text(json.dumps({"reports": [report]}))
+        with pytest.raises(SystemExit):
+            click_up_timesheeting.load_batch_manifest(str(manifest_path))
+    # Two reports writing the same output
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "defaults": {"as_pdf": True, "pdf_output_path": "report.pdf"},
+                "reports": [{}, {"from_date": "2020-06-01"}],
+            }
+        )
+    )
+    with pytest.raises(SystemExit):
+        click_up_timesheeting.load_batch_manifest(str(manifest_path))
+
+
+def test_batch_manifest_default_output_paths(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "defaults": {"as_json": True, "as_pdf": True},
+                "reports": [{}, {"pdf_output_path": "custom.pdf"}, {}],
+            }
+        )
+    )
+    specs = click_up_timesheeting.load_batch_manifest(str(manifest_path))
+    assert [spec["json_output_path"] for spec in specs] == [
+        "time-entries-1.json",
+        "time-entries-2.json",
+        "time-entries-3.json",
+    ]
+    assert [spec["pdf_output_path"] for spec in specs] == [
+        "time-entries-1.pdf",
+        "custom.pdf",
+        "time-entries-3.pdf",
+    ]
+    assert "html_output_path" not in specs[0]
+
+    # A single report keeps the default output paths
+    manifest_path.write_text(json.dumps({"reports": [{"as_json": True}]}))
+    specs = click_up_timesheeting.load_batch_manifest(str(manifest_path))
+    assert "json_output_path" not in specs[0]
+
+
+def test_get_click_up_client(requests_mock):
+    setup_requests_mock(requests_mock, team=True)
+    client = click_up_timesheeting.get_click_up_client(DEFAULT_CLICKUP_TOKEN)
+    assert click_up_timesheeting.get_click_up_client(DEFAULT_CLICKUP_TOKEN) is client
+
+    click_up_timesheeting.fetch_user_teams(DEFAULT_CLICKUP_TOKEN)
+    assert requests_mock.last_request.headers["Authorization"] == DEFAULT_CLICKUP_TOKEN
+    assert "gzip" in requests_mock.last_request.headers["Accept-Encoding"]
+
+    # Other threads may still be using the client, which is reconfigured rather than replaced
+    session = client.session
+    resized_client = click_up_timesheeting.get_click_up_client(
+        DEFAULT_CLICKUP_TOKEN, pool_size=2, timeout=5, rate_limit=50
+    )
+    assert resized_client is client and client.session is session
+    assert (client.pool_size, client.timeout) == (2, 5)
+    assert client.session.get_adapter("https://")._pool_maxsize == 2
+    assert client.rate_limiter.rate_limit == 50
+    assert click_up_timesheeting.get_click_up_client(DEFAULT_CLICKUP_TOKEN) is client
+    click_up_timesheeting.fetch_user_teams(DEFAULT_CLICKUP_TOKEN)
+    assert requests_mock.call_count == 2
+
+
+class FakeTime:
+    """Stands in for the time module, sleeping instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter(monkeypatch):
+    fake_time = FakeTime()
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".time", fake_time)
+    rate_limiter = click_up_timesheeting.RateLimiter(rate_limit=60)
+
+    for _ in range(60):
+        rate_limiter.acquire()
+    assert not fake_time.sleeps
+    # The 61st request waits for a token to be refilled, at one per second
+    rate_limiter.acquire()
+    assert fake_time.sleeps == [pytest.approx(1)]
+
+    # Click-Up's headers tell that no request is left until the reset
+    rate_limiter.update(
+        {
+            "X-RateLimit-Limit": "100",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(fake_time.now + 30),
+        }
+    )
+    assert rate_limiter.rate_limit == 100
+    rate_limiter.acquire()
+    assert sum(fake_time.sleeps) == pytest.approx(31)
+    assert rate_limiter.throttled_seconds == pytest.approx(31)
+
+
+def test_click_up_client_retries(monkeypatch, requests_mock):
+    fake_time = FakeTime()
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".time", fake_time)
+    requests_mock.get(
+        DEFAULT_TEAM_API_URL,
+        [
+            {
+                "status_code": 429,
+                "json": {"err": "Rate limit reached"},
+                "headers": {
+                    "X-RateLimit-Limit": "100",
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": str(fake_time.now + 20),
+                },
+            },
+            {"status_code": 502, "text": "Bad gateway"},
+            {"json": DEFAULT_USER_TEAMS_JSON},
+        ],
+    )
+    client = click_up_timesheeting.get_click_up_client(DEFAULT_CLICKUP_TOKEN)
+
+    assert click_up_timesheeting.fetch_user_teams(DEFAULT_CLICKUP_TOKEN)
+    assert requests_mock.call_count == 3
+    assert client.retries == 2
+    assert client.rate_limiter.throttled_seconds >= 20
+
+
+def test_click_up_client_retries_exhausted(monkeypatch, requests_mock):
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".time", FakeTime())
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".CLICKUP_CLIENTS", {})
+    click_up_timesheeting.get_click_up_client(DEFAULT_CLICKUP_TOKEN, max_retries=1)
+    for url in (
+        DEFAULT_TEAM_API_URL,
+        DEFAULT_TIME_ENTRIES_API_URL.format(DEFAULT_TEAM_ID),
+        DEFAULT_TEAM_TASKS_API_URL.format(DEFAULT_TEAM_ID),
+    ):
+        requests_mock.get(url, status_code=503, text="Service unavailable")
+
+    # The last error response is not taken for missing or no data
+    with pytest.raises(SystemExit):
+        click_up_timesheeting.fetch_user_teams(DEFAULT_CLICKUP_TOKEN)
+    with pytest.raises(SystemExit):
+        click_up_timesheeting.fetch_time_entries_window(
+            DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID, 0, 1
+        )
+    with pytest.raises(SystemExit):
+        list(
+            click_up_timesheeting.fetch_team_tasks(
+                DEFAULT_CLICKUP_TOKEN, DEFAULT_TEAM_ID
+            )
+        )
+    assert requests_mock.call_count == 6
+
+
+def test_fetch_task_general_data_error(monkeypatch, requests_mock):
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".TASKS", {})
+    requests_mock.get(
+        DEFAULT_TASK_API_URL.format(DEFAULT_TASK_ID),
+        status_code=404,
+        json={"err": "Task not found"},
+    )
+    with pytest.raises(SystemExit):
+        click_up_timesheeting.fetch_task_general_data(
+            DEFAULT_TASK_ID, DEFAULT_CLICKUP_TOKEN
+        )
+    assert DEFAULT_TASK_ID not in click_up_timesheeting.TASKS
+
+
 def test_fetch_user_teams(requests_mock):
     setup_requests_mock(requests_mock, team=True)
 
@@ -277,6 +1608,7 @@ def test_render_pdf(monkeypatch, import_success):
     if not import_success:
         with monkeypatch.context() as m:
             m.delitem(sys.modules, "weasyprint", raising=False)
+            m.setattr(MODULE_UNDER_TEST + ".PDF_RENDERER", None)
             m.setattr(builtins, "__import__", monkey_import_notfound)
             with pytest.raises(SystemExit):
                 click_up_timesheeting.render_pdf(
@@ -287,6 +1619,129 @@ def test_render_pdf(monkeypatch, import_success):
         os.unlink(temp_pdf_path)
 
 
+@pytest.mark.parametrize("language", ["en_US", "fr_FR"])
+def test_format_iso_date(language):
+    from babel.dates import format_date
+    import dateutil.parser
+
+    for a_date in (
+        "2023-01-31 23:59:59",
+        "2022-11-01T09:30:00+01:00",
+        "2022-03-27T01:59:59.123456+00:00",
+        "2023-01-31T08:00:00Z",
+        "Jan 31 2023",
+    ):
+        for format in ("full", "short"):
+            assert click_up_timesheeting.format_iso_date(
+                a_date, format, language
+            ) == format_date(
+                dateutil.parser.parse(a_date), format=format, locale=language
+            )
+    hits = click_up_timesheeting.format_iso_date.cache_info().hits
+    click_up_timesheeting.format_iso_date("2023-01-31 23:59:59", "full", language)
+    assert click_up_timesheeting.format_iso_date.cache_info().hits == hits + 1
+
+
+def test_html_renderer(temporary_template_cache_directory):
+    with open("examples/example1.json", "r") as fp:
+        time_entries = json.loads(fp.read())
+    renderer = click_up_timesheeting.get_html_renderer()
+    assert click_up_timesheeting.get_html_renderer() is renderer
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        contents = list(
+            executor.map(
+                lambda language: renderer.render(time_entries, language=language),
+                ["en_US", "fr_FR"] * 4,
+            )
+        )
+    # One environment and translations per language, rendering concurrently
+    assert contents[::2] == [contents[0]] * 4
+    assert contents[1::2] == [contents[1]] * 4
+    assert '<html lang="en"' in contents[0] and '<html lang="fr"' in contents[1]
+    assert (
+        renderer.environments.keys()
+        == renderer.translations.keys()
+        == {"en_US", "fr_FR"}
+    )
+    assert renderer.environment("fr_FR") is renderer.environment("fr_FR")
+
+    # Compiled templates are reused by later runs
+    assert os.listdir(temporary_template_cache_directory)
+    cold_renderer = click_up_timesheeting.HtmlRenderer(
+        template_cache_directory=temporary_template_cache_directory
+    )
+    assert cold_renderer.render(time_entries, language="fr_FR") == contents[1]
+
+
+HEAVY_MODULES = ("jinja2", "babel", "requests", "numpy", "asyncio", "fire")
+
+
+def imported_modules_after(code):
+    """Runs code in a new Python process, returning which HEAVY_MODULES it imported."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            code
+            + "\nimport sys\nprint(' '.join(m for m in {} if m in sys.modules))".format(
+                HEAVY_MODULES
+            ),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.splitlines()[-1].split()
+
+
+def test_lazy_imports():
+    assert imported_modules_after("import {}".format(MODULE_UNDER_TEST)) == []
+    # Console only reports from JSON need no templating nor HTTP
+    main_call = (
+        "{0}.main(from_json=True, json_input_path={1!r},"
+        " as_json=True, json_output_path={2!r})"
+    )
+    code = "import {0}\n" + main_call
+    assert (
+        imported_modules_after(
+            code.format(MODULE_UNDER_TEST, DEFAULT_INPUT_JSON_PATH, os.devnull)
+        )
+        == []
+    )
+
+
+class FakeHTML:
+    """Stands for WeasyPrint's HTML class.
+    Writes the HTML content and font configuration as is.
+    """
+
+    def __init__(self, string):
+        self.string = string
+
+    def write_pdf(self, pdf_output_path, font_config=None):
+        with open(pdf_output_path, "w") as fp:
+            fp.write("{} {} {}".format(self.string, font_config, os.getpid()))
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_render_pdfs(monkeypatch, tmp_path, processes):
+    monkeypatch.setattr(MODULE_UNDER_TEST + ".PDF_RENDERER", (FakeHTML, "fonts"))
+    payloads = [
+        ("<p>{}</p>".format(i), str(tmp_path / "{}.pdf".format(i))) for i in range(6)
+    ]
+    assert click_up_timesheeting.render_pdfs(payloads, processes=processes) == [
+        pdf_output_path for _, pdf_output_path in payloads
+    ]
+    contents = [open(pdf_output_path).read().split() for _, pdf_output_path in payloads]
+    assert [content[:2] for content in contents] == [
+        ["<p>{}</p>".format(i), "fonts"] for i in range(6)
+    ]
+    # Rendered by pool processes, or by this one
+    pids = {content[2] for content in contents}
+    assert (str(os.getpid()) in pids) == (processes == 1)
+
+
 def test_render_time_entries_html():
     with open("examples/example1.json", "r") as fp:
         time_entries = json.loads(fp.read())
@@ -348,6 +1803,10 @@ def setup_requests_mock(
         team = entries = task = True
     if team:
         requests_mock.get(DEFAULT_TEAM_API_URL, json=DEFAULT_USER_TEAMS_JSON)
+        requests_mock.get(
+            DEFAULT_TEAM_TASKS_API_URL.format(DEFAULT_TEAM_ID),
+            json={"tasks": [], "last_page": True},
+        )
 
     if entries:
         print("setting up entries mock request")